@@ -1,16 +1,81 @@
 import logging
+# Imported first so its timer covers the rest of the application's imports
+from institutions_api.util.startup import startup_stats
 
-from fastapi import FastAPI, Request
+import time
+from contextlib import asynccontextmanager
+from os import environ
+from typing import List, Optional
+
+from fastapi import Body, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from institutions_api.db import db
-from institutions_api.models.api_models import InstitutionBaseModel, InstitutionValidatorModel
+from institutions_api.db import db, query_stats
+from institutions_api.db.change_events import change_broadcaster
+from institutions_api.db.facet_index import facet_index
+from institutions_api.db.geo_index import geo_index
+from institutions_api.db.name_index import name_index
+from institutions_api.db.pools import pool_metrics
+from institutions_api.models.api_models import (
+    InstitutionBaseModel,
+    InstitutionValidatorModel,
+    BulkInstitutionResponseModel,
+    InstitutionLookupRequestModel,
+    InstitutionLookupResponseModel,
+    NearbyInstitutionModel,
+    InstitutionSearchResultModel,
+    FacetedInstitutionsResponseModel,
+    InstitutionChangesResponseModel
+)
+from institutions_api.util.load_carnegie_2025_data import load_carnegie_2025_data
+from institutions_api.util.load_carnegie_data import load_carnegie_data
+from institutions_api.util.load_ipeds_data import load_ipeds_data
+from institutions_api.util.metrics import registry
+from institutions_api.util.conditional_requests import is_not_modified, not_modified_response, validator_headers
+from institutions_api.util.content_encoding import encoded_etag, negotiate_encoding
 from institutions_api.util.oidc_utils import OIDCUserInfo
+from institutions_api.util.read_your_writes import RecentWriters, client_key
+from institutions_api.util.ror_utils import ror_validator
 
 logger = logging.getLogger("default")
 
+# Serve the read endpoints from the asyncio engine rather than the threadpool, sync stays the default
+ASYNC_DB_READS = environ.get("ASYNC_DB_READS", "").lower() in ("1", "true", "yes")
+
+# Report the number of SQL statements, and the time spent on them, in the headers of every response
+DEBUG = environ.get("DEBUG", "").lower() in ("1", "true", "yes")
+
+# How long after a write a client's reads skip the replica, longer than the replica is expected to lag
+READ_YOUR_WRITES_SECONDS = float(environ.get("READ_YOUR_WRITES_SECONDS", "5"))
+recent_writers = RecentWriters(READ_YOUR_WRITES_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema changes are normally applied by the migrations, only create tables when asked to
+    if environ.get("CREATE_DB_SCHEMA", "").lower() in ("1", "true", "yes"):
+        await run_in_threadpool(db.create_schema)
+
+    startup_stats.warm_caches_in_background([
+        ("ipeds", load_ipeds_data),
+        ("carnegie_2021", load_carnegie_data),
+        ("carnegie_2025", load_carnegie_2025_data),
+        ("ror_index", ror_validator.load),
+        ("valid_institutions", db.get_valid_institutions_json),
+        ("geo_index", geo_index.load),
+        ("name_index", name_index.load),
+        ("facet_index", facet_index.load),
+    ])
+    yield
+    await change_broadcaster.close()
+    await db.dispose_async_engine()
+
+
 app = FastAPI(
-    openapi_prefix="./"
+    openapi_prefix="./",
+    lifespan=lifespan
 )
 
 origins = [
@@ -19,7 +84,105 @@ origins = [
     ]
 
 app.add_middleware(CORSMiddleware,
-    allow_origins=origins, allow_credentials=False, allow_methods=["*"], allow_headers=["*"])
+    allow_origins=origins, allow_credentials=False, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-DB-Query-Count", "X-DB-Query-Time-Ms"])
+
+REQUEST_SECONDS = registry.histogram(
+    "institutions_http_request_duration_seconds", "Time taken to answer requests, by route template",
+    ["method", "route", "status"])
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # The route template rather than the path, so institution IDs don't each get their own series
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route.path if route else "unmatched",
+                            str(response.status_code))
+    return response
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    response = await call_next(request)
+    startup_stats.record_request()
+    return response
+
+# Routes that write institutions, the only requests that pin their client's reads to the primary
+WRITE_ROUTES = {
+    ("POST", "/institutions"),
+    ("POST", "/institutions/bulk"),
+    ("PUT", "/institutions/{institution_id}"),
+    ("DELETE", "/institutions/{institution_id}"),
+}
+
+@app.middleware("http")
+async def route_reads(request: Request, call_next):
+    if not db.PG_REPLICA_HOST:
+        return await call_next(request)
+    client = client_key(request)
+    if client is None:
+        return await call_next(request)
+    if request.method in ("GET", "HEAD"):
+        if recent_writers.wrote_recently(client):
+            with db.read_from_primary():
+                return await call_next(request)
+        return await call_next(request)
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if response.status_code < 400 and route is not None and (request.method, route.path) in WRITE_ROUTES:
+        recent_writers.record(client)
+    return response
+
+@app.middleware("http")
+async def record_query_stats(request: Request, call_next):
+    if not (DEBUG or query_stats.collecting_requests()):
+        return await call_next(request)
+    with query_stats.record_queries() as stats:
+        response = await call_next(request)
+    query_stats.request_finished(stats)
+    if DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time-Ms"] = f"{stats.seconds * 1000:.3f}"
+    return response
+
+def _cache_metrics():
+    """ Hits and misses of the in-process caches, misses being builds, encodes or loads """
+    caches = {
+        **db.cache_stats(),
+        "ror_validation": (ror_validator.hits, ror_validator.misses),
+        **{name: (loader.cache_info().hits, loader.cache_info().misses) for name, loader in [
+            ("ipeds", load_ipeds_data), ("carnegie_2021", load_carnegie_data), ("carnegie_2025", load_carnegie_2025_data)]},
+    }
+    yield ("institutions_cache_hits_total", "counter", "Reads served from an in-process cache",
+           [({"cache": name}, hits) for name, (hits, _) in caches.items()])
+    yield ("institutions_cache_misses_total", "counter", "Reads that had to build, encode or load the cached value",
+           [({"cache": name}, misses) for name, (_, misses) in caches.items()])
+
+def _startup_metrics():
+    """ How long each reference data loader and cache took to warm up at startup """
+    yield ("institutions_cache_warmup_seconds", "gauge", "Time taken to load each reference data set or cache at startup",
+           [({"cache": name}, cache["seconds"]) for name, cache in startup_stats.caches.items() if "seconds" in cache])
+    yield ("institutions_ready", "gauge", "Whether startup cache warm-up has finished", [({}, int(startup_stats.ready))])
+
+def _event_metrics():
+    """ Number of clients subscribed to institution change events """
+    yield ("institutions_event_subscribers", "gauge", "Clients connected to the institution change event stream",
+           [({}, change_broadcaster.subscribers)])
+
+registry.add_collector(lambda: pool_metrics(db.engine_pools()))
+registry.add_collector(_cache_metrics)
+registry.add_collector(_startup_metrics)
+registry.add_collector(_event_metrics)
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def get_metrics():
+    """ Metrics in the Prometheus text format """
+    return PlainTextResponse(registry.render(), media_type=registry.CONTENT_TYPE)
+
+@app.get('/ready')
+def get_readiness():
+    """ Readiness probe, succeeds once the reference data and institution caches are warm """
+    return JSONResponse(startup_stats.report(), status_code=200 if startup_stats.ready else 503)
 
 @app.get('/user')
 def get_user_info(request: Request):
@@ -31,13 +194,150 @@ def get_user_info(request: Request):
         "email": user_info.email
     }
 
-@app.get('/institution_ids')
-def get_valid_institutions():
-    return db.get_valid_institutions()
+MAX_PAGE_SIZE = 1000
+
+@app.get('/institution_ids', response_model=List[InstitutionBaseModel])
+async def get_valid_institutions(
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size, enables keyset pagination"),
+        cursor: Optional[str] = Query(None, description="The X-Next-Cursor header of the previous page"),
+        fields: Optional[str] = Query(None, description="Comma separated subset of fields to return, e.g. 'id,name'"),
+        stream: bool = Query(False, description="Stream rows as they are read. Sends newline delimited JSON "
+                                                "if application/x-ndjson is accepted, otherwise a JSON array")):
+    if stream:
+        ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+        return StreamingResponse(db.iter_valid_institutions_json(ndjson),
+                                 media_type="application/x-ndjson" if ndjson else "application/json")
+
+    # Revalidation only needs the watermark, the institutions are neither read nor serialized
+    if ASYNC_DB_READS:
+        watermark = await db.get_valid_institutions_watermark_async()
+    else:
+        watermark = await run_in_threadpool(db.get_valid_institutions_watermark)
+
+    if limit or cursor or fields:
+        headers = validator_headers(watermark.etag, watermark.last_modified)
+        if is_not_modified(request, watermark.etag, watermark.last_modified):
+            return not_modified_response(headers)
+        items, next_cursor = await run_in_threadpool(
+            db.get_valid_institutions_page,
+            limit or (MAX_PAGE_SIZE if cursor else None),
+            cursor,
+            [f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+        return JSONResponse(items, headers={**headers, "X-Next-Cursor": next_cursor} if next_cursor else headers)
+
+    # The full list is sent pre-compressed when the client accepts it, each encoding with its own ETag
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {**validator_headers(encoded_etag(watermark.etag, encoding), watermark.last_modified),
+               "Vary": "Accept-Encoding"}
+    if is_not_modified(request, headers["ETag"], watermark.last_modified):
+        return not_modified_response(headers)
+
+    if ASYNC_DB_READS:
+        body = await db.get_valid_institutions_json_async(encoding)
+    else:
+        body = await run_in_threadpool(db.get_valid_institutions_json, encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get('/institutions', response_model=FacetedInstitutionsResponseModel)
+def get_faceted_institutions(
+        state: Optional[List[str]] = Query(None, description="State abbreviations, e.g. WI"),
+        control: Optional[List[str]] = Query(None, description="IPEDS control, e.g. PUBLIC"),
+        institution_size: Optional[List[str]] = Query(None, description="IPEDS institution size, e.g. OVER_20000"),
+        program_length: Optional[List[str]] = Query(None, description="IPEDS program length, e.g. FOUR_OR_MORE_YEARS"),
+        hbcu: Optional[List[str]] = Query(None, description="Historically Black College or University, true or false"),
+        tribal: Optional[List[str]] = Query(None, description="Tribal College or University, true or false"),
+        classification2021: Optional[List[str]] = Query(None, description="2021 Carnegie classification, e.g. DOCTORAL_VERY_HI_RESEARCH"),
+        classification2025: Optional[List[str]] = Query(None, description="2025 Carnegie classification, e.g. RESEARCH_1"),
+        limit: Optional[int] = Query(None, ge=1, description="Maximum number of institutions to return, all by default"),
+        offset: int = Query(0, ge=0, description="Number of matching institutions to skip")):
+    """ Institutions matching every given facet, any of the values given for one facet, with facet counts """
+    return facet_index.query({
+        "state": state,
+        "control": control,
+        "institution_size": institution_size,
+        "program_length": program_length,
+        "hbcu": hbcu,
+        "tribal": tribal,
+        "classification2021": classification2021,
+        "classification2025": classification2025,
+    }, limit, offset)
+
+MAX_SEARCH_RESULTS = 50
+
+@app.get('/institutions/search', response_model=List[InstitutionSearchResultModel])
+def search_institutions(
+        q: str = Query(..., min_length=1, description="Name, or the start of a name, to search for"),
+        limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS, description="Maximum number of institutions to return")):
+    return name_index.search(q, limit)
+
+MAX_NEAREST = 100
+
+@app.get('/institutions/near', response_model=List[NearbyInstitutionModel])
+def get_nearest_institutions(
+        lat: float = Query(..., ge=-90, le=90, description="Latitude in degrees"),
+        lon: float = Query(..., ge=-180, le=180, description="Longitude in degrees"),
+        k: int = Query(10, ge=1, le=MAX_NEAREST, description="Maximum number of institutions to return"),
+        radius_km: Optional[float] = Query(None, gt=0, description="Only return institutions within this distance")):
+    return geo_index.nearest(lat, lon, k, radius_km)
+
+@app.get('/institutions/changes', response_model=InstitutionChangesResponseModel)
+def get_institution_changes(
+        since: Optional[str] = Query(None, description="The cursor of the previous page, from the beginning if omitted"),
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of changes to return")):
+    """ Institutions created, updated or invalidated since the cursor, the latest change to each in commit order """
+    return db.get_institution_changes(since, limit)
+
+@app.get('/institutions/events')
+async def stream_institution_events(
+        since: Optional[str] = Query(None, description="A change feed cursor to start after, the latest change by default"),
+        last_event_id: Optional[str] = Header(None, description="Sent by EventSource when reconnecting, overrides since")):
+    """ Server-sent events for each institution created, updated or invalidated, resumable with Last-Event-ID """
+    since = last_event_id or since
+    if since:
+        db.decode_change_cursor(since)
+    return StreamingResponse(change_broadcaster.stream(since), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get('/institutions/by-ror/{ror_id:path}', response_model=InstitutionBaseModel)
+def get_institution_by_ror_id(ror_id: str):
+    return db.get_institution_by_identifier(db.ROR_ID_TYPE, ror_id)
+
+@app.get('/institutions/by-unitid/{unitid}', response_model=InstitutionBaseModel)
+def get_institution_by_unitid(unitid: str):
+    return db.get_institution_by_identifier(db.UNIT_ID_TYPE, unitid)
+
+@app.post('/institutions/lookup', response_model=InstitutionLookupResponseModel)
+def lookup_institutions(lookup: InstitutionLookupRequestModel):
+    if len(lookup.ror_ids) + len(lookup.unitids) > MAX_PAGE_SIZE:
+        raise HTTPException(400, f"At most {MAX_PAGE_SIZE} identifiers can be looked up at once")
+    return InstitutionLookupResponseModel(
+        ror_ids=db.get_institutions_by_identifier(db.ROR_ID_TYPE, lookup.ror_ids) if lookup.ror_ids else {},
+        unitids=db.get_institutions_by_identifier(db.UNIT_ID_TYPE, lookup.unitids) if lookup.unitids else {},
+    )
 
 @app.get('/institutions/{institution_id}')
-def get_institution_details(institution_id: str):
-    return db.get_institution_details(institution_id)
+async def get_institution_details(institution_id: str, request: Request):
+    if ASYNC_DB_READS:
+        watermark = await db.get_institution_watermark_async(institution_id)
+    else:
+        watermark = await run_in_threadpool(db.get_institution_watermark, institution_id)
+    if is_not_modified(request, watermark.etag, watermark.last_modified):
+        return not_modified_response(validator_headers(watermark.etag, watermark.last_modified))
+
+    # The validators sent with the body come from the row it was encoded from, a write committed since the
+    # watermark was read must not pair one version's validators with another's body
+    if ASYNC_DB_READS:
+        details = await db.get_institution_details_json_async(institution_id)
+    else:
+        details = await run_in_threadpool(db.get_institution_details_json, institution_id)
+    watermark = details.watermark
+    headers = validator_headers(watermark.etag, watermark.last_modified)
+    if is_not_modified(request, watermark.etag, watermark.last_modified):
+        return not_modified_response(headers)
+    return Response(details.body, media_type="application/json", headers=headers)
 
 
 @app.post('/institutions')
@@ -45,6 +345,13 @@ def post_institution(institution: InstitutionValidatorModel, request: Request):
     db.add_institution(institution, OIDCUserInfo(request))
     return "ok"
 
+@app.post('/institutions/bulk', response_model=BulkInstitutionResponseModel)
+def post_institutions_bulk(request: Request,
+                           institutions: List[InstitutionBaseModel] = Body(..., min_length=1),
+                           partial: bool = Query(False, description="Commit the items that succeed even if others fail")):
+    result = db.bulk_upsert_institutions(institutions, OIDCUserInfo(request), partial)
+    return JSONResponse(result.model_dump(), status_code=200 if result.committed else 400)
+
 @app.put('/institutions/{institution_id}')
 def update_institution(institution_id: str, institution: InstitutionValidatorModel, request: Request):
     db.update_institution(institution_id, institution, OIDCUserInfo(request))
@@ -55,6 +362,8 @@ def invalidate_institution(institution_id: str, request: Request):
     db.invalidate_institution(institution_id, OIDCUserInfo(request))
     return "ok"
 
+startup_stats.finish_import()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8089)
@@ -0,0 +1,252 @@
+# Benchmark the institution read and write paths, directly and through the FastAPI app, on synthetic data
+#
+#     python -m institutions_api.benchmarks.endpoints --sizes 1000 10000 100000 --output results.json
+#     python -m institutions_api.benchmarks.endpoints --baseline results.json
+#
+# Runs against an in-memory SQLite database unless --url points at a scratch database, whose tables are
+# dropped and recreated for every size. Each size is seeded with synthetic institutions that all have a
+# ROR ID, a unit ID, IPEDS metadata and Carnegie classifications.
+#
+# Prints, and optionally writes, a JSON report with the median and p95 latency in milliseconds and the
+# sequential throughput of every operation. Given a --baseline report, every median is compared against it,
+# and the exit status is 1 if any got slower by more than --tolerance.
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+from institutions_api.app import app
+from institutions_api.db import db
+from institutions_api.db.db_models import (
+    Base,
+    CarnegieClassification,
+    CarnegieClassification2025,
+    Control,
+    IdentifierType,
+    Institution,
+    InstitutionCarnegieClassificationMetadata,
+    InstitutionIdentifier,
+    InstitutionIPEDSMetadata,
+    InstitutionSize,
+    ProgramLength,
+    utcnow,
+)
+from institutions_api.db.serialization import fragment_cache
+from institutions_api.models.api_models import InstitutionValidatorModel
+from institutions_api.util.oidc_utils import OIDCUserInfo
+
+AUTHOR_HEADERS = {"oidc_claim_osgid": "benchmark"}
+
+
+def _short_id(i: int) -> str:
+    return f"bench{i:07d}"
+
+
+def _seed(session, size: int, chunk_size: int = 10000):
+    """ Insert identifier types and size synthetic institutions with identifiers and metadata """
+    ror_id_type, unit_id_type = IdentifierType(name=db.ROR_ID_TYPE), IdentifierType(name=db.UNIT_ID_TYPE)
+    session.add_all([ror_id_type, unit_id_type])
+    session.flush()
+
+    rng = random.Random(size)
+    controls, sizes, lengths = list(Control), list(InstitutionSize), list(ProgramLength)
+    classifications2021, classifications2025 = list(CarnegieClassification), list(CarnegieClassification2025)
+    for chunk_start in range(0, size, chunk_size):
+        rows = {Institution: [], InstitutionIdentifier: [], InstitutionIPEDSMetadata: [],
+                InstitutionCarnegieClassificationMetadata: []}
+        for i in range(chunk_start, min(chunk_start + chunk_size, size)):
+            institution_id, unit_id_id = uuid4(), uuid4()
+            state = rng.choice(["WI", "IL", "CA", "NY", "TX", "MN"])
+            rows[Institution].append(dict(
+                id=institution_id, topology_identifier=f"{db.OSG_ID_PREFIX}{_short_id(i)}",
+                name=f"Benchmark Institution {i:07d}", valid=True, latitude=rng.uniform(25, 49),
+                longitude=rng.uniform(-124, -67), state=state, created=utcnow(), created_by="benchmark"))
+            rows[InstitutionIdentifier].extend([
+                dict(id=uuid4(), institution_id=institution_id, identifier_type_id=ror_id_type.id,
+                     identifier=f"https://ror.org/0bench{i:07d}"),
+                dict(id=unit_id_id, institution_id=institution_id, identifier_type_id=unit_id_type.id,
+                     identifier=f"{100000 + i}"),
+            ])
+            rows[InstitutionIPEDSMetadata].append(dict(
+                id=uuid4(), institution_id=institution_id, institution_identifier_id=unit_id_id,
+                website_address=f"www.bench{i}.edu", historically_black_college_or_university=rng.random() < 0.05,
+                tribal_college_or_university=rng.random() < 0.02, program_length=rng.choice(lengths),
+                control=rng.choice(controls), state=state, institution_size=rng.choice(sizes)))
+            rows[InstitutionCarnegieClassificationMetadata].append(dict(
+                id=uuid4(), institution_id=institution_id, institution_identifier_id=unit_id_id,
+                classification2021=rng.choice(classifications2021), classification2025=rng.choice(classifications2025)))
+        for orm_class, new_rows in rows.items():
+            session.execute(insert(orm_class), new_rows)
+    session.commit()
+
+
+def _engine(url: str):
+    if url:
+        engine = create_engine(url)
+        Base.metadata.drop_all(engine)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _reset_caches():
+    """ Drop everything cached from the previous dataset """
+    db._institutions_changed()
+    fragment_cache.clear()
+
+
+def _measure(operation: Callable[[int], None], samples: int, before: Callable[[], None] = None) -> Dict[str, float]:
+    """ Latency percentiles and sequential throughput of operation(sample number), before runs untimed """
+    durations = []
+    for sample in range(samples):
+        if before:
+            before()
+        started = time.perf_counter()
+        operation(sample)
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {
+        "median_ms": round(statistics.median(durations) * 1000, 3),
+        "p95_ms": round(durations[max(int(len(durations) * 0.95) - 1, 0)] * 1000, 3),
+        "ops_per_second": round(len(durations) / sum(durations), 1),
+    }
+
+
+class _Samples:
+    """ Hands out distinct seeded institutions to write to, so no sample repeats another's work """
+
+    def __init__(self, size: int):
+        self._ids = random.Random(0).sample(range(size), size)
+
+    def take(self) -> str:
+        return _short_id(self._ids.pop())
+
+
+def _direct(size: int, samples: int, list_samples: int) -> Dict[str, dict]:
+    author = OIDCUserInfo(Request({"type": "http", "headers": [(b"oidc_claim_osgid", b"benchmark")]}))
+    targets = _Samples(size)
+    rng = random.Random(1)
+
+    def new_institution(sample: int) -> InstitutionValidatorModel:
+        return InstitutionValidatorModel(name=f"Direct {uuid4().hex}", latitude=43.07, longitude=-89.4, state="WI")
+
+    return {
+        "get_valid_institutions_rebuild": _measure(
+            lambda _: db.get_valid_institutions_json(), list_samples, before=db._institutions_changed),
+        "get_valid_institutions_cached": _measure(lambda _: db.get_valid_institutions_json(), samples),
+        "get_institution_details": _measure(
+            lambda _: db.get_institution_details_json(_short_id(rng.randrange(size))), samples),
+        "add_institution": _measure(lambda s: db.add_institution(new_institution(s), author), samples),
+        "update_institution": _measure(
+            lambda s: db.update_institution(targets.take(), new_institution(s), author), samples),
+        "invalidate_institution": _measure(lambda _: db.invalidate_institution(targets.take(), author), samples),
+    }
+
+
+def _through_app(size: int, samples: int, list_samples: int) -> Dict[str, dict]:
+    # The lifespan is not entered, so no background cache warm-up competes with the measurements
+    client = TestClient(app)
+    targets = _Samples(size)
+    rng = random.Random(2)
+
+    def request(method: str, url: str, **kwargs):
+        response = client.request(method, url, **kwargs)
+        assert response.status_code < 400, f"{method} {url} returned {response.status_code}: {response.text}"
+
+    def new_institution() -> dict:
+        return {"name": f"App {uuid4().hex}", "latitude": 43.07, "longitude": -89.4, "state": "WI"}
+
+    return {
+        "get_valid_institutions_rebuild": _measure(
+            lambda _: request("GET", "/institution_ids"), list_samples, before=db._institutions_changed),
+        "get_valid_institutions_cached": _measure(lambda _: request("GET", "/institution_ids"), samples),
+        "get_institution_details": _measure(
+            lambda _: request("GET", f"/institutions/{_short_id(rng.randrange(size))}"), samples),
+        "add_institution": _measure(
+            lambda _: request("POST", "/institutions", json=new_institution(), headers=AUTHOR_HEADERS), samples),
+        "update_institution": _measure(
+            lambda _: request("PUT", f"/institutions/{targets.take()}", json=new_institution(), headers=AUTHOR_HEADERS),
+            samples),
+        "invalidate_institution": _measure(
+            lambda _: request("DELETE", f"/institutions/{targets.take()}", headers=AUTHOR_HEADERS), samples),
+    }
+
+
+def run(sizes: List[int], samples: int, list_samples: int, url: str = None) -> dict:
+    results = {}
+    for size in sorted(sizes):
+        engine = _engine(url)
+        with sessionmaker(bind=engine)() as session:
+            _seed(session, size)
+        db.use_engine(engine)
+        _reset_caches()
+
+        # Each writing operation takes samples distinct seeded institutions, from both the direct and app runs
+        if 4 * samples > size:
+            raise ValueError(f"At most {size // 4} samples can be taken from {size} institutions")
+        results[str(size)] = {"direct": _direct(size, samples, list_samples), "app": _through_app(size, samples, list_samples)}
+        engine.dispose()
+    return {
+        "database": engine.dialect.name,
+        "samples": samples,
+        "list_samples": list_samples,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> dict:
+    """ Ratio of every median to the baseline's, and which of them regressed by more than the tolerance """
+    ratios, regressions = {}, []
+    for size, modes in report["results"].items():
+        for mode, operations in modes.items():
+            for operation, timings in operations.items():
+                base = baseline.get("results", {}).get(size, {}).get(mode, {}).get(operation)
+                if not base or not base["median_ms"]:
+                    continue
+                ratio = round(timings["median_ms"] / base["median_ms"], 3)
+                key = f"{size}/{mode}/{operation}"
+                ratios[key] = ratio
+                if ratio > 1 + tolerance:
+                    regressions.append(key)
+    return {"median_ratio_to_baseline": ratios, "regressions": regressions, "tolerance": tolerance}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the institution endpoints on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--samples", type=int, default=100, help="Timed runs per operation")
+    parser.add_argument("--list-samples", type=int, default=5, help="Timed full list rebuilds per size")
+    parser.add_argument("--url", help="Scratch database URL, its tables are dropped. Defaults to in-memory SQLite")
+    parser.add_argument("--output", help="Also write the report to this file")
+    parser.add_argument("--baseline", help="A previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.samples, args.list_samples, args.url)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Benchmark OSG ID allocation and single institution insert latency as the institution table grows
+#
+#     python -m institutions_api.benchmarks.osg_id_allocation --sizes 1000 10000 100000 1000000
+#
+# Runs against an in-memory SQLite database unless --url points at a scratch database, which will be
+# filled with synthetic institutions. Prints a JSON report with per-size latencies in milliseconds.
+
+import argparse
+import json
+import statistics
+import time
+from uuid import uuid4
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from institutions_api.db import db
+from institutions_api.db.db_models import Base, Institution
+
+
+def _seed(session, start: int, stop: int, chunk_size: int = 10000):
+    """ Insert synthetic institutions numbered [start, stop) """
+    for chunk_start in range(start, stop, chunk_size):
+        session.execute(insert(Institution), [
+            dict(id=uuid4(), topology_identifier=f"{db.OSG_ID_PREFIX}bench{i:07d}", name=f"Benchmark Institution {i:07d}",
+                 valid=True, created_by="benchmark")
+            for i in range(chunk_start, min(chunk_start + chunk_size, stop))
+        ])
+    session.commit()
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def _time_inserts(session_factory, samples: int):
+    """ Time allocating an ID and inserting a single institution """
+    allocate, total = [], []
+    for _ in range(samples):
+        with session_factory() as session:
+            started = time.perf_counter()
+            topology_id = db._get_unused_osg_id(session)
+            allocated = time.perf_counter()
+            session.add(Institution(f"Benchmark Insert {uuid4()}", None, None, None, topology_id, "benchmark"))
+            session.commit()
+            finished = time.perf_counter()
+        allocate.append(allocated - started)
+        total.append(finished - started)
+    return {"allocate": _percentiles(allocate), "insert": _percentiles(total)}
+
+
+def _time_full_scan(session_factory, samples: int):
+    """ Time the previous allocator's approach of loading every topology_identifier """
+    durations = []
+    for _ in range(samples):
+        with session_factory() as session:
+            started = time.perf_counter()
+            set(session.scalars(select(Institution.topology_identifier)).all())
+            durations.append(time.perf_counter() - started)
+    return _percentiles(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OSG ID allocation as the institution table grows")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--samples", type=int, default=200, help="Inserts timed per table size")
+    parser.add_argument("--url", help="Scratch database URL, defaults to in-memory SQLite")
+    args = parser.parse_args()
+
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    report = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        with session_factory() as session:
+            _seed(session, seeded, size)
+        seeded = size
+        report.append({
+            "rows": size,
+            **_time_inserts(session_factory, args.samples),
+            "previous_full_scan": _time_full_scan(session_factory, min(args.samples, 5)),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
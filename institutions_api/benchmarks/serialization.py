@@ -0,0 +1,113 @@
+# Benchmark serializing the institution list through pydantic against the cached fragment path
+#
+#     python -m institutions_api.benchmarks.serialization --sizes 10000 100000
+#
+# Builds synthetic institutions with identifiers and metadata in memory, so only serialization is measured.
+# Prints a JSON report with per-size timings in milliseconds for:
+#   pydantic:        from_institution for every row, then one TypeAdapter dump_json, the previous list path
+#   fragments_cold:  every row encoded with orjson into an empty fragment cache
+#   fragments_warm:  every fragment cached, the list is only assembled, as after a write to one institution
+#   detail_pydantic / detail_fragment: a single institution, per call
+#   <encoding>_bytes / <encoding>_ms: size of the list in each supported content coding, and the time taken to
+#                    compress it, paid once per data version
+
+import argparse
+import json
+import statistics
+import time
+from typing import List
+from uuid import uuid4
+
+from institutions_api.db import db
+from institutions_api.db.db_models import (
+    CarnegieClassification,
+    CarnegieClassification2025,
+    Control,
+    Institution,
+    InstitutionCarnegieClassificationMetadata,
+    InstitutionIdentifier,
+    InstitutionIPEDSMetadata,
+    InstitutionSize,
+    ProgramLength,
+)
+from institutions_api.db.identifier_types import IdentifierTypeRef
+from institutions_api.db.serialization import InstitutionFragmentCache, json_array
+from institutions_api.models.api_models import InstitutionBaseModel
+from institutions_api.util.content_encoding import ENCODINGS, compress
+
+ROR_ID_TYPE = IdentifierTypeRef(uuid4(), db.ROR_ID_TYPE)
+UNIT_ID_TYPE = IdentifierTypeRef(uuid4(), db.UNIT_ID_TYPE)
+IDENTIFIER_TYPE_NAMES = {ROR_ID_TYPE.id: ROR_ID_TYPE.name, UNIT_ID_TYPE.id: UNIT_ID_TYPE.name}
+
+
+def _institutions(count: int) -> List[Institution]:
+    """ Synthetic institutions, each with a ROR ID, a unit ID and both kinds of metadata """
+    institutions = []
+    for i in range(count):
+        inst = Institution(f"Benchmark Institution {i:07d}", 40 + (i % 1000) / 100, -90 + (i % 997) / 100, "WI",
+                           f"{db.OSG_ID_PREFIX}bench{i:07d}", "benchmark")
+        inst.identifiers = [
+            InstitutionIdentifier(ROR_ID_TYPE, f"https://ror.org/0{i:08d}"),
+            InstitutionIdentifier(UNIT_ID_TYPE, f"{100000 + i % 900000}"),
+        ]
+        inst.ipeds_metadata = InstitutionIPEDSMetadata(
+            website_address=f"www.bench{i}.edu", historically_black_college_or_university=False,
+            tribal_college_or_university=False, program_length=ProgramLength.FOUR_OR_MORE_YEARS,
+            control=Control.PRIVATE_NONPROFIT, state="WI", institution_size=InstitutionSize.BETWEEN_1000_AND_4999)
+        inst.carnegie_metadata = InstitutionCarnegieClassificationMetadata(
+            classification2021=CarnegieClassification.DOCTORAL_VERY_HI_RESEARCH,
+            classification2025=CarnegieClassification2025.RESEARCH_1)
+        institutions.append(inst)
+    return institutions
+
+
+def _median_ms(run, samples: int) -> float:
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - started)
+    return round(statistics.median(durations) * 1000, 3)
+
+
+def _pydantic_list(institutions: List[Institution]) -> bytes:
+    models = [InstitutionBaseModel.from_institution(i, IDENTIFIER_TYPE_NAMES) for i in institutions]
+    return db._institution_list_adapter.dump_json(models)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark institution serialization through pydantic and cached fragments")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--samples", type=int, default=5, help="Timed runs per measurement, the median is reported")
+    args = parser.parse_args()
+
+    report = []
+    for size in args.sizes:
+        institutions = _institutions(size)
+        warm_cache = InstitutionFragmentCache()
+        body = json_array(warm_cache.fragments(institutions, IDENTIFIER_TYPE_NAMES))
+        assert body == _pydantic_list(institutions), "fragment and pydantic serializations differ"
+
+        one = institutions[size // 2]
+        compressed = {}
+        for encoding in ENCODINGS:
+            compressed[f"{encoding}_bytes"] = len(compress(body, encoding))
+            compressed[f"{encoding}_ms"] = _median_ms(lambda: compress(body, encoding), 1)
+        report.append({
+            "rows": size,
+            "body_bytes": len(body),
+            "pydantic_ms": _median_ms(lambda: _pydantic_list(institutions), args.samples),
+            "fragments_cold_ms": _median_ms(
+                lambda: json_array(InstitutionFragmentCache().fragments(institutions, IDENTIFIER_TYPE_NAMES)), args.samples),
+            "fragments_warm_ms": _median_ms(
+                lambda: json_array(warm_cache.fragments(institutions, IDENTIFIER_TYPE_NAMES)), args.samples),
+            "detail_pydantic_ms": _median_ms(
+                lambda: InstitutionBaseModel.from_institution(one, IDENTIFIER_TYPE_NAMES).model_dump_json(), 1000),
+            "detail_fragment_ms": _median_ms(lambda: warm_cache.fragment(one, IDENTIFIER_TYPE_NAMES), 1000),
+            **compressed,
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
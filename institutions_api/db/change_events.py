@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from bisect import bisect_right
+from os import environ
+from typing import AsyncIterator, Callable, List, Optional, Set, TypeVar
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+
+from institutions_api.db import db
+from institutions_api.models.api_models import InstitutionChangeModel, InstitutionChangesResponseModel
+
+logger = logging.getLogger("default")
+
+KEEPALIVE = b": keepalive\n\n"
+
+T = TypeVar("T")
+
+
+def _event(change: InstitutionChangeModel) -> bytes:
+    """ A server-sent event for a change, identified by its cursor so clients resume with Last-Event-ID """
+    data = orjson.dumps(change.model_dump(mode="json", include={"id", "kind", "changed"}))
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (change.cursor.encode(), change.kind.encode(), data)
+
+
+def _on_primary(read: Callable[..., T], *args) -> T:
+    """ Run a read on the primary. The broadcaster reads right after local commits and publishes what it finds as
+    new, so a lagging replica would delay events and, for the starting head, replay old changes
+    """
+    with db.read_from_primary():
+        return read(*args)
+
+
+class InstitutionChangeBroadcaster:
+    """ Fans institution changes out to server-sent event subscribers, all served from the asyncio loop.
+    New changes are read from the change feed once per process, right after a write in this process commits and
+    every poll interval for writes made by other processes, then kept in a bounded history shared by every
+    subscriber. Subscribers further behind than the history, like those resuming with an old Last-Event-ID,
+    catch up from the change feed themselves
+    """
+
+    def __init__(self, poll_seconds: float = 5.0, keepalive_seconds: float = 15.0, history: int = 1000,
+                 page_size: int = 500):
+        self.poll_seconds = poll_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.history = history
+        self.page_size = page_size
+        self.subscribers = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Task] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._read_again = False
+        # Set, then replaced, whenever new changes are published
+        self._published: Optional[asyncio.Event] = None
+        # Sequence numbers and events of recent changes. Every change after _floor is there, or a later change
+        # to the same institution is. _head is the last change read
+        self._seqs: List[int] = []
+        self._events: List[bytes] = []
+        self._floor = 0
+        self._head = 0
+
+    def institutions_changed(self, topology_ids: Set[str]):
+        """ Change listener, called from whichever thread committed the write """
+        loop = self._loop
+        if loop is None or not self.subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._read_changes)
+        except RuntimeError:
+            # The loop was closed since
+            pass
+
+    async def _start(self):
+        """ Bind to the running loop, starting from the latest committed change """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            await self.close()
+            self._loop = loop
+            self._published = asyncio.Event()
+            self._ready = loop.create_task(self._read_head())
+            self._poller = loop.create_task(self._poll())
+        await asyncio.shield(self._ready)
+
+    async def _read_head(self):
+        head = await run_in_threadpool(_on_primary, db.get_latest_change_cursor)
+        self._head = self._floor = db.decode_change_cursor(head)
+
+    async def close(self):
+        """ Stop reading changes, subscribers are left to be closed by their own requests """
+        for task in (self._ready, self._poller, self._reader):
+            if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+                task.cancel()
+        self._loop = self._ready = self._poller = self._reader = None
+        self._seqs, self._events = [], []
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            if self.subscribers:
+                self._read_changes()
+
+    def _read_changes(self):
+        """ Read and publish the changes after the head, at most one read at a time """
+        if self._reader is not None and not self._reader.done():
+            self._read_again = True
+        else:
+            self._reader = self._loop.create_task(self._read())
+
+    async def _read(self):
+        await self._ready
+        self._read_again = True
+        while self._read_again:
+            self._read_again = False
+            try:
+                page = await run_in_threadpool(
+                    _on_primary, db.get_institution_changes, db.encode_change_cursor(self._head), self.page_size, False)
+            except Exception:
+                logger.exception("Reading institution changes failed")
+                return
+            self._publish(page)
+            self._read_again |= page.has_more
+
+    def _publish(self, page: InstitutionChangesResponseModel):
+        if not page.changes:
+            return
+        for change in page.changes:
+            self._seqs.append(db.decode_change_cursor(change.cursor))
+            self._events.append(_event(change))
+        self._head = self._seqs[-1]
+        # Trim in batches, so most publishes only append
+        if len(self._seqs) > 2 * self.history:
+            drop = len(self._seqs) - self.history
+            self._floor = self._seqs[drop - 1]
+            del self._seqs[:drop], self._events[:drop]
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+
+    async def stream(self, since: Optional[str] = None) -> AsyncIterator[bytes]:
+        """ Server-sent events for every change after the cursor, or after the latest one if there is none.
+        Sends a keepalive comment whenever nothing happened for keepalive_seconds
+        """
+        await self._start()
+        position = db.decode_change_cursor(since) if since else self._head
+        self.subscribers += 1
+        try:
+            while True:
+                published = self._published
+                if position < self._floor:
+                    # Catching up may read a lagging replica, it only returns fewer changes and is read again
+                    page = await run_in_threadpool(
+                        db.get_institution_changes, db.encode_change_cursor(position), self.page_size, False)
+                    for change in page.changes:
+                        yield _event(change)
+                    position = db.decode_change_cursor(page.cursor)
+                    if page.changes:
+                        continue
+                else:
+                    start = bisect_right(self._seqs, position)
+                    if start < len(self._seqs):
+                        events, position = self._events[start:], self._seqs[-1]
+                        for event in events:
+                            yield event
+                        continue
+                try:
+                    await asyncio.wait_for(published.wait(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+        finally:
+            self.subscribers -= 1
+
+
+# Writes made by other processes are picked up by polling, this bounds how late their events are
+change_broadcaster = InstitutionChangeBroadcaster(float(environ.get("CHANGE_EVENTS_POLL_SECONDS", "5")))
+db.add_change_listener(change_broadcaster.institutions_changed)
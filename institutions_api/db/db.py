@@ -1,48 +1,312 @@
 from psycopg2.sql import NULL
-from sqlalchemy import create_engine, select, delete
-from sqlalchemy.orm import sessionmaker, Session, joinedload
+from sqlalchemy import create_engine, select, delete, insert, func, or_, text, Engine, Select, tuple_
+from sqlalchemy.exc import StatementError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker, Session, joinedload, noload, selectinload
+from sqlalchemy.pool import Pool
 from os import environ
-from typing import Optional
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cached_property
+from threading import Lock
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+from datetime import datetime, timezone
 import urllib.parse
+import base64
+import binascii
+import json
+import orjson
+from pydantic import TypeAdapter, ValidationError
 from .db_models import *
-from .error_wrapper import sqlalchemy_http_exceptions
+from .error_wrapper import sqlalchemy_http_exceptions, database_error_message
+from .identifier_types import IdentifierTypeRef, identifier_type_registry
+from .pools import TimedAsyncAdaptedQueuePool, TimedQueuePool, TimedReplicaAsyncAdaptedQueuePool, TimedReplicaQueuePool
+from .serialization import fragment_cache, institution_dict, json_array
+from .snapshot import VersionedSnapshot
 from institutions_api.util.oidc_utils import OIDCUserInfo
-from institutions_api.models.api_models import InstitutionBaseModel,  OSG_ID_PREFIX, InstitutionValidatorModel
+from institutions_api.models.api_models import (
+    InstitutionBaseModel,
+    OSG_ID_PREFIX,
+    InstitutionValidatorModel,
+    BulkInstitutionResultModel,
+    BulkInstitutionResponseModel,
+    InstitutionChangeModel,
+    InstitutionChangesResponseModel,
+    ROR_ID_PREFIX
+)
 from secrets import choice
 from string import ascii_lowercase, digits
 from institutions_api.db.metadata_mappings import (
-    INSTITUTION_SIZE_MAPPING,
-    PROGRAM_LENGTH_MAPPING,
-    CONTROL_MAPPING,
     CARNEGIE_CLASSIFICATION_MAPPING,
-    RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING
+    RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING,
+    ipeds_metadata_values
 )
 # TODO not the best practice to return http errors from db layer
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
+from ..util.content_encoding import compress
 from ..util.load_ipeds_data import load_ipeds_data
 from ..util.load_carnegie_data import load_carnegie_data
 from ..util.load_carnegie_2025_data import load_carnegie_2025_data
 
-# DB connection based on secrets populated by the crunchydata postgres operator
-engine = create_engine(
-    f'postgresql://{environ["PG_USER"]}:{urllib.parse.quote_plus(environ["PG_PASSWORD"])}@{environ["PG_HOST"]}:{environ["PG_PORT"]}/{environ["PG_DATABASE"]}'
-)
+logger = logging.getLogger("default")
+
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_replica_engine: Optional[Engine] = None
+_async_replica_engine: Optional[AsyncEngine] = None
+_engine_lock = Lock()
+
+DbSession = sessionmaker()
+AsyncDbSession = async_sessionmaker(expire_on_commit=False)
+ReplicaDbSession = sessionmaker()
+AsyncReplicaDbSession = async_sessionmaker(expire_on_commit=False)
+
+# Host of a streaming replica, such as the crunchydata operator's replica service. Reads that may lag behind
+# writes go there when it is set, with the same credentials, database and, unless PG_REPLICA_PORT is set, port
+PG_REPLICA_HOST = environ.get("PG_REPLICA_HOST")
+
+# Set while handling requests whose reads must see their client's latest writes, see read_from_primary
+_read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+def _database_url(driver: str, host: Optional[str] = None, port: Optional[str] = None) -> str:
+    """ DB connection based on secrets populated by the crunchydata postgres operator """
+    return f'{driver}://{environ["PG_USER"]}:{urllib.parse.quote_plus(environ["PG_PASSWORD"])}@{host or environ["PG_HOST"]}:{port or environ["PG_PORT"]}/{environ["PG_DATABASE"]}'
+
+def _replica_url(driver: str) -> str:
+    return _database_url(driver, PG_REPLICA_HOST, environ.get("PG_REPLICA_PORT"))
+
+def _pool_options() -> dict:
+    """ Connection pool settings from the environment, SQLAlchemy's defaults for any that are unset """
+    options = {"pool_pre_ping": environ.get("PG_POOL_PRE_PING", "").lower() in ("1", "true", "yes")}
+    for variable, option, parse in [
+        ("PG_POOL_SIZE", "pool_size", int),
+        ("PG_MAX_OVERFLOW", "max_overflow", int),
+        ("PG_POOL_TIMEOUT", "pool_timeout", float),
+        ("PG_POOL_RECYCLE", "pool_recycle", int),
+    ]:
+        if environ.get(variable):
+            options[option] = parse(environ[variable])
+    return options
+
+def _statement_timeout_ms() -> Optional[int]:
+    """ Server side limit on the run time of each statement, PG_STATEMENT_TIMEOUT_MS """
+    return int(environ["PG_STATEMENT_TIMEOUT_MS"]) if environ.get("PG_STATEMENT_TIMEOUT_MS") else None
+
+def _create_engine(url: str, poolclass: type) -> Engine:
+    timeout = _statement_timeout_ms()
+    connect_args = {"options": f"-c statement_timeout={timeout}"} if timeout is not None else {}
+    return create_engine(url, poolclass=poolclass, connect_args=connect_args, **_pool_options())
+
+def _create_async_engine(url: str, poolclass: type) -> AsyncEngine:
+    timeout = _statement_timeout_ms()
+    connect_args = {"server_settings": {"statement_timeout": str(timeout)}} if timeout is not None else {}
+    return create_async_engine(url, poolclass=poolclass, connect_args=connect_args, **_pool_options())
+
+def get_engine() -> Engine:
+    """ Get the database engine, creating it on first use so importing this module never touches the DB """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine(_database_url('postgresql'), TimedQueuePool)
+                DbSession.configure(bind=_engine)
+    return _engine
+
+def get_replica_engine() -> Engine:
+    """ Get the engine for reads that may lag behind writes, the primary's unless a replica is configured """
+    global _replica_engine
+    if _replica_engine is None:
+        if not PG_REPLICA_HOST:
+            return get_engine()
+        with _engine_lock:
+            if _replica_engine is None:
+                _replica_engine = _create_engine(_replica_url('postgresql'), TimedReplicaQueuePool)
+                ReplicaDbSession.configure(bind=_replica_engine)
+    return _replica_engine
+
+def use_engine(engine: Engine):
+    """ Run every query on an existing engine instead of the configured databases, e.g. a scratch database for benchmarks """
+    global _engine, _replica_engine
+    with _engine_lock:
+        _engine = _replica_engine = engine
+        DbSession.configure(bind=engine)
+        ReplicaDbSession.configure(bind=engine)
+
+def get_async_engine() -> AsyncEngine:
+    """ Get the asyncio database engine used by the async read path, creating it on first use """
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = _create_async_engine(_database_url('postgresql+asyncpg'), TimedAsyncAdaptedQueuePool)
+                AsyncDbSession.configure(bind=_async_engine)
+    return _async_engine
+
+def get_async_replica_engine() -> AsyncEngine:
+    """ Get the asyncio engine for reads that may lag behind writes, the primary's unless a replica is configured """
+    global _async_replica_engine
+    if _async_replica_engine is None:
+        if not PG_REPLICA_HOST:
+            return get_async_engine()
+        with _engine_lock:
+            if _async_replica_engine is None:
+                _async_replica_engine = _create_async_engine(_replica_url('postgresql+asyncpg'), TimedReplicaAsyncAdaptedQueuePool)
+                AsyncReplicaDbSession.configure(bind=_async_replica_engine)
+    return _async_replica_engine
+
+async def dispose_async_engine():
+    """ Close the async engines' connections, if they were ever created """
+    for engine in (_async_engine, _async_replica_engine):
+        if engine is not None:
+            await engine.dispose()
+
+def engine_pools() -> Dict[str, Pool]:
+    """ Connection pool of each engine created so far, by engine name """
+    engines = {
+        "sync": _engine,
+        "async": _async_engine.sync_engine if _async_engine else None,
+        "replica": _replica_engine if _replica_engine is not _engine else None,
+        "async_replica": _async_replica_engine.sync_engine if _async_replica_engine else None,
+    }
+    return {name: engine.pool for name, engine in engines.items() if engine is not None}
+
+def __getattr__(name: str):
+    # Scripts such as the migrations import the engine as a module attribute
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@contextmanager
+def read_from_primary():
+    """ Send every read made within this context to the primary, so it sees writes the replica may not have yet """
+    token = _read_from_primary.set(True)
+    try:
+        yield
+    finally:
+        _read_from_primary.reset(token)
 
-Base.metadata.create_all(engine)
+def _session() -> Session:
+    """ Open a session on the lazily created engine """
+    get_engine()
+    return DbSession()
 
-DbSession = sessionmaker(bind=engine)
+def _read_session() -> Session:
+    """ Open a session for reads that may lag behind writes, on the replica if there is one """
+    if _read_from_primary.get() or get_replica_engine() is _engine:
+        return _session()
+    return ReplicaDbSession()
+
+def _async_session() -> AsyncSession:
+    """ Open an asyncio session on the lazily created async engine """
+    get_async_engine()
+    return AsyncDbSession()
+
+def _async_read_session() -> AsyncSession:
+    """ Open an asyncio session for reads that may lag behind writes, on the replica if there is one """
+    if _read_from_primary.get() or get_async_replica_engine() is _async_engine:
+        return _async_session()
+    return AsyncReplicaDbSession()
+
+def create_schema():
+    """ Create any tables missing from the database. Only run when explicitly requested at startup """
+    Base.metadata.create_all(get_engine())
 
 ROR_ID_TYPE = 'ror_id'
 UNIT_ID_TYPE = 'unitid'
 
-def _ror_id_type(session: Session) -> IdentifierType:
-    """ Get the IdentifierType entity that corresponds to ROR ID """
-    return session.scalars(select(IdentifierType).where(IdentifierType.name == ROR_ID_TYPE)).first()
 
-def _unit_id_type(session: Session) -> IdentifierType:
-    """ Get the IdentifierType entity that corresponds to unit ID """
-    return session.scalars(select(IdentifierType).where(IdentifierType.name == UNIT_ID_TYPE)).first()
+class InstitutionListSnapshot:
+    """ The serialized list of valid institutions as of a single data version """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._encoded: Dict[str, bytes] = {}
+        self._encode_lock = Lock()
+
+    def encoded(self, encoding: Optional[str] = None) -> bytes:
+        """ The body in the given content coding, compressed at most once per data version """
+        if encoding is None:
+            return self.body
+        if (body := self._encoded.get(encoding)) is None:
+            with self._encode_lock:
+                if (body := self._encoded.get(encoding)) is None:
+                    body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+    @cached_property
+    def institutions(self) -> List[InstitutionBaseModel]:
+        """ API models of the institutions, parsed from the body on first use """
+        return _institution_list_adapter.validate_json(self.body)
+
+
+# Valid institution list shared by every request in this process, rebuilt after each write
+_valid_institutions = VersionedSnapshot[InstitutionListSnapshot]()
+_institution_list_adapter = TypeAdapter(List[InstitutionBaseModel])
+
+
+
+class InstitutionWatermark(NamedTuple):
+    """ Summary of institution rows that changes whenever any of them is written, without reading the rows """
+    count: int
+    last_modified: Optional[datetime]
+
+    @property
+    def etag(self) -> str:
+        """ Strong entity tag of the data as of this watermark """
+        modified = int(self.last_modified.timestamp() * 1_000_000) if self.last_modified else 0
+        return f'"{self.count:x}-{modified:x}"'
+
+
+# Watermark of the valid institution list, recomputed once per data version
+_valid_institutions_watermark = VersionedSnapshot[InstitutionWatermark]()
+
+# Called with the topology IDs of the institutions changed by each committed write
+_change_listeners: List[Callable[[Set[str]], None]] = []
+
+def add_change_listener(listener: Callable[[Set[str]], None]):
+    """ Register a callback for institution changes, used to keep derived in-memory indexes up to date """
+    _change_listeners.append(listener)
+
+add_change_listener(fragment_cache.institutions_changed)
+
+def _institutions_changed(topology_ids: Iterable[str] = ()):
+    """ Invalidate cached institution data. Must be called after a write is committed """
+    _valid_institutions.bump()
+    _valid_institutions_watermark.bump()
+    topology_ids = set(topology_ids)
+    for listener in _change_listeners:
+        try:
+            listener(topology_ids)
+        except Exception:
+            logger.exception("Institution change listener failed")
+
+def cache_stats() -> Dict[str, Tuple[int, int]]:
+    """ Hits and misses of the institution caches, a miss being a build or an encode """
+    return {
+        "valid_institutions": (_valid_institutions.hits, _valid_institutions.builds),
+        "valid_institutions_watermark": (_valid_institutions_watermark.hits, _valid_institutions_watermark.builds),
+        "institution_fragments": (fragment_cache.hits, fragment_cache.misses),
+    }
+
+def _identifier_type(session: Session, name: str) -> Optional[IdentifierTypeRef]:
+    """ Get the identifier type with the given name from the process-wide registry """
+    return identifier_type_registry(session).by_name(session, name)
+
+def _ror_id_type(session: Session) -> Optional[IdentifierTypeRef]:
+    """ Get the identifier type that corresponds to ROR ID """
+    return _identifier_type(session, ROR_ID_TYPE)
+
+def _unit_id_type(session: Session) -> Optional[IdentifierTypeRef]:
+    """ Get the identifier type that corresponds to unit ID """
+    return _identifier_type(session, UNIT_ID_TYPE)
+
+def _identifier_type_names(session: Session, institutions: Iterable[Institution]) -> Dict[UUID, str]:
+    """ Get identifier type names by id for serializing the given institutions, without loading each identifier's type """
+    return identifier_type_registry(session).names(
+        session, {i.identifier_type_id for inst in institutions for i in inst.identifiers})
 
 def _full_osg_id(short_id: str):
     """ Get the full osg-htc url of an institution based on its ID suffix """
@@ -52,19 +316,30 @@ def _short_osg_id(full_id: str):
     """ Get the full osg-htc url of an institution based on its ID suffix """
     return full_id.replace(OSG_ID_PREFIX, '')
 
-def _get_unused_osg_id(session: Session):
-    """ Generate an unused OSG ID """
-    MAX_TRIES = 1000 # Give up after hitting x collisions in a row
+def _get_unused_osg_ids(session: Session, count: int) -> List[str]:
+    """ Generate a batch of distinct, unused OSG IDs.
+    Only the random candidates are checked against the unique index on topology_identifier, one query per round,
+    so the cost depends on the batch size rather than the size of the table
+    """
+    MAX_TRIES = 1000 # Give up after this many rounds of candidates without filling the batch
     ID_LENGTH = 12
 
-    # TODO actually guaranteeing uniqueness here might be a bit overkill based on ID length
-    all_ids = set(session.scalars(select(Institution.topology_identifier)).all())
-    for _ in range(MAX_TRIES):
-        short_id = ''.join([choice(ascii_lowercase + digits) for _ in range(ID_LENGTH)])
-        next_id = f"{OSG_ID_PREFIX}{short_id}"
-        if not next_id in all_ids:
-            return next_id
-    raise HTTPException(500, "Unable to generate new unique ID")
+    new_ids = set()
+    tries = 0
+    while len(new_ids) < count:
+        tries += 1
+        if tries > MAX_TRIES:
+            raise HTTPException(500, "Unable to generate new unique ID")
+        candidates = {f"{OSG_ID_PREFIX}{''.join(choice(ascii_lowercase + digits) for _ in range(ID_LENGTH))}"
+                      for _ in range(count - len(new_ids))} - new_ids
+        taken = set(session.scalars(select(Institution.topology_identifier)
+            .where(Institution.topology_identifier.in_(candidates))).all())
+        new_ids |= candidates - taken
+    return list(new_ids)
+
+def _get_unused_osg_id(session: Session):
+    """ Generate an unused OSG ID """
+    return _get_unused_osg_ids(session, 1)[0]
 
 def _check_for_deactivated_institution(session: Session, name: str) -> Optional[str]:
     """ Check if a deactivated institution with the given name exists. Return its short ID if so.
@@ -73,35 +348,373 @@ def _check_for_deactivated_institution(session: Session, name: str) -> Optional[
     deactivated_inst = session.scalar(select(Institution).where(Institution.valid == False).where(Institution.name == name))
     return _short_osg_id(deactivated_inst.topology_identifier) if deactivated_inst else None
 
+def _valid_institutions_query() -> Select:
+    """ Every valid institution sorted by name, with everything needed to serialize it eagerly loaded """
+    return (select(Institution)
+        .where(Institution.valid)
+        .order_by(Institution.name)
+        .options(joinedload(Institution.identifiers))
+        .options(joinedload(Institution.ipeds_metadata))
+        .options(joinedload(Institution.carnegie_metadata)))
+
+def _institution_details_query(short_id: str) -> Select:
+    """ A single institution by ID, with everything needed to serialize it eagerly loaded """
+    return (select(Institution)
+        .where(Institution.topology_identifier == _full_osg_id(short_id))
+        .options(joinedload(Institution.identifiers)))
+
+def _institution_list_snapshot(institutions: List[Institution], identifier_type_names: Dict[UUID, str]) -> InstitutionListSnapshot:
+    """ Assemble the list body from cached per-institution fragments, only institutions written since they were
+    last serialized are encoded again
+    """
+    return InstitutionListSnapshot(json_array(fragment_cache.fragments(institutions, identifier_type_names)))
+
+def _load_valid_institutions() -> InstitutionListSnapshot:
+    """ Query and serialize every valid institution """
+    with (_session() as session):
+        institutions = session.scalars(_valid_institutions_query()).unique().all()
+        return _institution_list_snapshot(institutions, _identifier_type_names(session, institutions))
+
+async def _load_valid_institutions_async() -> InstitutionListSnapshot:
+    """ Query and serialize every valid institution without blocking the event loop on the DB """
+    async with _async_session() as session:
+        institutions = (await session.scalars(_valid_institutions_query())).unique().all()
+        return _institution_list_snapshot(institutions, await session.run_sync(_identifier_type_names, institutions))
+
 @sqlalchemy_http_exceptions
 def get_valid_institutions() -> List[InstitutionBaseModel]:
     """ Get a sorted list of every valid institution """
-    with (DbSession() as session):
-        institutions = session.scalars(select(Institution)
-            .where(Institution.valid)
-            .order_by(Institution.name)
-            .options(joinedload(Institution.identifiers))
-            .options(joinedload(Institution.ipeds_metadata))
-            .options(joinedload(Institution.carnegie_metadata))
-        ).unique().all()
-        return [InstitutionBaseModel.from_institution(i) for i in institutions]
+    return list(_valid_institutions.get_or_build(_load_valid_institutions).institutions)
+
+@sqlalchemy_http_exceptions
+def get_valid_institutions_json(encoding: Optional[str] = None) -> bytes:
+    """ Get the JSON encoded, sorted list of every valid institution, optionally in a compressed content coding """
+    return _valid_institutions.get_or_build(_load_valid_institutions).encoded(encoding)
+
+@sqlalchemy_http_exceptions
+async def get_valid_institutions_json_async(encoding: Optional[str] = None) -> bytes:
+    """ Get the JSON encoded, sorted list of every valid institution via the async engine, optionally in a
+    compressed content coding. Compression runs on the threadpool, off the event loop
+    """
+    snapshot = await _valid_institutions.get_or_build_async(_load_valid_institutions_async)
+    if encoding is None:
+        return snapshot.body
+    return await run_in_threadpool(snapshot.encoded, encoding)
+
+def _utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """ Timestamps are stored without a time zone, in UTC as written by utcnow() """
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp is not None and timestamp.tzinfo is None else timestamp
+
+def _watermark_query() -> Select:
+    """ Number of valid institutions and the latest time any institution, valid or not, was created or written.
+    Every write path sets Institution.updated, so this moves on creates, updates and invalidations alike
+    """
+    return select(func.count().filter(Institution.valid), func.max(func.coalesce(Institution.updated, Institution.created)))
+
+@sqlalchemy_http_exceptions
+def get_valid_institutions_watermark() -> InstitutionWatermark:
+    """ Get the watermark of the valid institution list, to revalidate it without reading any institutions """
+    def build():
+        with _session() as session:
+            count, last_modified = session.execute(_watermark_query()).one()
+            return InstitutionWatermark(count, _utc(last_modified))
+    return _valid_institutions_watermark.get_or_build(build)
+
+@sqlalchemy_http_exceptions
+async def get_valid_institutions_watermark_async() -> InstitutionWatermark:
+    """ Get the watermark of the valid institution list via the async engine """
+    async def build():
+        async with _async_session() as session:
+            count, last_modified = (await session.execute(_watermark_query())).one()
+            return InstitutionWatermark(count, _utc(last_modified))
+    return await _valid_institutions_watermark.get_or_build_async(build)
+
+def _institution_watermark_query(short_id: str) -> Select:
+    return (select(Institution.updated, Institution.created)
+        .where(Institution.topology_identifier == _full_osg_id(short_id)))
+
+def _institution_watermark(row, short_id: str) -> InstitutionWatermark:
+    """ Watermark of a single institution from its row, or its timestamp columns """
+    if row is None:
+        raise HTTPException(404, f"No institution found with id {short_id}")
+    return InstitutionWatermark(1, _utc(row.updated or row.created))
+
+@sqlalchemy_http_exceptions
+def get_institution_watermark(short_id: str) -> InstitutionWatermark:
+    """ Get the watermark of a single institution from its timestamps alone """
+    with _read_session() as session:
+        return _institution_watermark(session.execute(_institution_watermark_query(short_id)).first(), short_id)
+
+@sqlalchemy_http_exceptions
+async def get_institution_watermark_async(short_id: str) -> InstitutionWatermark:
+    """ Get the watermark of a single institution via the async engine """
+    async with _async_read_session() as session:
+        return _institution_watermark((await session.execute(_institution_watermark_query(short_id))).first(), short_id)
+
+def iter_valid_institutions_json(ndjson: bool = False, batch_size: int = 500) -> Iterator[bytes]:
+    """ Stream every valid institution as JSON, one chunk per batch of rows read from a server-side cursor.
+    The session's identity map only holds weak references, so memory use does not grow with the size of the table.
+    Produces newline delimited JSON, or the same JSON array as get_valid_institutions_json
+    """
+    query = (select(Institution)
+        .where(Institution.valid)
+        .order_by(Institution.name)
+        # Collections can't be joined eagerly while yielding batches, select them per batch instead
+        .options(selectinload(Institution.identifiers))
+        .execution_options(yield_per=batch_size))
+
+    separator = b"\n" if ndjson else b","
+    first = True
+    if not ndjson:
+        yield b"["
+    with _read_session() as session:
+        for batch in session.scalars(query).partitions():
+            names = _identifier_type_names(session, batch)
+            # Not cached, the fragment cache keeps every institution it encodes for the life of the process
+            chunk = separator.join(orjson.dumps(institution_dict(i, names)) for i in batch)
+            if ndjson:
+                yield chunk + b"\n"
+            else:
+                yield chunk if first else b"," + chunk
+            first = False
+    if not ndjson:
+        yield b"]"
+
+# API fields that are plain institution columns, listing only these never joins the related tables
+INSTITUTION_COLUMN_FIELDS = {
+    "id": Institution.topology_identifier,
+    "name": Institution.name,
+    "latitude": Institution.latitude,
+    "longitude": Institution.longitude,
+    "state": Institution.state,
+}
+INSTITUTION_FIELDS = list(InstitutionBaseModel.model_fields)
+
+def _encode_cursor(name: str, topology_identifier: str) -> str:
+    """ Opaque keyset cursor pointing just past the given institution """
+    return base64.urlsafe_b64encode(json.dumps([name, topology_identifier]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        name, topology_identifier = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(name), str(topology_identifier)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+@sqlalchemy_http_exceptions
+def get_valid_institutions_page(limit: Optional[int] = None, cursor: Optional[str] = None,
+                                fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+    """ Get valid institutions ordered by (name, id), starting after the cursor, optionally projected to a subset
+    of fields. Returns the page and the cursor of the next page, if there is one
+    """
+    fields = fields or INSTITUTION_FIELDS
+    if unknown := [f for f in fields if f not in INSTITUTION_FIELDS]:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    fields = [f for f in INSTITUTION_FIELDS if f in fields]
+
+    column_only = all(f in INSTITUTION_COLUMN_FIELDS for f in fields)
+    if column_only:
+        query = select(*INSTITUTION_COLUMN_FIELDS.values())
+    else:
+        query = select(Institution).options(
+            joinedload(Institution.identifiers)
+                if {"ror_id", "unitid"} & set(fields) else noload(Institution.identifiers),
+            joinedload(Institution.ipeds_metadata) if "ipeds_metadata" in fields else noload(Institution.ipeds_metadata),
+            joinedload(Institution.carnegie_metadata) if "carnegie_metadata" in fields else noload(Institution.carnegie_metadata),
+        )
+
+    query = query.where(Institution.valid).order_by(Institution.name, Institution.topology_identifier)
+    if cursor:
+        query = query.where(tuple_(Institution.name, Institution.topology_identifier) > tuple_(*_decode_cursor(cursor)))
+    if limit:
+        # Fetch one extra row to find out whether there is a next page
+        query = query.limit(limit + 1)
+
+    with _read_session() as session:
+        if column_only:
+            rows = session.execute(query).all()
+            items = [{f: getattr(row, INSTITUTION_COLUMN_FIELDS[f].key) for f in fields} for row in rows]
+            keys = [(row.name, row.topology_identifier) for row in rows]
+        else:
+            rows = session.scalars(query).unique().all()
+            names = _identifier_type_names(session, rows)
+            items = [InstitutionBaseModel.from_institution(i, names).model_dump(mode="json", include=set(fields)) for i in rows]
+            keys = [(i.name, i.topology_identifier) for i in rows]
+
+    if limit and len(items) > limit:
+        return items[:limit], _encode_cursor(*keys[limit - 1])
+    return items, None
 
 @sqlalchemy_http_exceptions
 def get_institution_details(short_id: str) -> InstitutionBaseModel:
     """ Get an existing institution by ID """
-    with DbSession() as session:
-        institution = session.scalar(select(Institution)
-                .where(Institution.topology_identifier == _full_osg_id(short_id)))
+    with _read_session() as session:
+        institution = session.scalars(_institution_details_query(short_id)).unique().first()
 
         if institution is None:
             return HTTPException(404, f"No institution found with id {short_id}")
 
-        return InstitutionBaseModel.from_institution(institution)
+        return InstitutionBaseModel.from_institution(institution, _identifier_type_names(session, [institution]))
+
+class InstitutionDetailsJson(NamedTuple):
+    """ JSON encoded details of an institution along with the watermark of the row they were encoded from """
+    body: bytes
+    watermark: InstitutionWatermark
+
+def _institution_details_json(institution: Optional[Institution], short_id: str,
+                              identifier_type_names: Dict[UUID, str]) -> InstitutionDetailsJson:
+    watermark = _institution_watermark(institution, short_id)
+    return InstitutionDetailsJson(fragment_cache.fragment(institution, identifier_type_names), watermark)
+
+@sqlalchemy_http_exceptions
+def get_institution_details_json(short_id: str) -> InstitutionDetailsJson:
+    """ Get the JSON encoded details of an existing institution by ID, with the watermark they match """
+    with _read_session() as session:
+        institution = session.scalars(_institution_details_query(short_id)).unique().first()
+        names = _identifier_type_names(session, [institution] if institution else [])
+        return _institution_details_json(institution, short_id, names)
+
+@sqlalchemy_http_exceptions
+async def get_institution_details_json_async(short_id: str) -> InstitutionDetailsJson:
+    """ Get the JSON encoded details of an existing institution by ID via the async engine, with their watermark """
+    async with _async_read_session() as session:
+        institution = (await session.scalars(_institution_details_query(short_id))).unique().first()
+        names = await session.run_sync(_identifier_type_names, [institution] if institution else [])
+        return _institution_details_json(institution, short_id, names)
+
+def _normalize_identifier(type_name: str, identifier: str) -> str:
+    """ Stored form of an identifier. ROR IDs may be given with or without the https://ror.org/ prefix """
+    identifier = identifier.strip()
+    if type_name == ROR_ID_TYPE and not identifier.startswith(ROR_ID_PREFIX):
+        return f"{ROR_ID_PREFIX}{identifier}"
+    return identifier
+
+@sqlalchemy_http_exceptions
+def get_institutions_by_identifier(type_name: str, identifiers: List[str]) -> Dict[str, Optional[InstitutionBaseModel]]:
+    """ Resolve identifiers of the given type to the valid institutions holding them, in one indexed query.
+    Every requested identifier is in the result, mapped to None if no valid institution holds it
+    """
+    with _read_session() as session:
+        identifier_type = _identifier_type(session, type_name)
+        if identifier_type is None:
+            raise HTTPException(400, f"IdentifierType for '{type_name}' not found")
+
+        normalized = {i: _normalize_identifier(type_name, i) for i in identifiers}
+        rows = session.execute(select(InstitutionIdentifier.identifier, Institution)
+            .join(Institution, Institution.id == InstitutionIdentifier.institution_id)
+            .where(InstitutionIdentifier.identifier_type_id == identifier_type.id)
+            .where(InstitutionIdentifier.identifier.in_(set(normalized.values())))
+            .where(Institution.valid)
+            .options(joinedload(Institution.identifiers))
+            .options(joinedload(Institution.ipeds_metadata))
+            .options(joinedload(Institution.carnegie_metadata))).unique().all()
+
+        names = _identifier_type_names(session, [institution for _, institution in rows])
+        found = {identifier: InstitutionBaseModel.from_institution(institution, names) for identifier, institution in rows}
+        return {i: found.get(n) for i, n in normalized.items()}
+
+@sqlalchemy_http_exceptions
+def get_institutions_by_topology_id(topology_ids: Iterable[str]) -> Dict[str, Optional[InstitutionBaseModel]]:
+    """ Get valid institutions by full OSG ID. Every requested ID is in the result, mapped to None if there is
+    no valid institution with that ID
+    """
+    topology_ids = set(topology_ids)
+    with _session() as session:
+        institutions = session.scalars(select(Institution)
+            .where(Institution.topology_identifier.in_(topology_ids))
+            .where(Institution.valid)
+            .options(joinedload(Institution.identifiers))
+            .options(joinedload(Institution.ipeds_metadata))
+            .options(joinedload(Institution.carnegie_metadata))).unique().all()
+        names = _identifier_type_names(session, institutions)
+        found = {i.topology_identifier: InstitutionBaseModel.from_institution(i, names) for i in institutions}
+    return {i: found.get(i) for i in topology_ids}
+
+def get_institution_by_identifier(type_name: str, identifier: str) -> InstitutionBaseModel:
+    """ Get the valid institution holding an identifier of the given type """
+    institution = get_institutions_by_identifier(type_name, [identifier])[identifier]
+    if institution is None:
+        raise HTTPException(404, f"No institution found with {type_name} {identifier}")
+    return institution
+
+def encode_change_cursor(seq: int) -> str:
+    """ Opaque change feed cursor pointing just past the change with the given sequence number """
+    return base64.urlsafe_b64encode(str(seq).encode()).decode()
+
+def decode_change_cursor(cursor: str) -> int:
+    try:
+        seq = int(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    if seq < 0:
+        raise HTTPException(400, "Invalid cursor")
+    return seq
+
+@sqlalchemy_http_exceptions
+def get_institution_changes(since: Optional[str] = None, limit: int = 100,
+                            include_institutions: bool = True) -> InstitutionChangesResponseModel:
+    """ Get the latest change to each institution changed after the cursor, ordered by when it was committed,
+    with the current state of institutions that are still valid unless not asked to. Only the change log rows
+    after the cursor are read, so the cost follows the number of changes rather than the number of institutions
+    """
+    after = decode_change_cursor(since) if since else 0
+    latest = (select(func.max(InstitutionChange.seq).label("seq"))
+        .where(InstitutionChange.seq > after)
+        .group_by(InstitutionChange.topology_identifier)
+        .subquery())
+    # Fetch one extra row to find out whether there are more changes
+    query = (select(InstitutionChange)
+        .join(latest, InstitutionChange.seq == latest.c.seq)
+        .order_by(InstitutionChange.seq)
+        .limit(limit + 1))
+
+    with _read_session() as session:
+        changes = session.scalars(query).all()
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        changed_ids = [c.topology_identifier for c in changes
+                       if include_institutions and c.kind != InstitutionChangeKind.INVALIDATE]
+        institutions = session.scalars(select(Institution)
+            .where(Institution.topology_identifier.in_(changed_ids))
+            .where(Institution.valid)
+            .options(joinedload(Institution.identifiers))
+            .options(joinedload(Institution.ipeds_metadata))
+            .options(joinedload(Institution.carnegie_metadata))).unique().all() if changed_ids else []
+        names = _identifier_type_names(session, institutions)
+        current = {i.topology_identifier: InstitutionBaseModel.from_institution(i, names) for i in institutions}
+
+    return InstitutionChangesResponseModel(
+        changes=[InstitutionChangeModel(id=c.topology_identifier, kind=c.kind.value, changed=c.changed,
+                                        cursor=encode_change_cursor(c.seq),
+                                        institution=current.get(c.topology_identifier)) for c in changes],
+        cursor=encode_change_cursor(changes[-1].seq if changes else after),
+        has_more=has_more)
+
+@sqlalchemy_http_exceptions
+def get_latest_change_cursor() -> str:
+    """ Cursor pointing past every change committed so far """
+    with _read_session() as session:
+        return encode_change_cursor(session.scalar(select(func.max(InstitutionChange.seq))) or 0)
+
+def _record_changes(session: Session, changes: List[Tuple[str, InstitutionChangeKind]], author: OIDCUserInfo):
+    """ Add a change log row for each institution written in this transaction, after its rows are flushed.
+    On Postgres the change log stays locked against other writers until the transaction ends, so sequence numbers
+    are committed in order and a reader never moves its cursor past a change that is yet to be committed
+    """
+    if not changes:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("LOCK TABLE institution_change IN EXCLUSIVE MODE"))
+    changed = utcnow()
+    session.execute(insert(InstitutionChange), [
+        dict(topology_identifier=topology_id, kind=kind, changed=changed, changed_by=author.id)
+        for topology_id, kind in changes])
 
 @sqlalchemy_http_exceptions
 def add_institution(institution: InstitutionValidatorModel, author: OIDCUserInfo):
     """ Create a new institution """
-    with DbSession() as session:
+    with _session() as session:
         if deactivated_id := _check_for_deactivated_institution(session, institution.name):
             session.rollback()
             return update_institution(deactivated_id, institution, author)
@@ -117,7 +730,10 @@ def add_institution(institution: InstitutionValidatorModel, author: OIDCUserInfo
         if institution.unitid:
             _update_institution_unit_id(session, inst, institution.unitid)
 
+        session.flush()
+        _record_changes(session, [(topology_id, InstitutionChangeKind.CREATE)], author)
         session.commit()
+    _institutions_changed([topology_id])
 
 def _update_institution_ror_id(session: Session, institution: Institution, ror_id: str):
     """ Handle updates to an institution's joined InstitutionIdentifier of type 'ror_id'
@@ -131,13 +747,29 @@ def _update_institution_ror_id(session: Session, institution: Institution, ror_i
             .where(InstitutionIdentifier.identifier_type_id == ror_id_type.id))
     elif institution.has_id_of_type(ror_id_type):
         # Update the ROR ID for the institution if it exists
-        existing_ror_id = [i for i in institution.identifiers if i.identifier_type.id == ror_id_type.id][0]
+        existing_ror_id = [i for i in institution.identifiers if i.identifier_type_id == ror_id_type.id][0]
         existing_ror_id.identifier = ror_id
         session.add(existing_ror_id)
     else:
         # create a new ROR ID for the institution
         session.add(InstitutionIdentifier(ror_id_type, ror_id, institution.id))
 
+def _ipeds_data_row(unit_id: str) -> dict:
+    """ Get the IPEDS reference data for a unit ID """
+    ipeds_data_row = load_ipeds_data().get(unit_id)
+    if ipeds_data_row is None:
+        raise HTTPException(400, f"IPEDS data for unit ID {unit_id} not found")
+    return ipeds_data_row
+
+def _carnegie_metadata_values(unit_id: str) -> dict:
+    """ Map the Carnegie reference data for a unit ID to InstitutionCarnegieClassificationMetadata column values """
+    carnegie_data = load_carnegie_data().get(int(unit_id), {}).get("basic2021", None)
+    carnegie_2025_data = load_carnegie_2025_data().get(int(unit_id), {}).get("2025 Research Activity Designation", None)
+    return {
+        "classification2021": CARNEGIE_CLASSIFICATION_MAPPING.get(str(carnegie_data), None),
+        "classification2025": RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING.get(str(carnegie_2025_data), None),
+    }
+
 def _update_institution_unit_id(session: Session, institution: Institution, unit_id: str):
     """ Handle updates to an institution's joined InstitutionIdentifier of type 'unitid'
     based on the 'unitid' value passed in the API model
@@ -166,23 +798,17 @@ def _update_institution_unit_id(session: Session, institution: Institution, unit
 
     # There is a unitid passed in
     else:
-        ipeds_data = load_ipeds_data()  # load ipeds data
-        ipeds_data_row = ipeds_data.get(unit_id)
-
-        if ipeds_data_row is None:
-            raise HTTPException(400, f"IPEDS data for unit ID {unit_id} not found")
+        ipeds_data_row = _ipeds_data_row(unit_id)
 
         # Update the latitude and longitude for the institution
         if institution.latitude is None or institution.longitude is None:
             if "LATITUDE" in ipeds_data_row and "LONGITUD" in ipeds_data_row:
                 institution.latitude = float(ipeds_data_row.get('LATITUDE'))
                 institution.longitude = float(ipeds_data_row.get('LONGITUD'))
-                session.commit()
 
         # Update the state for the institution
         if institution.state is None:
             institution.state = ipeds_data_row.get('STABBR')
-            session.commit()
 
         # Check if the institution already has an unitid
         existing_unitid = [i for i in institution.identifiers if i.identifier_type_id == unit_id_type.id]
@@ -193,13 +819,8 @@ def _update_institution_unit_id(session: Session, institution: Institution, unit
             session.add(existing_unitid[0])
 
             ipeds_metadata = institution.ipeds_metadata
-            ipeds_metadata.website_address = ipeds_data_row['WEBADDR']
-            ipeds_metadata.historically_black_college_or_university = ipeds_data_row.get('HBCU') == 1
-            ipeds_metadata.tribal_college_or_university = ipeds_data_row.get('TRIBAL') == 1
-            ipeds_metadata.program_length = PROGRAM_LENGTH_MAPPING.get(str(ipeds_data_row.get('ICLEVEL')))
-            ipeds_metadata.control = CONTROL_MAPPING.get(str(ipeds_data_row.get('CONTROL')))
-            ipeds_metadata.state = ipeds_data_row.get('STABBR')
-            ipeds_metadata.institution_size = INSTITUTION_SIZE_MAPPING.get(str(ipeds_data_row.get('INSTSIZE')))
+            for column, value in ipeds_metadata_values(ipeds_data_row).items():
+                setattr(ipeds_metadata, column, value)
             session.add(ipeds_metadata)
 
         # if the institution doesn't have an unitid, create a new one
@@ -212,61 +833,219 @@ def _update_institution_unit_id(session: Session, institution: Institution, unit
 
             # create a new row of ipeds metadata that stores the metadata for the corresponding unitid
             ipeds_metadata = InstitutionIPEDSMetadata(
-                website_address=ipeds_data_row['WEBADDR'],
-                historically_black_college_or_university=ipeds_data_row.get('HBCU') == 1,
-                tribal_college_or_university=ipeds_data_row.get('TRIBAL') == 1,
-                program_length=PROGRAM_LENGTH_MAPPING.get(str(ipeds_data_row.get('ICLEVEL'))),
-                control=CONTROL_MAPPING.get(str(ipeds_data_row.get('CONTROL'))),
-                state=ipeds_data_row.get('STABBR'),
-                institution_size=INSTITUTION_SIZE_MAPPING.get(str(ipeds_data_row.get('INSTSIZE'))),
+                **ipeds_metadata_values(ipeds_data_row),
                 institution=institution,
                 institution_identifier_id=new_unitid.id
             )
             session.add(ipeds_metadata)
 
             # Create the InstitutionInstitutionCarnegieClassificationMetadata object to store all the metadata
-            carnegie_data_table = load_carnegie_data()
-            carnegie_data = carnegie_data_table.get(int(unit_id), {}).get("basic2021", None)
-            carnegie_2025_data_table = load_carnegie_2025_data()
-            carnegie_2025_data = carnegie_2025_data_table.get(int(unit_id), {}).get("2025 Research Activity Designation", None)
             carnegie_metadata = InstitutionCarnegieClassificationMetadata(
-                classification2021=CARNEGIE_CLASSIFICATION_MAPPING.get(str(carnegie_data), None),
-                classification2025=RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING.get(str(carnegie_2025_data), None),
+                **_carnegie_metadata_values(unit_id),
                 institution=institution,
                 institution_identifier_id=new_unitid.id
             )
             session.add(carnegie_metadata)
 
 
+def _apply_institution_update(session: Session, to_update: Institution, institution: InstitutionValidatorModel,
+                              author: OIDCUserInfo):
+    """ Overwrite an existing institution, and its identifiers and metadata, with the values in the API model """
+    to_update.name = institution.name
+    to_update.updated_by = author.id
+    to_update.updated = utcnow()
+    to_update.valid = True
+    to_update.latitude = institution.latitude
+    to_update.longitude = institution.longitude
+    to_update.state = institution.state
+    _update_institution_ror_id(session, to_update, institution.ror_id)
+    _update_institution_unit_id(session, to_update, institution.unitid)
+
+
 @sqlalchemy_http_exceptions
 def update_institution(short_id: str, institution: InstitutionValidatorModel, author: OIDCUserInfo):
     """ Update an existing institution """
-    with DbSession() as session:
+    with _session() as session:
         to_update = session.scalar(select(Institution)
             .where(Institution.topology_identifier == _full_osg_id(short_id)))
 
         if to_update is None:
             return HTTPException(404, f"No institution found with id {short_id}")
 
-        to_update.name = institution.name
-        to_update.updated_by = author.id
-        to_update.updated = datetime.now()
-        to_update.valid = True
-        to_update.latitude = institution.latitude
-        to_update.longitude = institution.longitude
-        to_update.state = institution.state
-        _update_institution_ror_id(session, to_update, institution.ror_id)
-        _update_institution_unit_id(session, to_update, institution.unitid)
-
+        _apply_institution_update(session, to_update, institution, author)
+        session.flush()
+        _record_changes(session, [(to_update.topology_identifier, InstitutionChangeKind.UPDATE)], author)
         session.commit()
+    _institutions_changed([_full_osg_id(short_id)])
 
 
 @sqlalchemy_http_exceptions
 def invalidate_institution(short_id: str, author: OIDCUserInfo):
     """ Mark an existing institution as invalid by id """
-    with DbSession() as session:
+    with _session() as session:
         to_invalidate = session.scalar(select(Institution)
             .where(Institution.topology_identifier == _full_osg_id(short_id)))
         to_invalidate.valid = False
         to_invalidate.updated_by = author.id
+        to_invalidate.updated = utcnow()
+        session.flush()
+        _record_changes(session, [(to_invalidate.topology_identifier, InstitutionChangeKind.INVALIDATE)], author)
         session.commit()
+    _institutions_changed([_full_osg_id(short_id)])
+
+
+class _BulkOperation(NamedTuple):
+    """ A single create or update within a bulk institution request """
+    index: int
+    institution: InstitutionValidatorModel
+    to_update: Optional[Institution] = None
+    topology_id: Optional[str] = None
+
+def _new_institution_rows(session: Session, institution: InstitutionValidatorModel, topology_id: str,
+                          author: OIDCUserInfo) -> Dict[type, List[dict]]:
+    """ Build the rows that make up a new institution, keyed by ORM class, for insertion with executemany """
+    institution_id = uuid4()
+    latitude, longitude, state = institution.latitude, institution.longitude, institution.state
+    rows = {InstitutionIdentifier: [], InstitutionIPEDSMetadata: [], InstitutionCarnegieClassificationMetadata: []}
+
+    if institution.ror_id:
+        rows[InstitutionIdentifier].append(dict(id=uuid4(), institution_id=institution_id,
+            identifier_type_id=_ror_id_type(session).id, identifier=institution.ror_id))
+
+    if institution.unitid:
+        unit_id_type = _unit_id_type(session)
+        if not unit_id_type:
+            raise HTTPException(400, "IdentifierType for 'unitid' not found")
+
+        ipeds_data_row = _ipeds_data_row(institution.unitid)
+        if latitude is None or longitude is None:
+            if "LATITUDE" in ipeds_data_row and "LONGITUD" in ipeds_data_row:
+                latitude, longitude = float(ipeds_data_row['LATITUDE']), float(ipeds_data_row['LONGITUD'])
+        if state is None:
+            state = ipeds_data_row.get('STABBR')
+
+        unit_id_id = uuid4()
+        rows[InstitutionIdentifier].append(dict(id=unit_id_id, institution_id=institution_id,
+            identifier_type_id=unit_id_type.id, identifier=institution.unitid))
+        rows[InstitutionIPEDSMetadata].append(dict(id=uuid4(), institution_id=institution_id,
+            institution_identifier_id=unit_id_id, **ipeds_metadata_values(ipeds_data_row)))
+        rows[InstitutionCarnegieClassificationMetadata].append(dict(id=uuid4(), institution_id=institution_id,
+            institution_identifier_id=unit_id_id, **_carnegie_metadata_values(institution.unitid)))
+
+    rows = {Institution: [dict(id=institution_id, topology_identifier=topology_id, name=institution.name, valid=True,
+        latitude=latitude, longitude=longitude, state=state, created=utcnow(), created_by=author.id)], **rows}
+    return rows
+
+def _apply_bulk_operations(session: Session, operations: List[_BulkOperation], author: OIDCUserInfo):
+    """ Insert every new institution with one executemany per table, then apply the updates """
+    rows = {Institution: [], InstitutionIdentifier: [], InstitutionIPEDSMetadata: [], InstitutionCarnegieClassificationMetadata: []}
+    for operation in operations:
+        if operation.to_update is None:
+            for orm_class, new_rows in _new_institution_rows(session, operation.institution, operation.topology_id, author).items():
+                rows[orm_class].extend(new_rows)
+
+    # Insert in foreign key order
+    for orm_class, new_rows in rows.items():
+        if new_rows:
+            session.execute(insert(orm_class), new_rows)
+
+    for operation in operations:
+        if operation.to_update is not None:
+            _apply_institution_update(session, operation.to_update, operation.institution, author)
+    session.flush()
+    _record_changes(session, [(o.topology_id, InstitutionChangeKind.CREATE) if o.to_update is None
+                              else (o.to_update.topology_identifier, InstitutionChangeKind.UPDATE) for o in operations], author)
+
+@sqlalchemy_http_exceptions
+def bulk_upsert_institutions(institutions: List[InstitutionBaseModel], author: OIDCUserInfo,
+                             partial: bool = False) -> BulkInstitutionResponseModel:
+    """ Create or update many institutions in a single transaction. Items with an id update that institution,
+    others create a new institution or reactivate a deactivated one with the same name. Unless partial success
+    is allowed, nothing is committed if any item fails
+    """
+    results: List[Optional[BulkInstitutionResultModel]] = [None] * len(institutions)
+
+    def fail(index: int, detail: str):
+        results[index] = BulkInstitutionResultModel(index=index, name=institutions[index].name, status="failed", detail=detail)
+
+    validated: Dict[int, InstitutionValidatorModel] = {}
+    for index, institution in enumerate(institutions):
+        try:
+            validated[index] = InstitutionValidatorModel.model_validate(institution.model_dump())
+        except ValidationError as e:
+            fail(index, "; ".join(error["msg"] for error in e.errors()))
+        except HTTPException as e:
+            fail(index, e.detail)
+
+    with _session() as session:
+        # Look up every institution referenced by id or name in one query
+        existing = session.scalars(select(Institution).where(or_(
+            Institution.topology_identifier.in_([i.id for i in validated.values() if i.id]),
+            Institution.name.in_([i.name for i in validated.values()])
+        ))).unique().all()
+        by_id = {i.topology_identifier: i for i in existing}
+        by_name = {i.name: i for i in existing}
+
+        operations: List[_BulkOperation] = []
+        seen_names, seen_ids = set(), set()
+        for index, institution in validated.items():
+            named = by_name.get(institution.name)
+            if institution.name in seen_names:
+                fail(index, f"Duplicate name '{institution.name}' in request")
+            elif institution.id and institution.id in seen_ids:
+                fail(index, f"Duplicate id {_short_osg_id(institution.id)} in request")
+            elif institution.id and institution.id not in by_id:
+                fail(index, f"No institution found with id {_short_osg_id(institution.id)}")
+            elif institution.id and named is not None and named is not by_id[institution.id]:
+                fail(index, f"Institution named '{institution.name}' already exists")
+            elif institution.id:
+                operations.append(_BulkOperation(index, institution, by_id[institution.id]))
+            elif named is not None and named.valid:
+                fail(index, f"Institution named '{institution.name}' already exists")
+            elif named is not None:
+                # Reactivate the deactivated institution with this name
+                operations.append(_BulkOperation(index, institution, named))
+            else:
+                operations.append(_BulkOperation(index, institution))
+            seen_names.add(institution.name)
+            if institution.id:
+                seen_ids.add(institution.id)
+
+        new_ids = iter(_get_unused_osg_ids(session, sum(1 for o in operations if o.to_update is None)))
+        operations = [o if o.to_update is not None else o._replace(topology_id=next(new_ids)) for o in operations]
+
+        if partial or all(r is None for r in results):
+            try:
+                with session.begin_nested():
+                    _apply_bulk_operations(session, operations, author)
+            except (StatementError, HTTPException):
+                # Retry each item on its own to find out which ones failed
+                for operation in operations:
+                    try:
+                        with session.begin_nested():
+                            _apply_bulk_operations(session, [operation], author)
+                    except StatementError as e:
+                        fail(operation.index, database_error_message(e))
+                    except HTTPException as e:
+                        fail(operation.index, e.detail)
+
+        succeeded = [o for o in operations if results[o.index] is None]
+        # With partial success allowed, something is committed as long as one item succeeded
+        committed = bool(succeeded) if partial else bool(succeeded) and all(r is None for r in results)
+        if committed:
+            session.commit()
+        else:
+            session.rollback()
+
+        for operation in succeeded:
+            if committed:
+                status = "updated" if operation.to_update is not None else "created"
+                results[operation.index] = BulkInstitutionResultModel(index=operation.index, name=operation.institution.name,
+                    id=operation.topology_id or operation.to_update.topology_identifier, status=status)
+            else:
+                results[operation.index] = BulkInstitutionResultModel(index=operation.index,
+                    name=operation.institution.name, status="rolled_back")
+
+    if committed and succeeded:
+        _institutions_changed(results[o.index].id for o in succeeded)
+    return BulkInstitutionResponseModel(committed=committed, results=results)
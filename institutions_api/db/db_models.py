@@ -1,11 +1,16 @@
 import enum
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, Float, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, Float, UniqueConstraint, Index, text, BigInteger, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import DeclarativeBase, mapped_column, relationship, Mapped
 from typing import List
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    """ The current time in UTC without a time zone, as every timestamp column is stored """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 class Base(DeclarativeBase):
     pass
@@ -23,6 +28,11 @@ class Institution(Base):
     """ ORM for Topology institutions """
     __tablename__ = 'institution'
 
+    # Backs the keyset paginated listing of valid institutions, ordered by (name, topology_identifier)
+    __table_args__ = (
+        Index('ix_institution_valid_name_topology_identifier', 'name', 'topology_identifier', postgresql_where=text('valid')),
+    )
+
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     topology_identifier = Column(String, unique=True, nullable=False)
     name = Column(String, unique=True, nullable=False)
@@ -31,8 +41,9 @@ class Institution(Base):
     longitude = Column(Float)
     state = Column(String)
 
-    created = Column(DateTime, nullable=False, server_default=func.now())
-    updated = Column(DateTime, onupdate=func.now())
+    # Written from utcnow() by the ORM, the server default only covers rows inserted by hand
+    created = Column(DateTime, nullable=False, default=utcnow, server_default=func.now())
+    updated = Column(DateTime, onupdate=utcnow)
 
     created_by = Column(String, nullable=False)
     updated_by = Column(String)
@@ -49,7 +60,7 @@ class Institution(Base):
         self.state = state
         self.topology_identifier = topology_identifier
         self.created_by = created_by
-        self.created = datetime.now()
+        self.created = utcnow()
 
     def has_id_of_type(self, id_type: IdentifierType):
         return any(i.identifier_type_id == id_type.id for i in self.identifiers)
@@ -68,7 +79,7 @@ class InstitutionIdentifier(Base):
 
     identifier = Column(String, nullable=False)
 
-    institution_id: Mapped[UUID] = mapped_column(ForeignKey('institution.id'))
+    institution_id: Mapped[UUID] = mapped_column(ForeignKey('institution.id'), index=True)
     identifier_type_id: Mapped[UUID] = mapped_column(ForeignKey('identifier_type.id'))
 
     identifier_type: Mapped["IdentifierType"] = relationship()
@@ -122,7 +133,7 @@ class InstitutionIPEDSMetadata(Base):
     institution_size = Column(Enum(InstitutionSize, name="institution_size"))          # INSTSIZE
 
     # Add foreign key to the InstitutionIdentifier
-    institution_id: Mapped[UUID] = mapped_column(ForeignKey('institution.id'))
+    institution_id: Mapped[UUID] = mapped_column(ForeignKey('institution.id'), index=True)
     institution_identifier_id: Mapped[UUID] = mapped_column(ForeignKey('institution_identifier.id'))
 
     # Get the identifier associated with that fk relationship
@@ -184,9 +195,27 @@ class InstitutionCarnegieClassificationMetadata(Base):
     classification2025 = Column(Enum(CarnegieClassification2025, name="classification2025"))
 
     # Add foreign key to the InstitutionIdentifier
-    institution_id: Mapped[UUID] = mapped_column(ForeignKey('institution.id'))
+    institution_id: Mapped[UUID] = mapped_column(ForeignKey('institution.id'), index=True)
     institution_identifier_id: Mapped[UUID] = mapped_column(ForeignKey('institution_identifier.id'))
 
     # Get the identifier associated with that fk relationship
     institution: Mapped["Institution"] = relationship(back_populates="carnegie_metadata")
-    identifier: Mapped["InstitutionIdentifier"] = relationship(back_populates="carnegie_metadata")
\ No newline at end of file
+    identifier: Mapped["InstitutionIdentifier"] = relationship(back_populates="carnegie_metadata")
+
+
+class InstitutionChangeKind(enum.Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    INVALIDATE = "invalidate"
+
+
+class InstitutionChange(Base):
+    """ORM for the institution change log, one row per institution written by a committed transaction"""
+    __tablename__ = 'institution_change'
+
+    # Ordered by seq, which only grows. Integer on SQLite, the only type it autoincrements
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    topology_identifier = Column(String, nullable=False)
+    kind = Column(Enum(InstitutionChangeKind, name="institution_change_kind"), nullable=False)
+    changed = Column(DateTime, nullable=False, default=utcnow, server_default=func.now())
+    changed_by = Column(String)
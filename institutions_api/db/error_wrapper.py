@@ -1,21 +1,37 @@
 from sqlalchemy.exc import StatementError
 from fastapi import HTTPException
 from functools import wraps
+from inspect import iscoroutinefunction
 import re
 import logging
 
 logger = logging.getLogger("default")
 
+def database_error_message(e: StatementError) -> str:
+    # strip info from prior to the DETAIL from the error message
+    return re.sub(r"^.*DETAIL:", '', f"{e._message()}", flags=re.S)
+
+def _http_exception(e: StatementError) -> HTTPException:
+    logger.error(f"Unhandled database exception: {e._message()}")
+    return HTTPException(500, database_error_message(e))
+
 def sqlalchemy_http_exceptions(func):
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except StatementError as e:
+                raise _http_exception(e)
+
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except StatementError as e:
-            # strip info from prior to the DETAIL from the error message
-            error_message = re.sub(r"^.*DETAIL:", '', f"{e._message()}", flags=re.S)
-            logger.error(f"Unhandled database exception: {e._message()}")
-            raise HTTPException(500, error_message)
+            raise _http_exception(e)
     
     return wrapper
 
@@ -0,0 +1,201 @@
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from fastapi import HTTPException
+
+from institutions_api.db import db
+from institutions_api.db.db_models import CarnegieClassification, CarnegieClassification2025, Control, InstitutionSize, ProgramLength
+from institutions_api.db.incremental_index import IncrementalInstitutionIndex
+from institutions_api.models.api_models import FacetedInstitutionsResponseModel, InstitutionBaseModel
+
+logger = logging.getLogger("default")
+
+
+def _enum_name(enum_type: type) -> Callable[[Optional[str]], Optional[str]]:
+    """ Facet value of an enum column, the member name of the value the API models hold """
+    names = {member.value: member.name for member in enum_type}
+    return lambda value: names.get(value)
+
+
+def _boolean(value: Optional[bool]) -> Optional[str]:
+    return None if value is None else str(value).lower()
+
+
+def _state(institution: InstitutionBaseModel) -> Optional[str]:
+    state = institution.state or (institution.ipeds_metadata.state if institution.ipeds_metadata else None)
+    return state.upper() if state else None
+
+
+def _ipeds(field: str, to_value: Callable) -> Callable[[InstitutionBaseModel], Optional[str]]:
+    return lambda i: to_value(getattr(i.ipeds_metadata, field)) if i.ipeds_metadata else None
+
+
+def _carnegie(field: str, to_value: Callable) -> Callable[[InstitutionBaseModel], Optional[str]]:
+    return lambda i: to_value(getattr(i.carnegie_metadata, field)) if i.carnegie_metadata else None
+
+
+# Facet value of each dimension for an institution, None when the institution has no value for it
+DIMENSIONS: Dict[str, Callable[[InstitutionBaseModel], Optional[str]]] = {
+    "state": _state,
+    "control": _ipeds("control", _enum_name(Control)),
+    "institution_size": _ipeds("institution_size", _enum_name(InstitutionSize)),
+    "program_length": _ipeds("program_length", _enum_name(ProgramLength)),
+    "hbcu": _ipeds("historically_black_college_or_university", _boolean),
+    "tribal": _ipeds("tribal_college_or_university", _boolean),
+    "classification2021": _carnegie("classification2021", _enum_name(CarnegieClassification)),
+    "classification2025": _carnegie("classification2025", _enum_name(CarnegieClassification2025)),
+}
+
+# Values each dimension accepts in filters, states are open ended
+_ALLOWED_VALUES: Dict[str, Optional[Set[str]]] = {
+    "state": None,
+    "control": {m.name for m in Control},
+    "institution_size": {m.name for m in InstitutionSize},
+    "program_length": {m.name for m in ProgramLength},
+    "hbcu": {"true", "false"},
+    "tribal": {"true", "false"},
+    "classification2021": {m.name for m in CarnegieClassification},
+    "classification2025": {m.name for m in CarnegieClassification2025},
+}
+
+
+def normalize_filters(filters: Dict[str, Optional[Iterable[str]]]) -> Dict[str, Set[str]]:
+    """ Facet values to filter each dimension by, upper case for enums and states and lower case for booleans.
+    Dimensions without values are left out. Raises a 400 on unknown dimensions or values
+    """
+    normalized = {}
+    for dimension, values in filters.items():
+        if not values:
+            continue
+        if dimension not in DIMENSIONS:
+            raise HTTPException(400, f"Unknown facet '{dimension}'")
+        allowed = _ALLOWED_VALUES[dimension]
+        values = {v.strip().lower() if allowed == {"true", "false"} else v.strip().upper() for v in values}
+        if allowed is not None and not values <= allowed:
+            raise HTTPException(400, f"Unknown {dimension} value(s) {', '.join(sorted(values - allowed))}, "
+                                     f"expected one of {', '.join(sorted(allowed))}")
+        normalized[dimension] = values
+    return normalized
+
+
+class InstitutionFacetIndex(IncrementalInstitutionIndex):
+    """ Filtering and facet counts over the metadata of valid institutions.
+    Each institution holds a position, and each facet value a bitmap of the positions holding it, kept as Python
+    ints so filters resolve to bitwise ors within a dimension and ands across dimensions. Changed institutions are
+    re-read by ID and their bits moved before the next query. Positions of removed institutions are reused
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._institutions: List[Optional[InstitutionBaseModel]] = []
+        self._positions: Dict[str, int] = {}
+        self._free: List[int] = []
+        # Facet values of the institution at each position, by dimension
+        self._values: List[Dict[str, str]] = []
+        self._bitmaps: Dict[str, Dict[str, int]] = {dimension: {} for dimension in DIMENSIONS}
+        self._valid = 0
+
+    def _add(self, institution: InstitutionBaseModel):
+        if self._free:
+            position = self._free.pop()
+            self._institutions[position] = institution
+        else:
+            position = len(self._institutions)
+            self._institutions.append(institution)
+            self._values.append({})
+        bit = 1 << position
+        values = {d: v for d, value_of in DIMENSIONS.items() if (v := value_of(institution)) is not None}
+        for dimension, value in values.items():
+            bitmaps = self._bitmaps[dimension]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+        self._values[position] = values
+        self._positions[institution.id] = position
+        self._valid |= bit
+
+    def _remove(self, topology_id: str):
+        position = self._positions.pop(topology_id, None)
+        if position is None:
+            return
+        bit = 1 << position
+        for dimension, value in self._values[position].items():
+            bitmaps = self._bitmaps[dimension]
+            bitmaps[value] &= ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+        self._values[position] = {}
+        self._institutions[position] = None
+        self._valid &= ~bit
+        self._free.append(position)
+
+    def _load(self, institutions: Sequence[InstitutionBaseModel]):
+        self._institutions = list(institutions)
+        self._positions = {institution.id: position for position, institution in enumerate(institutions)}
+        self._values = [{} for _ in institutions]
+        # Build each bitmap as a little endian byte array, one pass per dimension, rather than or-ing in bits
+        for dimension, value_of in DIMENSIONS.items():
+            arrays: Dict[str, bytearray] = {}
+            for position, institution in enumerate(institutions):
+                value = value_of(institution)
+                if value is None:
+                    continue
+                if value not in arrays:
+                    arrays[value] = bytearray(len(institutions) // 8 + 1)
+                arrays[value][position >> 3] |= 1 << (position & 7)
+                self._values[position][dimension] = value
+            self._bitmaps[dimension] = {value: int.from_bytes(array, "little") for value, array in arrays.items()}
+        self._valid = (1 << len(institutions)) - 1
+        logger.info(f"Built facet index of {len(institutions)} institutions")
+
+    def _matching(self, filters: Dict[str, Set[str]], skip: Optional[str] = None) -> int:
+        """ Bitmap of valid institutions matching every filter, except the one on the skip dimension """
+        matching = self._valid
+        for dimension, values in filters.items():
+            if dimension == skip:
+                continue
+            bitmaps = self._bitmaps[dimension]
+            union = 0
+            for value in values:
+                union |= bitmaps.get(value, 0)
+            matching &= union
+        return matching
+
+    def _positions_of(self, bitmap: int) -> List[int]:
+        positions, offset = [], 0
+        for byte in bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"):
+            while byte:
+                low = byte & -byte
+                positions.append(offset + low.bit_length() - 1)
+                byte ^= low
+            offset += 8
+        return positions
+
+    def query(self, filters: Dict[str, Optional[Iterable[str]]], limit: Optional[int] = None,
+              offset: int = 0) -> FacetedInstitutionsResponseModel:
+        """ Valid institutions matching every filtered dimension, sorted by name, with the number of them holding
+        each value of each dimension. Counts of a filtered dimension ignore its own filter, so they show what
+        selecting other values of it would add
+        """
+        filters = normalize_filters(filters)
+
+        with self._lock:
+            self._update()
+
+            matching = self._matching(filters)
+            facets = {}
+            for dimension, bitmaps in self._bitmaps.items():
+                within = self._matching(filters, skip=dimension) if dimension in filters else matching
+                counts = {value: (bitmap & within).bit_count() for value, bitmap in bitmaps.items()}
+                facets[dimension] = dict(sorted((v, n) for v, n in counts.items() if n))
+
+            institutions = sorted((self._institutions[p] for p in self._positions_of(matching)), key=lambda i: i.name)
+
+        end = None if limit is None else offset + limit
+        return FacetedInstitutionsResponseModel(
+            total=len(institutions),
+            facets=facets,
+            institutions=institutions[offset:end],
+        )
+
+
+facet_index = InstitutionFacetIndex()
+db.add_change_listener(facet_index.institutions_changed)
@@ -0,0 +1,70 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from institutions_api.db import db
+from institutions_api.db.incremental_index import IncrementalInstitutionIndex
+from institutions_api.models.api_models import InstitutionBaseModel, NearbyInstitutionModel
+from institutions_api.util.kdtree import KDTree, Point, chord_to_km, km_to_chord, unit_vector
+
+logger = logging.getLogger("default")
+
+
+def _located(institution: Optional[InstitutionBaseModel]) -> bool:
+    return institution is not None and institution.latitude is not None and institution.longitude is not None
+
+
+class InstitutionGeoIndex(IncrementalInstitutionIndex):
+    """ Nearest neighbour search over the coordinates of valid institutions.
+    A KD-tree is built from the institution list snapshot. Institutions changed since then are re-read by ID
+    and searched linearly alongside the tree, which is rebuilt once enough of them accumulate
+    """
+
+    def __init__(self, min_rebuild_changes: int = 64, rebuild_fraction: float = 0.05):
+        super().__init__()
+        self.min_rebuild_changes = min_rebuild_changes
+        self.rebuild_fraction = rebuild_fraction
+        self._tree: Optional[KDTree[InstitutionBaseModel]] = None
+        # Current state of institutions changed since the tree was built, None if no longer valid or located
+        self._overrides: Dict[str, Optional[Tuple[Point, InstitutionBaseModel]]] = {}
+
+    def _add(self, institution: InstitutionBaseModel):
+        self._overrides[institution.id] = \
+            (unit_vector(institution.latitude, institution.longitude), institution) if _located(institution) else None
+
+    def _remove(self, topology_id: str):
+        self._overrides[topology_id] = None
+
+    def _load(self, institutions: Sequence[InstitutionBaseModel]):
+        self._overrides.clear()
+        self._tree = KDTree([(unit_vector(i.latitude, i.longitude), i.id, i) for i in institutions if _located(i)])
+        logger.info(f"Built geo index of {len(self._tree)} institutions")
+
+    def _current(self) -> Tuple[KDTree, Dict[str, Optional[Tuple[Point, InstitutionBaseModel]]]]:
+        with self._lock:
+            self._update()
+            if len(self._overrides) > max(self.min_rebuild_changes, self.rebuild_fraction * len(self._tree)):
+                self._build(db.get_valid_institutions())
+            return self._tree, dict(self._overrides)
+
+    def nearest(self, latitude: float, longitude: float, k: int,
+                radius_km: Optional[float] = None) -> List[NearbyInstitutionModel]:
+        """ Up to k valid institutions nearest to a point, optionally within radius_km, nearest first """
+        tree, overrides = self._current()
+        point = unit_vector(latitude, longitude)
+        max_chord = km_to_chord(radius_km) if radius_km is not None else 2.0
+
+        matches = tree.nearest(point, k, max_chord, exclude=overrides)
+        for topology_id, override in overrides.items():
+            if override is not None:
+                (x, y, z), institution = override
+                chord = ((x - point[0]) ** 2 + (y - point[1]) ** 2 + (z - point[2]) ** 2) ** 0.5
+                if chord <= max_chord:
+                    matches.append((chord, topology_id, institution))
+        matches.sort(key=lambda m: m[0])
+
+        return [NearbyInstitutionModel(**institution.model_dump(), distance_km=round(chord_to_km(chord), 3))
+                for chord, _, institution in matches[:k]]
+
+
+geo_index = InstitutionGeoIndex()
+db.add_change_listener(geo_index.institutions_changed)
@@ -0,0 +1,74 @@
+from threading import Lock
+from typing import Dict, Iterable, NamedTuple, Optional
+from uuid import UUID
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from institutions_api.db.db_models import IdentifierType
+
+
+class IdentifierTypeRef(NamedTuple):
+    """ Detached, immutable copy of an IdentifierType row """
+    id: UUID
+    name: str
+
+
+class IdentifierTypeRegistry:
+    """ Process-wide map of identifier type names to ids, and back, for one database.
+    Loaded with a single query and reloaded when a lookup misses or a type is added through the ORM
+    """
+
+    def __init__(self):
+        self._by_name: Dict[str, IdentifierTypeRef] = {}
+        self._by_id: Dict[UUID, IdentifierTypeRef] = {}
+        self._loaded = False
+        self._lock = Lock()
+
+    def refresh(self, session: Session):
+        types = [IdentifierTypeRef(t.id, t.name) for t in session.execute(select(IdentifierType.id, IdentifierType.name))]
+        with self._lock:
+            self._by_name = {t.name: t for t in types}
+            self._by_id = {t.id: t for t in types}
+            self._loaded = True
+
+    def invalidate(self):
+        self._loaded = False
+
+    def by_name(self, session: Session, name: str) -> Optional[IdentifierTypeRef]:
+        """ Get the identifier type with the given name, or None if there is no such type """
+        if not self._loaded or name not in self._by_name:
+            self.refresh(session)
+        return self._by_name.get(name)
+
+    def names(self, session: Session, ids: Iterable[UUID] = ()) -> Dict[UUID, str]:
+        """ Get the name of every identifier type by id, reloading first if any of the given ids is unknown """
+        if not self._loaded or any(i not in self._by_id for i in ids):
+            self.refresh(session)
+        return {t.id: t.name for t in self._by_id.values()}
+
+
+# One registry per engine, since type ids differ between databases
+_registries: "WeakKeyDictionary[Engine, IdentifierTypeRegistry]" = WeakKeyDictionary()
+_registries_lock = Lock()
+
+
+def identifier_type_registry(session: Session) -> IdentifierTypeRegistry:
+    """ Get the identifier type registry for the database a session is bound to """
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    with _registries_lock:
+        if engine not in _registries:
+            _registries[engine] = IdentifierTypeRegistry()
+        return _registries[engine]
+
+
+@event.listens_for(IdentifierType, "after_insert")
+@event.listens_for(IdentifierType, "after_update")
+@event.listens_for(IdentifierType, "after_delete")
+def _identifier_types_changed(mapper, connection, target):
+    registry = _registries.get(connection.engine)
+    if registry:
+        registry.invalidate()
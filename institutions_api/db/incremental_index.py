@@ -0,0 +1,66 @@
+from threading import Lock
+from typing import Iterable, Sequence, Set
+
+from institutions_api.db import db
+from institutions_api.models.api_models import InstitutionBaseModel
+
+
+class IncrementalInstitutionIndex:
+    """ Base of the in-memory indexes over valid institutions that are kept current in place.
+    Subclasses build themselves from every valid institution in _load, and move single institutions with _add and
+    _remove. Institutions changed after the index was built are re-read by ID before the next use
+    """
+
+    def __init__(self):
+        self._loaded = False
+        self._pending: Set[str] = set()
+        self._lock = Lock()
+
+    @classmethod
+    def from_institutions(cls, institutions: Iterable[InstitutionBaseModel], *args, **kwargs):
+        """ An index built from the given institutions rather than those in the database """
+        index = cls(*args, **kwargs)
+        with index._lock:
+            index._build(list(institutions))
+        return index
+
+    def institutions_changed(self, topology_ids: Set[str]):
+        """ Change listener, the changed institutions are re-read before the index is next used """
+        with self._lock:
+            if self._loaded:
+                self._pending |= topology_ids
+
+    def _add(self, institution: InstitutionBaseModel):
+        raise NotImplementedError
+
+    def _remove(self, topology_id: str):
+        """ Remove an institution, if it is in the index """
+        raise NotImplementedError
+
+    def _load(self, institutions: Sequence[InstitutionBaseModel]):
+        raise NotImplementedError
+
+    def _build(self, institutions: Sequence[InstitutionBaseModel]):
+        self._pending.clear()
+        self._load(institutions)
+        self._loaded = True
+
+    def _apply_pending(self):
+        pending, self._pending = self._pending, set()
+        for topology_id, institution in db.get_institutions_by_topology_id(pending).items():
+            self._remove(topology_id)
+            if institution is not None:
+                self._add(institution)
+
+    def _update(self):
+        """ Build the index, or apply the changes made since, holding the lock """
+        if not self._loaded:
+            self._build(db.get_valid_institutions())
+        elif self._pending:
+            self._apply_pending()
+
+    def load(self):
+        """ Build the index ahead of its first use """
+        with self._lock:
+            if not self._loaded:
+                self._build(db.get_valid_institutions())
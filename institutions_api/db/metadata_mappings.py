@@ -77,3 +77,16 @@ RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING = {
     "Research 2: High Spending and Doctorate Production": "RESEARCH_2",
     "Research Colleges and Universities": "RESEARCH_COLLEGES_AND_UNIVERSITIES"
 }
+
+
+def ipeds_metadata_values(ipeds_data_row: dict) -> dict:
+    """ Map an IPEDS reference data row to InstitutionIPEDSMetadata column values """
+    return {
+        "website_address": ipeds_data_row['WEBADDR'],
+        "historically_black_college_or_university": ipeds_data_row.get('HBCU') == 1,
+        "tribal_college_or_university": ipeds_data_row.get('TRIBAL') == 1,
+        "program_length": PROGRAM_LENGTH_MAPPING.get(str(ipeds_data_row.get('ICLEVEL'))),
+        "control": CONTROL_MAPPING.get(str(ipeds_data_row.get('CONTROL'))),
+        "state": ipeds_data_row.get('STABBR'),
+        "institution_size": INSTITUTION_SIZE_MAPPING.get(str(ipeds_data_row.get('INSTSIZE'))),
+    }
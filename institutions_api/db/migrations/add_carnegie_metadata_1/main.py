@@ -1,112 +1,127 @@
-# This script adds IPEDS metadata to the institution table
-
+# This script adds Carnegie classification metadata to institutions with an IPEDS identifier
+#
+# The 2021 and 2025 classifications are mapped for every unitid in one vectorized pass. Those of unitids held by
+# an institution are bulk loaded into a temporary staging table and applied with one joined UPDATE, touching only
+# rows whose values changed, and one INSERT for institutions that have no Carnegie metadata yet.
+#
+#     python -m institutions_api.db.migrations.add_carnegie_metadata_1.main [--dry-run]
+
+import argparse
+import time
 from uuid import uuid4
 
-from psycopg2.sql import NULL
-from sqlalchemy import text
 import pandas as pd
+from psycopg2.extras import execute_values
+from sqlalchemy import Connection, text
 
-from institutions_api.db.db import engine
+from institutions_api.db.db import get_engine
 from institutions_api.db.metadata_mappings import CARNEGIE_CLASSIFICATION_MAPPING, RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING
-
-
-def map_in_carnegie_data():
-    """For each institution map it to a ROR and then IPEDS identifier"""
-
-    carnegie_df = pd.read_excel(
-        "db/migrations/add_carnegie_metadata_1/data/CCIHE2021-PublicData.xlsx",
-        sheet_name="Data"
-    )
-    carnegie_by_unitid = carnegie_df.set_index("unitid").to_dict(orient="index")
-
-    carnegie_2025_df = pd.read_excel(
-        "db/migrations/add_carnegie_metadata_1/data/2025-RAD-Public-Data-File.xlsx",
-        sheet_name="Data"
-    )
-    carnegie_2025_by_unitid = carnegie_2025_df.set_index("UNITID").to_dict(orient="index")
-
-    # with engine.connect() as conn:
-    #
-    #     # Get the institutions with ROR identifiers
-    #     institutes = conn.execute(text("""
-    #         SELECT inst.*, ii.identifier, ii.id AS identifier_id, it.name
-    #         FROM institution inst
-    #         LEFT JOIN institution_identifier ii on inst.id = ii.institution_id
-    #         LEFT JOIN public.identifier_type it on ii.identifier_type_id = it.id
-    #         WHERE it.name = 'unitid'
-    #     """)).mappings().fetchall()
-    #
-    #     for institute in institutes:
-    #
-    #         carnegie_data = carnegie_by_unitid.get(int(institute["identifier"]))
-    #
-    #         # Add the IPEDS identifier
-    #         if carnegie_data:
-    #
-    #             # Check if that institution already exists
-    #             existing_mapping = conn.execute(text(f"""
-    #                 SELECT * FROM institution_carnegie_classification_metadata WHERE institution_id = '{institute['id']}'
-    #             """)).fetchone()
-    #
-    #             if not existing_mapping:
-    #
-    #                 ipeds_metadata = {
-    #                     "id": uuid4(),
-    #                     "institution_id": institute['id'],
-    #                     "institution_identifier_id": institute['identifier_id'],
-    #                     "classification": CARNEGIE_CLASSIFICATION_MAPPING.get(str(carnegie_data["basic2021"])),
-    #                 }
-    #
-    #                 conn.execute(
-    #                     text(f"""
-    #                         INSERT INTO institution_carnegie_classification_metadata (
-    #                             id, institution_id, institution_identifier_id, classification2021
-    #                         ) VALUES (
-    #                             :id, :institution_id, :institution_identifier_id, :classification
-    #                         )
-    #                     """), ipeds_metadata
-    #                 )
-    #
-    #     conn.commit()
-
-    with engine.connect() as conn:
-
-        # Get the institutions with ROR identifiers
-        institutes = conn.execute(text("""
-            SELECT inst.*, ii.identifier, ii.id AS identifier_id, it.name
-            FROM institution inst
-            LEFT JOIN institution_identifier ii on inst.id = ii.institution_id
-            LEFT JOIN public.identifier_type it on ii.identifier_type_id = it.id
-            WHERE it.name = 'unitid'
-        """)).mappings().fetchall()
-
-        for institute in institutes:
-
-            carnegie_data = carnegie_by_unitid.get(int(institute["identifier"]))
-            carnegie_2025_data = carnegie_2025_by_unitid.get(int(institute["identifier"]))
-
-            # Add the IPEDS identifier
-            if carnegie_data:
-
-                carnegie_metadata = {
-                    "classification2021": CARNEGIE_CLASSIFICATION_MAPPING.get(str(carnegie_data["basic2021"]), NULL),
-                    "classification2025": RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING.get(carnegie_2025_data["2025 Research Activity Designation"]) if carnegie_2025_data else None,
-                    "institution_id": institute['id'],
-                }
-
-                conn.execute(
-                    text(f"""
-                        UPDATE institution_carnegie_classification_metadata 
-                        SET classification2025 = :classification2025, classification2021 = :classification2021
-                        WHERE institution_id = :institution_id
-                    """), carnegie_metadata
-                )
-
-        conn.commit()
+from institutions_api.util.load_carnegie_2025_data import load_carnegie_2025_data
+from institutions_api.util.load_carnegie_data import load_carnegie_data
+
+STAGING_PAGE_SIZE = 1000
+
+
+def carnegie_classifications() -> pd.DataFrame:
+    """ Map the 2021 and 2025 Carnegie data of every unitid to classification2021/classification2025 values """
+    carnegie_data = load_carnegie_data()
+    carnegie_2025_data = load_carnegie_2025_data()
+    basic2021 = pd.Series({unit_id: carnegie_data[unit_id]["basic2021"] for unit_id in carnegie_data}, dtype="Int64")
+    designation2025 = pd.Series({
+        unit_id: carnegie_2025_data[unit_id]["2025 Research Activity Designation"] for unit_id in carnegie_2025_data
+    }, dtype=object)
+
+    df = pd.concat({"basic2021": basic2021, "designation2025": designation2025}, axis=1)
+    df["classification2021"] = df["basic2021"].astype(str).map(CARNEGIE_CLASSIFICATION_MAPPING)
+    df["classification2025"] = df["designation2025"].map(RESEARCH_ACTIVITY_DESIGNATION_2025_MAPPING)
+    df = df.loc[df["classification2021"].notna() | df["classification2025"].notna(), ["classification2021", "classification2025"]]
+    df.index = df.index.astype(str).rename("unitid")
+    return df.astype(object).where(df.notna(), None).reset_index()
+
+
+def stage_carnegie_classifications(conn: Connection, df: pd.DataFrame):
+    """ Bulk load the classifications into a temporary table, matched to the institutions holding each unitid """
+    conn.execute(text("""
+        CREATE TEMPORARY TABLE carnegie_staging (
+            unitid TEXT PRIMARY KEY,
+            metadata_id UUID NOT NULL,
+            classification2021 TEXT,
+            classification2025 TEXT
+        ) ON COMMIT DROP
+    """))
+    # Most unitids in the Carnegie data belong to no institution, only stage those that do
+    held = conn.execute(text("""
+        SELECT ii.identifier
+        FROM institution_identifier ii
+        JOIN identifier_type it ON it.id = ii.identifier_type_id AND it.name = 'unitid'
+    """)).scalars().all()
+    df = df[df["unitid"].isin(held)]
+    df = df.assign(metadata_id=[uuid4() for _ in range(len(df))])
+    # A multi-row INSERT per page of rows, executemany of a text() statement would make a round trip per row
+    with conn.connection.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO carnegie_staging (unitid, metadata_id, classification2021, classification2025) VALUES %s
+        """, list(df[["unitid", "metadata_id", "classification2021", "classification2025"]].itertuples(index=False)),
+                       page_size=STAGING_PAGE_SIZE)
+    conn.execute(text("ANALYZE carnegie_staging"))
+
+    conn.execute(text("""
+        CREATE TEMPORARY TABLE carnegie_matches ON COMMIT DROP AS
+        SELECT ii.institution_id, ii.id AS identifier_id, s.metadata_id,
+               CAST(s.classification2021 AS classification2021) AS classification2021,
+               CAST(s.classification2025 AS classification2025) AS classification2025
+        FROM carnegie_staging s
+        JOIN institution_identifier ii ON ii.identifier = s.unitid
+        JOIN identifier_type it ON it.id = ii.identifier_type_id AND it.name = 'unitid'
+    """))
+
+
+def map_in_carnegie_data(conn: Connection) -> dict:
+    """ Apply the Carnegie classifications to every institution with a unitid, returning row counts """
+
+    stage_carnegie_classifications(conn, carnegie_classifications())
+
+    matched = conn.execute(text("SELECT count(*) FROM carnegie_matches")).scalar_one()
+
+    changed = conn.execute(text("""
+        UPDATE institution_carnegie_classification_metadata c
+        SET classification2021 = m.classification2021, classification2025 = m.classification2025
+        FROM carnegie_matches m
+        WHERE c.institution_id = m.institution_id
+        AND (c.classification2021, c.classification2025) IS DISTINCT FROM (m.classification2021, m.classification2025)
+    """)).rowcount
+
+    inserted = conn.execute(text("""
+        INSERT INTO institution_carnegie_classification_metadata (
+            id, institution_id, institution_identifier_id, classification2021, classification2025
+        )
+        SELECT m.metadata_id, m.institution_id, m.identifier_id, m.classification2021, m.classification2025
+        FROM carnegie_matches m
+        LEFT JOIN (
+            SELECT DISTINCT institution_id FROM institution_carnegie_classification_metadata
+        ) c ON c.institution_id = m.institution_id
+        WHERE c.institution_id IS NULL
+    """)).rowcount
+
+    return {"inserted": inserted, "changed": changed, "unchanged": matched - inserted - changed}
 
 
 def main():
-    map_in_carnegie_data()
+    parser = argparse.ArgumentParser(description="Add Carnegie classifications to institutions with a unitid")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes and roll them back")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with get_engine().connect() as conn:
+        counts = map_in_carnegie_data(conn)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+    print(f"{'Dry run' if args.dry_run else 'Migration'} finished in {time.perf_counter() - started:.2f}s"
+          f"{', rolled back' if args.dry_run else ''}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,10 @@
+-- Lookups by (identifier_type_id, identifier) use the index backing the existing unique constraint.
+-- These cover the institution_id foreign keys, used to load an institution's identifiers and metadata.
+CREATE INDEX IF NOT EXISTS ix_institution_identifier_institution_id
+ON institution_identifier (institution_id);
+
+CREATE INDEX IF NOT EXISTS ix_institution_ipeds_metadata_institution_id
+ON institution_ipeds_metadata (institution_id);
+
+CREATE INDEX IF NOT EXISTS ix_institution_carnegie_classification_metadata_institution_id
+ON institution_carnegie_classification_metadata (institution_id);
@@ -0,0 +1,27 @@
+-- Change log behind GET /institutions/changes. Every write to an institution adds a row in the same transaction.
+DO $$
+BEGIN
+    CREATE TYPE institution_change_kind AS ENUM ('CREATE', 'UPDATE', 'INVALIDATE');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS institution_change (
+    seq BIGSERIAL PRIMARY KEY,
+    topology_identifier VARCHAR NOT NULL,
+    kind institution_change_kind NOT NULL,
+    changed TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+    changed_by VARCHAR
+);
+
+-- Backfill one change per existing institution, in the order they were last written, so a feed read from the
+-- start holds every institution. Skipped when rerun, as the log already holds them
+INSERT INTO institution_change (topology_identifier, kind, changed, changed_by)
+SELECT topology_identifier,
+       CASE WHEN valid THEN 'CREATE'::institution_change_kind ELSE 'INVALIDATE'::institution_change_kind END,
+       coalesce(updated, created),
+       coalesce(updated_by, created_by)
+FROM institution
+WHERE NOT EXISTS (SELECT 1 FROM institution_change)
+ORDER BY coalesce(updated, created), topology_identifier;
@@ -0,0 +1,3 @@
+CREATE INDEX IF NOT EXISTS ix_institution_valid_name_topology_identifier
+ON institution (name, topology_identifier)
+WHERE valid;
@@ -1,128 +1,200 @@
 # This script adds IPEDS metadata to the institution table
-
+#
+# The ROR -> unitid -> IPEDS mapping is joined in Python once, bulk loaded into a temporary staging table and
+# applied with a few set-based statements, so a rerun against a full topology database takes seconds.
+#
+#     python -m institutions_api.db.migrations.add_institution_metadata_0.main [--dry-run]
+#
+# --dry-run applies the changes inside a transaction, reports what would change and rolls it back.
+
+import argparse
+import csv
+import time
 from uuid import uuid4
 
-from sqlalchemy import text
-import pandas as pd
-
-from institutions_api.db.db import engine
-from institutions_api.db.metadata_mappings import INSTITUTION_SIZE_MAPPING, PROGRAM_LENGTH_MAPPING, CONTROL_MAPPING, IPEDS_TO_DB_MAP
-from institutions_api.util.load_ipeds_data import load_csv, load_ipeds_data
+from psycopg2.extras import execute_values
+from sqlalchemy import Connection, text
 
+from institutions_api.constants import ROR_ID_PREFIX
+from institutions_api.db.db import get_engine
+from institutions_api.db.metadata_mappings import ipeds_metadata_values
+from institutions_api.util.load_ipeds_data import load_ipeds_data
 
-def update_existing_tables():
-    with engine.connect() as conn:
+# https://github.com/opensyllabus/institution-identifiers/blob/main/latest.csv
+ROR_TO_UNITID_PATH = "institutions_api/db/migrations/add_institution_metadata_0/data/ror_to_unitid.csv"
 
-        # Check if the columns exist already
-        test_institute = conn.execute(text("""SELECT * FROM institution LIMIT 1""")).mappings().fetchone()
+STAGING_COLUMNS = [
+    "ror_id", "unitid", "identifier_id", "metadata_id", "latitude", "longitude",
+    "website_address", "historically_black_college_or_university", "tribal_college_or_university",
+    "program_length", "control", "state", "institution_size",
+]
+STAGING_PAGE_SIZE = 1000
 
-        if "latitude" not in test_institute:
 
-            # Add latitude and longitude to institution table
-            conn.execute(text("""
-                ALTER TABLE institution
-                ADD COLUMN latitude FLOAT DEFAULT NULL,
-                ADD COLUMN longitude FLOAT DEFAULT NULL;
-            """))
+def update_existing_tables(conn: Connection):
 
-        # Add IPEDS ID
-        # Check if it already exists
-        row = conn.execute(text("""SELECT * FROM identifier_type WHERE name = 'unitid'""")).mappings().fetchone()
+    # Check if the columns exist already
+    has_latitude = conn.execute(text("""
+        SELECT 1 FROM information_schema.columns WHERE table_name = 'institution' AND column_name = 'latitude'
+    """)).fetchone()
 
-        if not row:
-            conn.execute(text(f"""
-                INSERT INTO identifier_type (id, name, description) VALUES ('{uuid4()}', 'unitid', 'IPEDS Identifier (https://ceds.ed.gov/element/000166)')
-            """))
+    if not has_latitude:
 
-        conn.commit()
+        # Add latitude and longitude to institution table
+        conn.execute(text("""
+            ALTER TABLE institution
+            ADD COLUMN latitude FLOAT DEFAULT NULL,
+            ADD COLUMN longitude FLOAT DEFAULT NULL;
+        """))
 
+    # Add IPEDS ID, if it does not already exist
+    conn.execute(text("""
+        INSERT INTO identifier_type (id, name, description)
+        SELECT :id, 'unitid', 'IPEDS Identifier (https://ceds.ed.gov/element/000166)'
+        WHERE NOT EXISTS (SELECT 1 FROM identifier_type WHERE name = 'unitid')
+    """), {"id": uuid4()})
 
-def add_ipeds_id_type():
-    """For each institution map it to a ROR and then IPEDS identifier"""
 
-    # Load in the mapping data
-    # https://github.com/opensyllabus/institution-identifiers/blob/main/latest.csv
-    ror_to_unitid_df = pd.read_csv("institutions_api/db/migrations/add_institution_metadata_0/data/ror_to_unitid.csv")
-    ror_to_unitid_df = ror_to_unitid_df.loc[~ror_to_unitid_df['ror_id'].isna()]
-    ror_to_unitid = ror_to_unitid_df.set_index("ror_id").to_dict(orient="index")
-
-    # https://nces.ed.gov/ipeds/datacenter/DataFiles.aspx?year=2023
+def staged_ipeds_rows() -> list:
+    """ Join the ROR -> unitid mapping to the IPEDS data, one row per ROR ID with IPEDS data """
     ipeds_data = load_ipeds_data()
-
-    with engine.connect() as conn:
-
-        # Get the unitid identifier id
-        unitid_identifier_id = conn.execute(text("""
-            SELECT id FROM identifier_type WHERE name = 'unitid'
-        """)).fetchone()[0]
-
-        # Get the institutions with ROR identifiers
-        institutes = conn.execute(text("""
-            SELECT inst.*, ii.identifier, it.name
-            FROM institution inst
-            LEFT JOIN institution_identifier ii on inst.id = ii.institution_id
-            LEFT JOIN public.identifier_type it on ii.identifier_type_id = it.id
-            WHERE it.name = 'ror_id'
-        """)).mappings().fetchall()
-
-        for institute in institutes:
-            ror_id = institute["identifier"].replace("https://ror.org/", "")
-            unit_id = ror_to_unitid.get(ror_id, {}).get("unitid")
-            iped_data = ipeds_data.get(unit_id)
-
-            # Add the IPEDS identifier
-            if iped_data:
-
-                # Check if that institution already exists
-                existing_iped = conn.execute(text(f"""
-                    SELECT * FROM institution_ipeds_metadata WHERE institution_id = '{institute['id']}'
-                """)).fetchone()
-
-                if institute["latitude"] is None:
-
-                    conn.execute(text(f"""
-                        UPDATE institution SET latitude = {iped_data['LATITUDE']}, longitude = {iped_data['LONGITUD']} WHERE id = '{institute['id']}'
-                    """))
-
-                if not existing_iped:
-
-                    identifier_id = conn.execute(text(f"""
-                        INSERT INTO institution_identifier (
-                            id, institution_id, identifier_type_id, identifier
-                        ) VALUES (
-                            '{uuid4()}', '{institute['id']}', '{unitid_identifier_id}', '{int(unit_id)}'
-                        ) RETURNING id
-                    """)).fetchone()[0]
-
-                    ipeds_metadata = {
-                        "id": uuid4(),
-                        "institution_id": institute['id'],
-                        "institution_identifier_id": identifier_id,
-                        "website_address": iped_data["WEBADDR"],
-                        "historically_black_college_or_university": iped_data["HBCU"] == 1,  # One is True, 2 is False
-                        "tribal_college_or_university": iped_data['TRIBAL'] == 1,            # One is True, 2 is False
-                        "program_length": PROGRAM_LENGTH_MAPPING[str(iped_data['ICLEVEL'])],
-                        "control": CONTROL_MAPPING[str(iped_data['CONTROL'])],
-                        "state": iped_data['STABBR'],
-                        "institution_size": INSTITUTION_SIZE_MAPPING[str(iped_data['INSTSIZE'])]
-                    }
-
-                    conn.execute(
-                        text(f"""
-                            INSERT INTO institution_ipeds_metadata (
-                                id, institution_id, institution_identifier_id, website_address, historically_black_college_or_university, tribal_college_or_university, program_length, control, state, institution_size
-                            ) VALUES (
-                                :id, :institution_id, :institution_identifier_id, :website_address, :historically_black_college_or_university, :tribal_college_or_university, :program_length, :control, :state, :institution_size
-                            )
-                        """), ipeds_metadata
-                    )
-
-        conn.commit()
+    rows = []
+    with open(ROR_TO_UNITID_PATH, newline="") as f:
+        for mapping in csv.DictReader(f):
+            if not mapping["ror_id"] or not mapping["unitid"]:
+                continue
+            # The mapping stores some unitids as floats, e.g. "100654.0"
+            unit_id = str(int(float(mapping["unitid"])))
+            ipeds_data_row = ipeds_data.get(unit_id)
+            if ipeds_data_row is None:
+                continue
+            rows.append({
+                "ror_id": f"{ROR_ID_PREFIX}{mapping['ror_id']}",
+                "unitid": unit_id,
+                "identifier_id": uuid4(),
+                "metadata_id": uuid4(),
+                "latitude": ipeds_data_row.get("LATITUDE"),
+                "longitude": ipeds_data_row.get("LONGITUD"),
+                **ipeds_metadata_values(ipeds_data_row),
+            })
+    return rows
+
+
+def stage_ipeds_rows(conn: Connection, rows: list):
+    """ Bulk load the joined rows into a temporary table, matched to the institutions holding each ROR ID """
+    conn.execute(text("""
+        CREATE TEMPORARY TABLE ipeds_staging (
+            ror_id TEXT PRIMARY KEY,
+            unitid TEXT NOT NULL,
+            identifier_id UUID NOT NULL,
+            metadata_id UUID NOT NULL,
+            latitude FLOAT,
+            longitude FLOAT,
+            website_address TEXT,
+            historically_black_college_or_university BOOLEAN,
+            tribal_college_or_university BOOLEAN,
+            program_length TEXT,
+            control TEXT,
+            state TEXT,
+            institution_size TEXT
+        ) ON COMMIT DROP
+    """))
+    # A multi-row INSERT per page of rows, executemany of a text() statement would make a round trip per row
+    with conn.connection.cursor() as cursor:
+        execute_values(cursor, f"INSERT INTO ipeds_staging ({', '.join(STAGING_COLUMNS)}) VALUES %s",
+                       [tuple(row[c] for c in STAGING_COLUMNS) for row in rows], page_size=STAGING_PAGE_SIZE)
+
+    conn.execute(text("ANALYZE ipeds_staging"))
+
+    # Existing metadata is looked up with one hashed join rather than a probe per institution
+    conn.execute(text("""
+        CREATE TEMPORARY TABLE ipeds_matches ON COMMIT DROP AS
+        SELECT inst.id AS institution_id, inst.latitude IS NULL AS missing_coordinates,
+               im.institution_id IS NULL AS missing_metadata, s.*
+        FROM ipeds_staging s
+        JOIN institution_identifier ii ON ii.identifier = s.ror_id
+        JOIN identifier_type it ON it.id = ii.identifier_type_id AND it.name = 'ror_id'
+        JOIN institution inst ON inst.id = ii.institution_id
+        LEFT JOIN (SELECT DISTINCT institution_id FROM institution_ipeds_metadata) im ON im.institution_id = inst.id
+        WHERE im.institution_id IS NULL OR inst.latitude IS NULL
+    """))
+
+
+def add_ipeds_id_type(conn: Connection) -> dict:
+    """ Map each institution with a ROR identifier to its IPEDS identifier and metadata,
+    returning the names of the institutions changed by each step
+    """
+
+    stage_ipeds_rows(conn, staged_ipeds_rows())
+
+    unitid_identifier_id = conn.execute(text("""
+        SELECT id FROM identifier_type WHERE name = 'unitid'
+    """)).scalar_one()
+
+    coordinates = conn.execute(text("""
+        UPDATE institution inst
+        SET latitude = m.latitude, longitude = m.longitude
+        FROM ipeds_matches m
+        WHERE inst.id = m.institution_id AND m.missing_coordinates
+        RETURNING inst.name
+    """)).scalars().all()
+
+    # Institutions that already have metadata keep their identifiers, an identical unitid is reused
+    identifiers = conn.execute(text("""
+        INSERT INTO institution_identifier (id, institution_id, identifier_type_id, identifier)
+        SELECT m.identifier_id, m.institution_id, :unitid_identifier_id, m.unitid
+        FROM ipeds_matches m
+        WHERE m.missing_metadata
+        ON CONFLICT (identifier_type_id, identifier) DO NOTHING
+        RETURNING (SELECT name FROM institution WHERE id = institution_id)
+    """), {"unitid_identifier_id": unitid_identifier_id}).scalars().all()
+
+    metadata = conn.execute(text("""
+        INSERT INTO institution_ipeds_metadata (
+            id, institution_id, institution_identifier_id, website_address, historically_black_college_or_university,
+            tribal_college_or_university, program_length, control, state, institution_size
+        )
+        SELECT
+            m.metadata_id, m.institution_id, ii.id, m.website_address, m.historically_black_college_or_university,
+            m.tribal_college_or_university, CAST(m.program_length AS program_length), CAST(m.control AS control),
+            m.state, CAST(m.institution_size AS institution_size)
+        FROM ipeds_matches m
+        JOIN institution_identifier ii
+            ON ii.institution_id = m.institution_id
+            AND ii.identifier_type_id = :unitid_identifier_id
+            AND ii.identifier = m.unitid
+        WHERE m.missing_metadata
+        RETURNING (SELECT name FROM institution WHERE id = institution_id)
+    """), {"unitid_identifier_id": unitid_identifier_id}).scalars().all()
+
+    return {
+        "coordinates_set": coordinates,
+        "unitid_identifiers_added": identifiers,
+        "ipeds_metadata_added": metadata,
+    }
 
 
 def main():
-    update_existing_tables()
-    add_ipeds_id_type()
+    parser = argparse.ArgumentParser(description="Add IPEDS identifiers and metadata to institutions with a ROR ID")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes and roll them back")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with get_engine().connect() as conn:
+        update_existing_tables(conn)
+        changes = add_ipeds_id_type(conn)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+
+    for step, names in changes.items():
+        print(f"{step}: {len(names)}")
+        if args.dry_run:
+            for name in sorted(names):
+                print(f"    {name}")
+    print(f"{'Dry run' if args.dry_run else 'Migration'} finished in {time.perf_counter() - started:.2f}s"
+          f"{', rolled back' if args.dry_run else ''}")
 
 
 if __name__ == "__main__":
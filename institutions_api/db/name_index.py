@@ -0,0 +1,171 @@
+import logging
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Sequence, Set, Tuple
+
+from institutions_api.db import db
+from institutions_api.db.incremental_index import IncrementalInstitutionIndex
+from institutions_api.models.api_models import InstitutionBaseModel, InstitutionSearchResultModel
+
+logger = logging.getLogger("default")
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name: str) -> str:
+    """ Lowercase, accent-free form of a name with runs of punctuation and whitespace collapsed to one space """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return _NON_ALPHANUMERIC.sub(" ", "".join(c for c in decomposed if not unicodedata.combining(c))).strip()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """ Trigrams of each word padded like pg_trgm, two spaces in front and one behind """
+    return {padded[i:i + 3] for word in normalized.split() for padded in [f"  {word} "] for i in range(len(padded) - 2)}
+
+
+class InstitutionNameIndex(IncrementalInstitutionIndex):
+    """ Ranked prefix and fuzzy search over the names of valid institutions.
+    Names and the words in them are kept sorted for prefix matching, with a posting list of institutions per word.
+    Misspelled words are matched through trigram posting lists over the vocabulary of words. Everything is updated
+    in place when institutions change, as the changed institutions are re-read by ID before the next search
+    """
+
+    # Minimum trigram similarity of a vocabulary word to a misspelled query word, the pg_trgm default
+    SIMILARITY_THRESHOLD = 0.3
+    # Bound on the number of candidates scored per search
+    MAX_CANDIDATES = 1000
+
+    def __init__(self):
+        super().__init__()
+        self._institutions: Dict[str, InstitutionBaseModel] = {}
+        self._names: Dict[str, str] = {}
+        self._name_lengths: Dict[str, int] = {}
+        self._name_trigrams: Dict[str, Set[str]] = {}
+        self._sorted_names: List[Tuple[str, str]] = []
+        self._words: Dict[str, Set[str]] = {}
+        self._sorted_words: List[str] = []
+        self._word_trigrams: Dict[str, Set[str]] = {}
+
+    def _add(self, institution: InstitutionBaseModel, keep_sorted: bool = True):
+        normalized = normalize_name(institution.name)
+        self._institutions[institution.id] = institution
+        self._names[institution.id] = normalized
+        self._name_lengths[institution.id] = len(normalized)
+        self._name_trigrams[institution.id] = trigrams(normalized)
+        if keep_sorted:
+            insort(self._sorted_names, (normalized, institution.id))
+        for word in set(normalized.split()):
+            if word not in self._words:
+                self._words[word] = set()
+                if keep_sorted:
+                    insort(self._sorted_words, word)
+                for trigram in trigrams(word):
+                    self._word_trigrams.setdefault(trigram, set()).add(word)
+            self._words[word].add(institution.id)
+
+    def _remove(self, topology_id: str):
+        if topology_id not in self._institutions:
+            return
+        del self._institutions[topology_id]
+        del self._name_trigrams[topology_id]
+        del self._name_lengths[topology_id]
+        normalized = self._names.pop(topology_id)
+        del self._sorted_names[bisect_left(self._sorted_names, (normalized, topology_id))]
+        for word in set(normalized.split()):
+            self._words[word].discard(topology_id)
+            if not self._words[word]:
+                del self._words[word]
+                del self._sorted_words[bisect_left(self._sorted_words, word)]
+                for trigram in trigrams(word):
+                    self._word_trigrams[trigram].discard(word)
+                    if not self._word_trigrams[trigram]:
+                        del self._word_trigrams[trigram]
+
+    def _load(self, institutions: Sequence[InstitutionBaseModel]):
+        for institution in institutions:
+            self._add(institution, keep_sorted=False)
+        self._sorted_names = sorted((name, i) for i, name in self._names.items())
+        self._sorted_words = sorted(self._words)
+        logger.info(f"Built name index of {len(self._institutions)} institutions")
+
+    def _name_prefix_matches(self, normalized: str) -> List[str]:
+        """ IDs of institutions whose names start with the query, alphabetically """
+        start = bisect_left(self._sorted_names, (normalized,))
+        end = bisect_left(self._sorted_names, (normalized + "\uffff",), start)
+        return [i for _, i in self._sorted_names[start:min(end, start + self.MAX_CANDIDATES)]]
+
+    def _prefixed_words(self, prefix: str) -> List[str]:
+        """ Vocabulary words starting with prefix """
+        start = bisect_left(self._sorted_words, prefix)
+        return self._sorted_words[start:bisect_left(self._sorted_words, prefix + "\uffff", start)]
+
+    def _similar_words(self, word: str) -> List[str]:
+        """ Vocabulary words starting with, or with a trigram similarity of at least the threshold to, word """
+        word_trigrams = trigrams(word)
+        shared = Counter()
+        for trigram in word_trigrams:
+            shared.update(self._word_trigrams.get(trigram, ()))
+        # similarity = shared / (|word| + |other| - shared), and an n letter word has n + 1 trigrams at most
+        similar = [other for other, n in shared.items()
+                   if n >= self.SIMILARITY_THRESHOLD * (len(word_trigrams) + len(other) + 1 - n)]
+        return self._prefixed_words(word) + similar
+
+    def _word_matches(self, expansions: List[List[str]]) -> Set[str]:
+        """ IDs of institutions with, for each query word, one of the vocabulary words it expands to """
+        # Each query word's expansions with their posting lists, so both stay together when sorted
+        pairs = [(words, [self._words[w] for w in words if w in self._words]) for words in expansions]
+        # Intersect the cheapest unions first, then check the remaining words against the few candidates left
+        pairs.sort(key=lambda pair: sum(map(len, pair[1])))
+        candidates = set().union(*pairs[0][1]) if pairs else set()
+        for i, (_, sets) in enumerate(pairs[1:], 1):
+            if len(candidates) <= self.MAX_CANDIDATES:
+                # Every query word but those whose postings were already intersected
+                remaining = [set(words) for words, _ in pairs[i:]]
+                return {c for c in candidates if all(any(w in words for w in self._names[c].split()) for words in remaining)}
+            # Intersecting each set before the union only reads the smaller side of each pair
+            candidates = set().union(*(candidates & posting for posting in sets))
+        # Too many to score, keep the shortest names as they are the most similar to the query
+        return set(sorted(candidates, key=self._name_lengths.__getitem__)[:self.MAX_CANDIDATES])
+
+    def search(self, query: str, limit: int = 10) -> List[InstitutionSearchResultModel]:
+        """ Valid institutions whose names start with, contain words starting with, or contain words resembling
+        each word of the query. Ranked by exact match, name prefix, word prefix, then trigram similarity of the names
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        with self._lock:
+            self._update()
+
+            words = normalized.split()
+            # Each tier ranks above the next, so later tiers are only searched while results are short
+            tiers = [
+                (2, lambda: self._name_prefix_matches(normalized)),
+                (1, lambda: self._word_matches([self._prefixed_words(w) for w in words])),
+                (0, lambda: self._word_matches([self._similar_words(w) for w in words])),
+            ]
+            query_trigrams = trigrams(normalized)
+            scored, seen = [], set()
+            for tier, matches in tiers:
+                if len(scored) >= limit:
+                    break
+                for topology_id in matches():
+                    if topology_id in seen:
+                        continue
+                    seen.add(topology_id)
+                    name_trigrams = self._name_trigrams[topology_id]
+                    shared = len(query_trigrams & name_trigrams)
+                    similarity = shared / (len(query_trigrams) + len(name_trigrams) - shared)
+                    exact = 1 if self._names[topology_id] == normalized else 0
+                    scored.append((-(tier + exact + similarity), self._names[topology_id], topology_id))
+
+            scored.sort()
+            return [InstitutionSearchResultModel(**self._institutions[i].model_dump(), score=round(-score, 3))
+                    for score, _, i in scored[:limit]]
+
+
+name_index = InstitutionNameIndex()
+db.add_change_listener(name_index.institutions_changed)
@@ -0,0 +1,49 @@
+import time
+from typing import Dict, Iterable
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from institutions_api.util.metrics import Family, registry
+
+POOL_CHECKOUT_SECONDS = registry.histogram(
+    "institutions_db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool, including opening one when the pool grows", ["engine"])
+
+
+class _TimedCheckout:
+    """ Pool mixin recording how long each checkout waits """
+    engine_name = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, self.engine_name)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    engine_name = "sync"
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+
+class TimedReplicaQueuePool(_TimedCheckout, QueuePool):
+    engine_name = "replica"
+
+
+class TimedReplicaAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    engine_name = "async_replica"
+
+
+def pool_metrics(pools: Dict[str, Pool]) -> Iterable[Family]:
+    """ Size and usage of each queue pool, by engine name """
+    queue_pools = {name: pool for name, pool in pools.items() if isinstance(pool, QueuePool)}
+    yield ("institutions_db_pool_size", "gauge", "Connections the pool keeps open",
+           [({"engine": name}, pool.size()) for name, pool in queue_pools.items()])
+    yield ("institutions_db_pool_checked_out", "gauge", "Connections currently checked out of the pool",
+           [({"engine": name}, pool.checkedout()) for name, pool in queue_pools.items()])
+    yield ("institutions_db_pool_overflow", "gauge", "Connections open beyond the pool size, negative while the pool is not full",
+           [({"engine": name}, pool.overflow()) for name, pool in queue_pools.items()])
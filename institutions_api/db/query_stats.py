@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """ Number of SQL statements run, and the time spent running them """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: List[str] = []
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append(statement)
+
+    def merge(self, other: "QueryStats"):
+        self.count += other.count
+        self.seconds += other.seconds
+        self.statements.extend(other.statements)
+
+
+# Stats of the request being handled. Threadpool calls copy the context, so they add to the same stats
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Totals over every request finished while they are collecting, see collect_requests
+_collectors: List[QueryStats] = []
+_collectors_lock = Lock()
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryStats]:
+    """ Count the statements run within this context, including in threadpool calls made from it """
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def request_finished(stats: QueryStats):
+    """ Add the stats of a finished request to every active collector """
+    with _collectors_lock:
+        for collector in _collectors:
+            collector.merge(stats)
+
+
+def collecting_requests() -> bool:
+    return bool(_collectors)
+
+
+@contextmanager
+def collect_requests() -> Iterator[QueryStats]:
+    """ Sum the stats of every request finished within this block. Statements run outside of requests, like
+    cache warm-up at startup, are not counted
+    """
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and conn.info.get("query_started"):
+        stats.add(statement, time.perf_counter() - conn.info["query_started"].pop())
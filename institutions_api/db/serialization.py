@@ -0,0 +1,103 @@
+import enum
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+from uuid import UUID
+
+import orjson
+
+from institutions_api.db.db_models import Institution
+
+
+def _value(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def institution_dict(inst: Institution, identifier_type_names: Dict[UUID, str]) -> dict:
+    """ The JSON form of InstitutionBaseModel.from_institution, built straight from the ORM object.
+    Keys are in model field order so the encoded bytes are identical to the pydantic serialization
+    """
+    ror_id = unitid = None
+    for identifier in inst.identifiers:
+        type_name = identifier_type_names.get(identifier.identifier_type_id)
+        if type_name == "ror_id" and ror_id is None:
+            ror_id = identifier.identifier
+        elif type_name == "unitid" and unitid is None:
+            unitid = identifier.identifier
+
+    ipeds = inst.ipeds_metadata
+    carnegie = inst.carnegie_metadata
+    return {
+        "name": inst.name,
+        "id": inst.topology_identifier,
+        "ror_id": ror_id,
+        "unitid": unitid,
+        "longitude": inst.longitude,
+        "latitude": inst.latitude,
+        "state": inst.state,
+        "ipeds_metadata": {
+            "website_address": ipeds.website_address,
+            "historically_black_college_or_university": ipeds.historically_black_college_or_university,
+            "tribal_college_or_university": ipeds.tribal_college_or_university,
+            "program_length": _value(ipeds.program_length),
+            "control": _value(ipeds.control),
+            "state": ipeds.state,
+            "institution_size": _value(ipeds.institution_size),
+        } if ipeds else None,
+        "carnegie_metadata": {
+            "classification2021": _value(carnegie.classification2021),
+            "classification2025": _value(carnegie.classification2025),
+        } if carnegie else None,
+    }
+
+
+def _row_version(inst: Institution):
+    return inst.updated or inst.created
+
+
+class InstitutionFragmentCache:
+    """ Encoded JSON of each institution, keyed by topology ID and row version.
+    Every write path sets Institution.updated, so a fragment is reused until its row is written again. Changed
+    institutions are also dropped through the db change listeners, so invalidated ones do not linger
+    """
+
+    def __init__(self):
+        self._fragments: Dict[str, Tuple[object, bytes]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def institutions_changed(self, topology_ids: Iterable[str]):
+        """ Change listener, drops the fragments of changed institutions """
+        with self._lock:
+            for topology_id in topology_ids:
+                self._fragments.pop(topology_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def fragment(self, inst: Institution, identifier_type_names: Dict[UUID, str]) -> bytes:
+        """ Encoded JSON of an institution, encoded at most once per row version """
+        version = _row_version(inst)
+        cached = self._fragments.get(inst.topology_identifier)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        fragment = orjson.dumps(institution_dict(inst, identifier_type_names))
+        self._fragments[inst.topology_identifier] = (version, fragment)
+        return fragment
+
+    def fragments(self, institutions: Iterable[Institution], identifier_type_names: Dict[UUID, str]) -> List[bytes]:
+        return [self.fragment(i, identifier_type_names) for i in institutions]
+
+
+def json_array(fragments: List[bytes]) -> bytes:
+    """ JSON array of already encoded values """
+    return b"[" + b",".join(fragments) + b"]"
+
+
+fragment_cache = InstitutionFragmentCache()
@@ -0,0 +1,73 @@
+from asyncio import Lock as AsyncLock
+from threading import Lock
+from typing import Awaitable, Callable, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class VersionedSnapshot(Generic[T]):
+    """ In-process cache of a value derived from the database, keyed by a data version.
+
+    Write paths call bump() after they commit, which makes the cached value stale so the
+    next read rebuilds it. Reads of a current value never touch the database.
+    """
+
+    def __init__(self):
+        self._version = 0
+        # Reads served from the cached value, and values built
+        self.hits = 0
+        self.builds = 0
+        self._entry: Tuple[int, Optional[T]] = (-1, None)
+        self._version_lock = Lock()
+        self._build_lock = Lock()
+        self._async_build_lock = AsyncLock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        """ Mark the cached value as stale, return the new data version """
+        with self._version_lock:
+            self._version += 1
+            return self._version
+
+    def current(self) -> Optional[T]:
+        """ Get the cached value if it was built for the current data version """
+        value_version, value = self._entry
+        return value if value_version == self._version else None
+
+    def store(self, version: int, value: T) -> T:
+        """ Cache a value built from the data as of the given version. A value whose version was
+        superseded by a write while it was being built is returned but not cached.
+        """
+        with self._version_lock:
+            if version == self._version:
+                self._entry = (version, value)
+        return value
+
+    def get_or_build(self, build: Callable[[], T]) -> T:
+        """ Get the current value, building it at most once per data version """
+        if (value := self.current()) is not None:
+            self.hits += 1
+            return value
+        with self._build_lock:
+            if (value := self.current()) is not None:
+                self.hits += 1
+                return value
+            version = self._version
+            self.builds += 1
+            return self.store(version, build())
+
+    async def get_or_build_async(self, build: Callable[[], Awaitable[T]]) -> T:
+        """ Get the current value, awaiting a build at most once per data version on the event loop """
+        if (value := self.current()) is not None:
+            self.hits += 1
+            return value
+        async with self._async_build_lock:
+            if (value := self.current()) is not None:
+                self.hits += 1
+                return value
+            version = self._version
+            self.builds += 1
+            return self.store(version, await build())
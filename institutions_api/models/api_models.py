@@ -1,4 +1,6 @@
-from typing import Optional
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
 
 from pydantic import BaseModel, Field, model_validator, field_validator
 from institutions_api.db.db_models import Institution
@@ -42,9 +44,14 @@ class InstitutionBaseModel(BaseModel):
     carnegie_metadata: Optional[InstitutionCarnegieClassificationMetadataModel] = Field(None, description="The associated Carnegie Classification metadata for this institution")
 
     @classmethod
-    def from_institution(cls, inst: Institution) -> "InstitutionModel":
-        ror_ids = [i.identifier for i in inst.identifiers if i.identifier_type.name == 'ror_id']
-        unitids = [i.identifier for i in inst.identifiers if i.identifier_type.name == 'unitid']
+    def from_institution(cls, inst: Institution, identifier_type_names: Optional[Dict[UUID, str]] = None) -> "InstitutionModel":
+        """ Build the API model of an institution. Identifier type names are looked up by id in identifier_type_names
+        when given, otherwise through each identifier's identifier_type relationship
+        """
+        def type_name(i):
+            return identifier_type_names.get(i.identifier_type_id) if identifier_type_names is not None else i.identifier_type.name
+        ror_ids = [i.identifier for i in inst.identifiers if type_name(i) == 'ror_id']
+        unitids = [i.identifier for i in inst.identifiers if type_name(i) == 'unitid']
         return InstitutionBaseModel(
             name=inst.name,
             id=inst.topology_identifier,
@@ -95,3 +102,66 @@ class InstitutionValidatorModel(InstitutionBaseModel):
         return unitid
 
 
+
+
+class BulkInstitutionResultModel(BaseModel):
+    """ API model for the outcome of a single item of a bulk institution request """
+    index: int = Field(..., description="Position of the item in the request")
+    name: Optional[str] = Field(None, description="The name of the institution")
+    id: Optional[str] = Field(None, description="The institution's OSG ID, if it was created or updated")
+    status: str = Field(..., description="One of 'created', 'updated', 'failed', or 'rolled_back' when another item failed")
+    detail: Optional[str] = Field(None, description="Why the item failed")
+
+
+class BulkInstitutionResponseModel(BaseModel):
+    """ API model for the outcome of a bulk institution request """
+    committed: bool = Field(..., description="Whether any changes were committed")
+    results: List[BulkInstitutionResultModel] = Field(..., description="Per-item results, in request order")
+
+
+class InstitutionLookupRequestModel(BaseModel):
+    """ API model for resolving many ROR IDs and unit IDs to institutions at once """
+    ror_ids: List[str] = Field([], description="ROR IDs, with or without the https://ror.org/ prefix")
+    unitids: List[str] = Field([], description="IPEDS unit IDs")
+
+
+class InstitutionLookupResponseModel(BaseModel):
+    """ API model for the institutions holding each requested identifier, null where there is none """
+    ror_ids: Dict[str, Optional[InstitutionBaseModel]] = Field({}, description="Institution by requested ROR ID")
+    unitids: Dict[str, Optional[InstitutionBaseModel]] = Field({}, description="Institution by requested unit ID")
+
+
+class NearbyInstitutionModel(InstitutionBaseModel):
+    """ API model for an institution found by a geo search """
+    distance_km: float = Field(..., description="Great-circle distance from the searched point, in kilometers")
+
+
+class InstitutionSearchResultModel(InstitutionBaseModel):
+    """ API model for an institution found by a name search """
+    score: float = Field(..., description="Relevance of the match, higher is better")
+
+
+class FacetedInstitutionsResponseModel(BaseModel):
+    """ API model for the institutions matching a set of facet filters """
+    total: int = Field(..., description="Number of institutions matching every filter")
+    facets: Dict[str, Dict[str, int]] = Field(..., description="Number of matching institutions holding each value of "
+                                                               "each facet, ignoring the filter on that facet itself")
+    institutions: List[InstitutionBaseModel] = Field(..., description="The requested page of matching institutions, by name")
+
+
+class InstitutionChangeModel(BaseModel):
+    """ API model for the latest change to an institution """
+    id: str = Field(..., description="The institution's OSG ID")
+    kind: str = Field(..., description="One of 'create', 'update' or 'invalidate'")
+    changed: datetime = Field(..., description="When the change was committed")
+    cursor: str = Field(..., description="Pass as since to get the changes after this one")
+    institution: Optional[InstitutionBaseModel] = Field(None, description="The institution as it is now, null for "
+                                                                           "invalidations")
+
+
+class InstitutionChangesResponseModel(BaseModel):
+    """ API model for a page of the institution change feed """
+    changes: List[InstitutionChangeModel] = Field(..., description="The latest change to each institution changed "
+                                                                   "since the cursor, in the order they were committed")
+    cursor: str = Field(..., description="Pass as since to get the changes after these")
+    has_more: bool = Field(..., description="Whether more changes are available right away")
@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+import pytest
+
+from institutions_api.db import query_stats
+
+
+@pytest.fixture
+def query_budget():
+    """ Context manager factory failing the test if the requests made within it run more than max_queries SQL
+    statements in total, e.g. `with query_budget(2): api_client.get(...)`
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        with query_stats.collect_requests() as stats:
+            yield stats
+        assert stats.count <= max_queries, \
+            f"{stats.count} queries run, over the budget of {max_queries}:\n" + "\n\n".join(stats.statements)
+    return budget
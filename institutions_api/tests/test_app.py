@@ -1,8 +1,13 @@
+import json
+import time
 import uuid
+from datetime import datetime, timezone
 
 import pytest
 from fastapi.testclient import TestClient
 from institutions_api.app import app
+from institutions_api.db import db
+from institutions_api.db.serialization import fragment_cache
 
 @pytest.fixture
 def api_client():
@@ -11,6 +16,17 @@ def api_client():
 
 class TestAPIEndpoints:
 
+    def test_readiness(self, api_client):
+        """test whether the readiness probe succeeds once the caches are warm"""
+        for _ in range(50):
+            response = api_client.get("/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(0.1)
+        assert response.status_code == 200
+        assert response.json()["ready"]
+        assert response.json()["caches"]["ipeds"]["status"] == "warm"
+
     def test_get_valid_institutions(self, api_client):
         """test whether getting a list of institutions works"""
         response = api_client.get("/institution_ids")
@@ -19,6 +35,40 @@ class TestAPIEndpoints:
         assert isinstance(institutions, list)
         assert len(institutions) > 0
 
+    def test_paginate_valid_institutions(self, api_client):
+        """test whether paging through projected institutions returns the full list in order"""
+        names, cursor = [], None
+        while True:
+            params = {"limit": 5, "fields": "id,name", **({"cursor": cursor} if cursor else {})}
+            response = api_client.get("/institution_ids", params=params)
+            assert response.status_code == 200
+            assert all(set(i) == {"id", "name"} for i in response.json())
+            names += [i["name"] for i in response.json()]
+            if not (cursor := response.headers.get("X-Next-Cursor")):
+                break
+
+        assert names == [i["name"] for i in api_client.get("/institution_ids").json()]
+
+    def test_stream_valid_institutions(self, api_client):
+        """test whether the streamed listings match the regular listing"""
+        institutions = api_client.get("/institution_ids").json()
+
+        response = api_client.get("/institution_ids", params={"stream": True})
+        assert response.status_code == 200
+        assert response.json() == institutions
+
+        response = api_client.get("/institution_ids", params={"stream": True}, headers={"Accept": "application/x-ndjson"})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == institutions
+
+    def test_stream_does_not_cache_fragments(self, api_client):
+        """test whether streaming the listing leaves the fragment cache alone, so its memory stays flat"""
+        fragment_cache.clear()
+        response = api_client.get("/institution_ids", params={"stream": True})
+        assert response.status_code == 200
+        assert len(response.json()) > 0
+        assert len(fragment_cache) == 0
+
     def test_get_institution_details(self, api_client):
         """test whether getting an institution details works"""
         response = api_client.get("/institutions/3yiehdw3bef5")
@@ -26,6 +76,95 @@ class TestAPIEndpoints:
         institution = response.json()
         assert institution['name'] == "Academia Sinica"
 
+    def test_institution_details_validators_match_body(self, api_client, monkeypatch):
+        """test whether a full detail response takes its validators from the row its body was read from"""
+        # As if the institution was written between reading its watermark and its details
+        stale = db.InstitutionWatermark(1, datetime(2000, 1, 1, tzinfo=timezone.utc))
+        monkeypatch.setattr(db, "get_institution_watermark", lambda short_id: stale)
+        response = api_client.get("/institutions/3yiehdw3bef5", headers={"If-None-Match": '"0-0"'})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == db.get_institution_details_json("3yiehdw3bef5").watermark.etag != stale.etag
+
+    def test_conditional_get_valid_institutions(self, api_client):
+        """test whether the institution list is revalidated by ETag and Last-Modified until an institution changes"""
+        response = api_client.get("/institution_ids")
+        etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+        response = api_client.get("/institution_ids", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        assert api_client.get("/institution_ids", headers={"If-Modified-Since": last_modified}).status_code == 304
+        assert api_client.get("/institution_ids", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+        name = f"Conditional Institute {uuid.uuid4().hex[:8]}"
+        api_client.post("/institutions/bulk", json=[{"name": name}], headers={"oidc_claim_osgid": "test_user"})
+        response = api_client.get("/institution_ids", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert name in [i["name"] for i in response.json()]
+
+    def test_compressed_valid_institutions(self, api_client):
+        """test whether the list is sent pre-compressed by Accept-Encoding, with an ETag per encoding"""
+        identity = api_client.get("/institution_ids", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in identity.headers
+        assert identity.headers["Vary"] == "Accept-Encoding"
+
+        response = api_client.get("/institution_ids", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.headers["ETag"] == identity.headers["ETag"][:-1] + '-gzip"'
+        assert response.json() == identity.json()
+
+        response = api_client.get("/institution_ids", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert api_client.get("/institution_ids", headers={
+            "Accept-Encoding": "identity", "If-None-Match": response.headers["ETag"]}).status_code == 200
+
+    def test_conditional_get_institution_details(self, api_client):
+        """test whether institution details are revalidated by ETag"""
+        response = api_client.get("/institutions/3yiehdw3bef5")
+        etag = response.headers["ETag"]
+        assert "Last-Modified" in response.headers
+        assert api_client.get("/institutions/3yiehdw3bef5", headers={"If-None-Match": etag}).status_code == 304
+        assert api_client.get("/institutions/nosuchinstitution").status_code == 404
+
+    def test_query_budgets(self, api_client, query_budget):
+        """test whether the read endpoints stay within their SQL statement budgets"""
+        with query_budget(3):
+            api_client.get("/institution_ids")
+        with query_budget(2):
+            api_client.get("/institution_ids", params={"limit": 5})
+        with query_budget(3):
+            api_client.get("/institutions/3yiehdw3bef5")
+        with query_budget(3):
+            api_client.post("/institutions/lookup", json={"ror_ids": ["04zdhre16"], "unitids": ["240444"]})
+        # The in-memory indexes only query to re-read institutions changed since their last use
+        with query_budget(1):
+            api_client.get("/institutions", params={"state": "WI"})
+        with query_budget(1):
+            api_client.get("/institutions/search", params={"q": "uni"})
+        with query_budget(1):
+            api_client.get("/institutions/near", params={"lat": 40, "lon": -90})
+
+    def test_query_stats_headers(self, api_client, monkeypatch):
+        """test whether debug mode reports the statements run by each request in its headers"""
+        monkeypatch.setattr("institutions_api.app.DEBUG", True)
+        response = api_client.get("/institution_ids", params={"limit": 5})
+        assert int(response.headers["X-DB-Query-Count"]) >= 1
+        assert float(response.headers["X-DB-Query-Time-Ms"]) > 0
+
+    def test_metrics(self, api_client):
+        """test whether request latency, pool and cache metrics are exposed in the Prometheus text format"""
+        api_client.get("/institutions/3yiehdw3bef5")
+        response = api_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'institutions_http_request_duration_seconds_count{method="GET",route="/institutions/{institution_id}",status="200"}' in response.text
+        assert 'institutions_db_pool_checked_out{engine="sync"}' in response.text
+        assert 'institutions_cache_hits_total{cache="institution_fragments"}' in response.text
+
     def test_post_institution(self, api_client):
         """test whether posting an institution works"""
         unique_name = f"test_institution_{uuid.uuid4().hex[:8]}"
@@ -46,6 +185,134 @@ class TestAPIEndpoints:
         assert response.status_code == 200
         assert response.json() == "ok"
 
+    def test_post_institutions_bulk(self, api_client):
+        """test whether a bulk request creates every institution, or none of them if one fails"""
+        headers = {"oidc_claim_osgid": "test_user"}
+        names = [f"test_institution_{uuid.uuid4().hex[:8]}" for _ in range(3)]
+
+        response = api_client.post("/institutions/bulk", json=[{"name": n} for n in names], headers=headers)
+        assert response.status_code == 200
+        assert [r["status"] for r in response.json()["results"]] == ["created"] * 3
+
+        new_name = f"test_institution_{uuid.uuid4().hex[:8]}"
+        response = api_client.post("/institutions/bulk", json=[{"name": new_name}, {"name": names[0]}], headers=headers)
+        assert response.status_code == 400
+        assert [r["status"] for r in response.json()["results"]] == ["rolled_back", "failed"]
+
+        response = api_client.post("/institutions/bulk?partial=true", json=[{"name": new_name}, {"name": names[0]}], headers=headers)
+        assert response.status_code == 200
+        assert [r["status"] for r in response.json()["results"]] == ["created", "failed"]
+
+        response = api_client.post("/institutions/bulk?partial=true", json=[{"name": names[1]}, {"name": names[2]}], headers=headers)
+        assert response.status_code == 400
+        assert not response.json()["committed"]
+        assert [r["status"] for r in response.json()["results"]] == ["failed", "failed"]
+
+        existing = api_client.get("/institution_ids").json()
+        short_id = next(i["id"] for i in existing if i["name"] == names[1])
+        response = api_client.post("/institutions/bulk", json=[{"id": short_id, "name": names[1]},
+                                                                {"id": short_id, "name": f"{names[1]}_renamed"}], headers=headers)
+        assert response.status_code == 400
+        assert [r["status"] for r in response.json()["results"]] == ["rolled_back", "failed"]
+        assert "Duplicate id" in response.json()["results"][1]["detail"]
+
+        assert api_client.post("/institutions/bulk", json=[], headers=headers).status_code == 422
+
+    def test_lookup_by_identifier(self, api_client):
+        """test whether institutions can be found by ROR ID and unit ID, singly and in a batch"""
+        headers = {"oidc_claim_osgid": "test_user"}
+        name = f"test_institution_{uuid.uuid4().hex[:8]}"
+        institution = {"name": name, "ror_id": "https://ror.org/008s83205", "unitid": "100663"}
+        assert api_client.post("/institutions/bulk", json=[institution], headers=headers).status_code == 200
+
+        assert api_client.get("/institutions/by-ror/008s83205").json()["name"] == name
+        assert api_client.get("/institutions/by-ror/https://ror.org/008s83205").json()["name"] == name
+        assert api_client.get("/institutions/by-unitid/100663").json()["name"] == name
+        assert api_client.get("/institutions/by-unitid/999999").status_code == 404
+
+        response = api_client.post("/institutions/lookup", json={"ror_ids": ["008s83205"], "unitids": ["100663", "999999"]})
+        assert response.status_code == 200
+        assert response.json()["ror_ids"]["008s83205"]["unitid"] == "100663"
+        assert response.json()["unitids"]["100663"]["name"] == name
+        assert response.json()["unitids"]["999999"] is None
+
+    def test_nearest_institutions(self, api_client):
+        """test whether a geo search finds institutions created after the index was built, nearest first"""
+        headers = {"oidc_claim_osgid": "test_user"}
+        names = [f"test_institution_{uuid.uuid4().hex[:8]}" for _ in range(2)]
+        api_client.get("/institutions/near", params={"lat": 0, "lon": 0})
+        institutions = [{"name": names[0], "latitude": -33.90, "longitude": 151.20},
+                        {"name": names[1], "latitude": -33.80, "longitude": 151.30}]
+        assert api_client.post("/institutions/bulk", json=institutions, headers=headers).status_code == 200
+
+        response = api_client.get("/institutions/near", params={"lat": -33.91, "lon": 151.19, "k": 2})
+        assert response.status_code == 200
+        assert [i["name"] for i in response.json()] == names
+        assert response.json()[0]["distance_km"] < 2
+
+        response = api_client.get("/institutions/near", params={"lat": -33.91, "lon": 151.19, "radius_km": 5})
+        assert [i["name"] for i in response.json()] == names[:1]
+
+    def test_search_institutions(self, api_client):
+        """test whether name search finds institutions as they are created and invalidated"""
+        headers = {"oidc_claim_osgid": "test_user"}
+        api_client.get("/institutions/search", params={"q": "seed"})
+        name = f"Searchable Institute {uuid.uuid4().hex[:8]}"
+        response = api_client.post("/institutions/bulk", json=[{"name": name}], headers=headers)
+        short_id = response.json()["results"][0]["id"].split("/")[-1]
+
+        response = api_client.get("/institutions/search", params={"q": name.lower()[:-2]})
+        assert response.status_code == 200
+        assert response.json()[0]["name"] == name
+        assert api_client.get("/institutions/search", params={"q": "Serchable Institute"}).json()[0]["name"].startswith("Searchable")
+
+        api_client.delete(f"/institutions/{short_id}", headers=headers)
+        assert name not in [i["name"] for i in api_client.get("/institutions/search", params={"q": name}).json()]
+
+    def test_faceted_institutions(self, api_client):
+        """test whether institutions are filtered by facet, with counts that follow new institutions"""
+        headers = {"oidc_claim_osgid": "test_user"}
+        before = api_client.get("/institutions", params={"state": "ZZ"}).json()
+        name = f"Faceted Institute {uuid.uuid4().hex[:8]}"
+        api_client.post("/institutions/bulk", json=[{"name": name, "state": "zz"}], headers=headers)
+
+        response = api_client.get("/institutions", params={"state": ["ZZ", "YY"], "limit": 1000})
+        assert response.status_code == 200
+        assert response.json()["total"] == before["total"] + 1
+        assert name in [i["name"] for i in response.json()["institutions"]]
+        assert response.json()["facets"]["state"]["ZZ"] == before["total"] + 1
+
+        assert api_client.get("/institutions", params={"control": "GOVERNMENT"}).status_code == 400
+
+    def test_institution_changes(self, api_client):
+        """test whether the change feed returns the latest change to each institution since the cursor, in order"""
+        headers = {"oidc_claim_osgid": "test_user"}
+        page = {"cursor": None, "has_more": True}
+        while page["has_more"]:
+            page = api_client.get("/institutions/changes", params={"since": page["cursor"], "limit": 1000}).json()
+        cursor = page["cursor"]
+        assert api_client.get("/institutions/changes", params={"since": cursor}).json()["changes"] == []
+
+        names = [f"Changed Institute {uuid.uuid4().hex[:8]}" for _ in range(2)]
+        response = api_client.post("/institutions/bulk", json=[{"name": n} for n in names], headers=headers)
+        updated_id, invalidated_id = [r["id"] for r in response.json()["results"]]
+        api_client.put(f"/institutions/{updated_id.split('/')[-1]}", json={"name": names[0], "state": "WI"}, headers=headers)
+        api_client.delete(f"/institutions/{invalidated_id.split('/')[-1]}", headers=headers)
+
+        response = api_client.get("/institutions/changes", params={"since": cursor})
+        assert response.status_code == 200
+        changes = response.json()["changes"]
+        assert [(c["id"], c["kind"]) for c in changes] == [(updated_id, "update"), (invalidated_id, "invalidate")]
+        assert changes[0]["institution"]["state"] == "WI"
+        assert changes[1]["institution"] is None
+
+        first = api_client.get("/institutions/changes", params={"since": cursor, "limit": 1}).json()
+        assert first["has_more"] and [c["id"] for c in first["changes"]] == [updated_id]
+        second = api_client.get("/institutions/changes", params={"since": first["cursor"], "limit": 1}).json()
+        assert not second["has_more"] and [c["id"] for c in second["changes"]] == [invalidated_id]
+
+        assert api_client.get("/institutions/changes", params={"since": "not a cursor"}).status_code == 400
+
     def test_update_institution(self, api_client):
         """test whether updating an institution works"""
         update_data = {
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from institutions_api.db import db
+from institutions_api.db.change_events import KEEPALIVE, InstitutionChangeBroadcaster
+from institutions_api.models.api_models import InstitutionValidatorModel
+from institutions_api.util.oidc_utils import OIDCUserInfo
+
+AUTHOR = OIDCUserInfo(Request({"type": "http", "headers": [(b"oidc_claim_osgid", b"test_user")]}))
+
+
+def _parse(event: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in event.decode().strip().split("\n"))
+    return {"id": fields["id"], "event": fields["event"], "data": json.loads(fields["data"])}
+
+
+def _add_institution() -> str:
+    name = f"Event Institute {uuid.uuid4().hex[:8]}"
+    db.add_institution(InstitutionValidatorModel(name=name), AUTHOR)
+    return name
+
+
+def _run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+class TestInstitutionChangeBroadcaster:
+
+    def test_pushes_changes_committed_in_this_process(self, monkeypatch):
+        """test whether subscribers get an event as soon as a write in this process commits"""
+        broadcaster = InstitutionChangeBroadcaster(poll_seconds=60, keepalive_seconds=60)
+        monkeypatch.setattr(db, "_change_listeners", [*db._change_listeners, broadcaster.institutions_changed])
+
+        async def receive():
+            stream = broadcaster.stream()
+            first = asyncio.ensure_future(stream.__anext__())
+            while not broadcaster.subscribers:
+                await asyncio.sleep(0.01)
+            before = db.get_latest_change_cursor()
+            await run_in_threadpool(_add_institution)
+            event = _parse(await first)
+            await stream.aclose()
+            await broadcaster.close()
+            return before, event
+
+        before, event = _run(receive())
+        assert event["event"] == "create"
+        assert event["id"] != before
+        assert event["data"]["kind"] == "create"
+        assert set(event["data"]) == {"id", "kind", "changed"}
+        assert broadcaster.subscribers == 0
+
+    def test_polls_for_changes_from_other_processes(self):
+        """test whether writes that do not notify the broadcaster are picked up by polling"""
+        broadcaster = InstitutionChangeBroadcaster(poll_seconds=0.05, keepalive_seconds=60)
+
+        async def receive():
+            stream = broadcaster.stream()
+            first = asyncio.ensure_future(stream.__anext__())
+            while not broadcaster.subscribers:
+                await asyncio.sleep(0.01)
+            await run_in_threadpool(_add_institution)
+            event = _parse(await first)
+            await stream.aclose()
+            await broadcaster.close()
+            return event
+
+        assert _run(receive())["event"] == "create"
+
+    def test_resumes_after_last_event_id(self):
+        """test whether a stream resumed from an older cursor first catches up from the change feed"""
+        since = db.get_latest_change_cursor()
+        _add_institution()
+        _add_institution()
+        broadcaster = InstitutionChangeBroadcaster(poll_seconds=60, keepalive_seconds=60)
+
+        async def receive():
+            stream = broadcaster.stream(since)
+            events = [_parse(await stream.__anext__()) for _ in range(2)]
+            await stream.aclose()
+            await broadcaster.close()
+            return events
+
+        events = _run(receive())
+        expected = db.get_institution_changes(since, 2).changes
+        assert [e["id"] for e in events] == [c.cursor for c in expected]
+        assert [e["data"]["id"] for e in events] == [c.id for c in expected]
+
+    def test_keepalive(self):
+        """test whether idle streams send keepalive comments"""
+        broadcaster = InstitutionChangeBroadcaster(poll_seconds=60, keepalive_seconds=0.05)
+
+        async def receive():
+            stream = broadcaster.stream()
+            event = await stream.__anext__()
+            await stream.aclose()
+            await broadcaster.close()
+            return event
+
+        assert _run(receive()) == KEEPALIVE
+
+    def test_history_is_trimmed(self):
+        """test whether only a bounded history of events is kept, with older subscribers reading the feed"""
+        broadcaster = InstitutionChangeBroadcaster(history=2)
+        since = db.get_latest_change_cursor()
+        for _ in range(5):
+            _add_institution()
+
+        async def publish():
+            await broadcaster._start()
+            broadcaster._floor = broadcaster._head = db.decode_change_cursor(since)
+            broadcaster._publish(db.get_institution_changes(since, 5, False))
+            kept = len(broadcaster._seqs)
+            stream = broadcaster.stream(since)
+            events = [_parse(await stream.__anext__()) for _ in range(5)]
+            await stream.aclose()
+            await broadcaster.close()
+            return kept, events
+
+        kept, events = _run(publish())
+        assert kept == 2
+        assert [e["id"] for e in events] == [c.cursor for c in db.get_institution_changes(since, 5).changes]
+
+    def test_reads_from_primary(self, monkeypatch):
+        """test whether the broadcaster reads the head and new changes from the primary, never a lagging replica"""
+        broadcaster = InstitutionChangeBroadcaster(poll_seconds=0.05, keepalive_seconds=60)
+        on_primary = []
+        for name in ("get_latest_change_cursor", "get_institution_changes"):
+            def read(*args, _read=getattr(db, name)):
+                on_primary.append(db._read_from_primary.get())
+                return _read(*args)
+            monkeypatch.setattr(db, name, read)
+
+        async def receive():
+            stream = broadcaster.stream()
+            first = asyncio.ensure_future(stream.__anext__())
+            while not broadcaster.subscribers:
+                await asyncio.sleep(0.01)
+            await run_in_threadpool(_add_institution)
+            await first
+            await stream.aclose()
+            await broadcaster.close()
+
+        _run(receive())
+        assert len(on_primary) >= 2 and all(on_primary)
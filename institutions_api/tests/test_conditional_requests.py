@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from institutions_api.util.conditional_requests import is_not_modified, validator_headers
+
+LAST_MODIFIED = datetime(2024, 5, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+
+
+def request(**headers):
+    return Request({"type": "http", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+
+class TestConditionalRequests:
+
+    def test_validator_headers(self):
+        """test whether Last-Modified is formatted as an HTTP date"""
+        assert validator_headers('"1-2"', LAST_MODIFIED) == {"ETag": '"1-2"', "Last-Modified": "Wed, 01 May 2024 12:30:15 GMT"}
+        assert validator_headers('"1-2"', None) == {"ETag": '"1-2"'}
+
+    def test_if_none_match(self):
+        """test whether any listed or weak form of the current ETag matches, and takes precedence over dates"""
+        assert is_not_modified(request(if_none_match='"0-0", W/"1-2"'), '"1-2"', LAST_MODIFIED)
+        assert is_not_modified(request(if_none_match="*"), '"1-2"', LAST_MODIFIED)
+        assert not is_not_modified(request(if_none_match='"0-0"', if_modified_since="Wed, 01 May 2024 12:30:15 GMT"),
+                                   '"1-2"', LAST_MODIFIED)
+
+    def test_if_modified_since(self):
+        """test whether dates are compared to the second, and malformed dates are ignored"""
+        assert is_not_modified(request(if_modified_since="Wed, 01 May 2024 12:30:15 GMT"), '"1-2"', LAST_MODIFIED)
+        assert not is_not_modified(request(if_modified_since="Wed, 01 May 2024 12:30:14 GMT"), '"1-2"', LAST_MODIFIED)
+        assert not is_not_modified(request(if_modified_since="yesterday"), '"1-2"', LAST_MODIFIED)
+        assert not is_not_modified(request(), '"1-2"', LAST_MODIFIED)
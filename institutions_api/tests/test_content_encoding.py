@@ -0,0 +1,51 @@
+import gzip
+
+import pytest
+
+from institutions_api.db import db
+from institutions_api.util import content_encoding
+from institutions_api.util.content_encoding import compress, encoded_etag, negotiate_encoding
+
+
+class TestContentEncoding:
+
+    def test_negotiate_encoding(self, monkeypatch):
+        """test whether the preferred accepted coding is chosen, honouring q-values and wildcards"""
+        monkeypatch.setattr(content_encoding, "ENCODINGS", ("br", "gzip"))
+        assert negotiate_encoding("gzip, deflate, br") == "br"
+        assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+        assert negotiate_encoding("br;q=0, *") == "gzip"
+        assert negotiate_encoding("GZIP;Q=0.8") == "gzip"
+        assert negotiate_encoding("deflate") is None
+        assert negotiate_encoding("gzip;q=0") is None
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding("") is None
+        assert negotiate_encoding(None) is None
+
+    def test_brotli_is_optional(self):
+        """test whether brotli is only offered when the brotli package is installed"""
+        assert ("br" in content_encoding.ENCODINGS) == (content_encoding.brotli is not None)
+        assert "gzip" in content_encoding.ENCODINGS
+
+    def test_compress(self):
+        """test whether gzip output decompresses to the body and is identical across builds"""
+        body = b'[{"control":"PRIVATE_NONPROFIT"}]' * 1000
+        compressed = compress(body, "gzip")
+        assert gzip.decompress(compressed) == body
+        assert compress(body, "gzip") == compressed
+        assert len(compressed) < len(body) / 20
+        with pytest.raises(ValueError):
+            compress(body, "deflate")
+
+    def test_encoded_etag(self):
+        """test whether each coding gets its own strong ETag"""
+        assert encoded_etag('"1-2"', None) == '"1-2"'
+        assert encoded_etag('"1-2"', "gzip") == '"1-2-gzip"'
+
+    def test_list_compressed_once_per_version(self):
+        """test whether the institution list is compressed once per data version and again after a write"""
+        compressed = db.get_valid_institutions_json("gzip")
+        assert gzip.decompress(compressed) == db.get_valid_institutions_json()
+        assert db.get_valid_institutions_json("gzip") is compressed
+        db._institutions_changed()
+        assert db.get_valid_institutions_json("gzip") is not compressed
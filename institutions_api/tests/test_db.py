@@ -1,4 +1,7 @@
+import secrets
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
 import pytest
 from fastapi import Request
 from institutions_api.db import db
@@ -160,6 +163,47 @@ class TestDBFunctions:
         updated_institution = session.scalar(select(Institution).where(Institution.id == institution.id))
         assert updated_institution.identifiers[0].identifier == new_unit_id
 
+    def test_get_unused_osg_ids(self, session, monkeypatch):
+        """test whether a batch of generated OSG IDs is distinct and skips taken IDs"""
+        taken = f"{db.OSG_ID_PREFIX}{'a' * 12}"
+        session.add(Institution(name="Taken ID Institution", latitude=None, longitude=None, state=None,
+                                topology_identifier=taken, created_by="test_user"))
+        session.commit()
+
+        # The first candidate generated is the taken ID, the rest are random
+        letters = iter("a" * 12)
+        monkeypatch.setattr(db, "choice", lambda alphabet: next(letters, None) or secrets.choice(alphabet))
+        new_ids = db._get_unused_osg_ids(session, 50)
+        assert next(letters, None) is None
+        assert taken not in new_ids
+        assert len(set(new_ids)) == 50
+        assert all(i.startswith(db.OSG_ID_PREFIX) for i in new_ids)
+        assert db._get_unused_osg_ids(session, 0) == []
+
+    def test_timestamps_are_utc(self, monkeypatch):
+        """test whether creates, updates, invalidations and their change log rows are timestamped in UTC"""
+        # A local clock would be hours off in this time zone
+        monkeypatch.setenv("TZ", "America/Chicago")
+        time.tzset()
+        try:
+            user_info = OIDCUserInfo(self.mock_request())
+            since = db.get_latest_change_cursor()
+            institution = InstitutionValidatorModel(name=f"UTC Institute {uuid.uuid4().hex[:8]}")
+            db.add_institution(institution, user_info)
+            short_id = db._short_osg_id(db.get_institution_changes(since, 1).changes[0].id)
+            db.update_institution(short_id, institution, user_info)
+            db.invalidate_institution(short_id, user_info)
+
+            def recent(timestamp):
+                return abs(timestamp.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)) < timedelta(minutes=1)
+
+            assert recent(db.get_institution_watermark(short_id).last_modified)
+            assert recent(db.get_valid_institutions_watermark().last_modified)
+            assert all(recent(c.changed) for c in db.get_institution_changes(since).changes)
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
     def test_invalidate_institution(self, session):
         """test whether invalidation of the institution works"""
 
@@ -0,0 +1,121 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from starlette.requests import Request
+
+from institutions_api import app as app_module
+from institutions_api.app import app
+from institutions_api.db import db
+from institutions_api.util.read_your_writes import RecentWriters, client_key
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """ Route reads to a replica engine, which is the same database under another host name """
+    monkeypatch.setattr(db, "PG_REPLICA_HOST", "localhost")
+    monkeypatch.setattr(db, "_replica_engine", None)
+    yield
+    if db._replica_engine is not None:
+        db._replica_engine.dispose()
+
+
+@pytest.fixture
+def replica_checkouts(replica):
+    """ Connections checked out of the replica pool, one entry per checkout """
+    checkouts = []
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(connection_record)
+
+    event.listen(db.TimedReplicaQueuePool, "checkout", checkout)
+    yield checkouts
+    event.remove(db.TimedReplicaQueuePool, "checkout", checkout)
+
+
+class TestEngineOptions:
+
+    def test_pool_options(self, monkeypatch):
+        """test whether pool settings are read from the environment, leaving SQLAlchemy's defaults otherwise"""
+        monkeypatch.setenv("PG_POOL_SIZE", "20")
+        monkeypatch.setenv("PG_POOL_PRE_PING", "true")
+        monkeypatch.setenv("PG_POOL_RECYCLE", "")
+        assert db._pool_options() == {"pool_pre_ping": True, "pool_size": 20}
+
+    def test_statement_timeout(self, monkeypatch):
+        """test whether the statement timeout is applied to every connection"""
+        monkeypatch.setenv("PG_STATEMENT_TIMEOUT_MS", "1500")
+        engine = db._create_engine(db._database_url("postgresql"), db.TimedQueuePool)
+        with engine.connect() as conn:
+            assert conn.execute(text("SHOW statement_timeout")).scalar_one() == "1500ms"
+        engine.dispose()
+
+
+class TestReplicaRouting:
+
+    def test_reads_use_replica(self, replica_checkouts):
+        """test whether reads that may lag behind writes are sent to the replica"""
+        assert db.get_institution_watermark("3yiehdw3bef5").count == 1
+        assert len(replica_checkouts) == 1
+
+    def test_read_from_primary(self, replica_checkouts):
+        """test whether reads within read_from_primary skip the replica"""
+        with db.read_from_primary():
+            db.get_institution_details_json("3yiehdw3bef5")
+        assert replica_checkouts == []
+
+    def test_read_your_writes(self, replica_checkouts):
+        """test whether a client's reads go to the primary right after it writes, and other clients' do not"""
+        client = TestClient(app)
+        writer = {"oidc_claim_osgid": f"writer_{uuid.uuid4().hex[:8]}"}
+        response = client.post("/institutions/bulk", json=[{"name": f"Replica Institute {uuid.uuid4().hex[:8]}"}], headers=writer)
+        short_id = response.json()["results"][0]["id"].split("/")[-1]
+
+        assert client.get(f"/institutions/{short_id}", headers=writer).status_code == 200
+        assert replica_checkouts == []
+        assert client.get(f"/institutions/{short_id}", headers={"oidc_claim_osgid": "reader"}).status_code == 200
+        assert len(replica_checkouts) > 0
+
+    def test_lookups_do_not_pin_to_primary(self, replica_checkouts):
+        """test whether read-only POST requests leave their client's reads on the replica"""
+        client = TestClient(app)
+        reader = {"oidc_claim_osgid": f"reader_{uuid.uuid4().hex[:8]}"}
+        assert client.post("/institutions/lookup", json={"ror_ids": ["04zdhre16"]}, headers=reader).status_code == 200
+        replica_checkouts.clear()
+        assert client.get("/institutions/3yiehdw3bef5", headers=reader).status_code == 200
+        assert len(replica_checkouts) > 0
+
+    def test_proxied_clients_are_not_pinned_together(self, replica_checkouts, monkeypatch):
+        """test whether a write relayed by the proxy only pins the client it was forwarded for"""
+        monkeypatch.setattr(app_module, "recent_writers", RecentWriters(window_seconds=60))
+        app_module.recent_writers.record("address:192.0.2.1")
+        client = TestClient(app, client=("127.0.0.1", 50000))
+
+        assert client.get("/institutions/3yiehdw3bef5", headers={"X-Forwarded-For": "192.0.2.2"}).status_code == 200
+        assert len(replica_checkouts) > 0
+        replica_checkouts.clear()
+        assert client.get("/institutions/3yiehdw3bef5", headers={"X-Forwarded-For": "192.0.2.1"}).status_code == 200
+        assert replica_checkouts == []
+
+    def test_client_key(self):
+        """test whether clients are keyed by OSG ID, then by address, taking proxied addresses from X-Forwarded-For"""
+        def request(host, headers=None):
+            return Request({"type": "http", "client": (host, 50000),
+                            "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()]})
+
+        assert client_key(request("127.0.0.1", {"oidc_claim_osgid": "osg1"})) == "user:osg1"
+        assert client_key(request("192.0.2.1")) == "address:192.0.2.1"
+        assert client_key(request("192.0.2.1", {"x-forwarded-for": "198.51.100.1"})) == "address:192.0.2.1"
+        assert client_key(request("127.0.0.1", {"x-forwarded-for": "198.51.100.1, 192.0.2.1"})) == "address:192.0.2.1"
+        assert client_key(request("127.0.0.1")) is None
+
+    def test_recent_writers(self):
+        """test whether clients are only remembered for the window"""
+        writers = RecentWriters(window_seconds=-1)
+        writers.record("a")
+        assert not writers.wrote_recently("a")
+        writers = RecentWriters(window_seconds=60)
+        writers.record("a")
+        assert writers.wrote_recently("a")
+        assert not writers.wrote_recently("b")
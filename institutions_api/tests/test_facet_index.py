@@ -0,0 +1,82 @@
+import pytest
+from fastapi import HTTPException
+
+from institutions_api.db.facet_index import InstitutionFacetIndex
+from institutions_api.models.api_models import (
+    InstitutionBaseModel,
+    InstitutionCarnegieClassificationMetadataModel,
+    InstitutionIPEDSMetadataModel
+)
+
+
+def institution(i, state=None, control=None, classification2025=None):
+    return InstitutionBaseModel(
+        id=f"https://osg-htc.org/iid/test{i}",
+        name=f"Institution {i}",
+        state=state,
+        ipeds_metadata=InstitutionIPEDSMetadataModel(control=control, state=state) if control else None,
+        carnegie_metadata=InstitutionCarnegieClassificationMetadataModel(classification2025=classification2025)
+        if classification2025 else None,
+    )
+
+
+R1 = "Research 1: Very High Spending and Doctorate Production"
+R2 = "Research 2: High Spending and Doctorate Production"
+
+INSTITUTIONS = [
+    institution(0, "WI", "Public", R1),
+    institution(1, "WI", "Private not-for-profit", R2),
+    institution(2, "WI", "Public", R2),
+    institution(3, "IL", "Public", R1),
+    institution(4, "IL"),
+]
+
+
+def facet_index(institutions):
+    return InstitutionFacetIndex.from_institutions(institutions)
+
+
+class TestInstitutionFacetIndex:
+
+    def test_filters(self):
+        """test whether filters on different facets intersect and values of one facet combine"""
+        index = facet_index(INSTITUTIONS)
+        response = index.query({"state": ["wi"], "control": ["PUBLIC"]})
+        assert [i.name for i in response.institutions] == ["Institution 0", "Institution 2"]
+        response = index.query({"classification2025": ["RESEARCH_1", "research_2"], "state": ["IL"]})
+        assert [i.name for i in response.institutions] == ["Institution 3"]
+        assert index.query({}).total == 5
+
+    def test_facet_counts(self):
+        """test whether each facet is counted with the filters of the other facets only"""
+        index = facet_index(INSTITUTIONS)
+        response = index.query({"state": ["WI"], "control": ["PUBLIC"]})
+        assert response.total == 2
+        assert response.facets["state"] == {"IL": 1, "WI": 2}
+        assert response.facets["control"] == {"PRIVATE_NONPROFIT": 1, "PUBLIC": 2}
+        assert response.facets["classification2025"] == {"RESEARCH_1": 1, "RESEARCH_2": 1}
+
+    def test_changes(self):
+        """test whether removed institutions are dropped and their positions reused"""
+        index = facet_index(INSTITUTIONS)
+        index._remove("https://osg-htc.org/iid/test0")
+        assert index.query({"classification2025": ["RESEARCH_1"]}).total == 1
+        index._add(institution(5, "MN", "Public"))
+        assert index._positions["https://osg-htc.org/iid/test5"] == 0
+        assert [i.name for i in index.query({"control": ["PUBLIC"]}).institutions] == [
+            "Institution 2", "Institution 3", "Institution 5"]
+
+    def test_paging(self):
+        """test whether limit and offset page through the matches without changing the total"""
+        response = facet_index(INSTITUTIONS).query({}, limit=2, offset=2)
+        assert response.total == 5
+        assert [i.name for i in response.institutions] == ["Institution 2", "Institution 3"]
+
+    def test_invalid_filters(self):
+        """test whether unknown facets and values are rejected"""
+        index = facet_index(INSTITUTIONS)
+        with pytest.raises(HTTPException) as e:
+            index.query({"control": ["GOVERNMENT"]})
+        assert e.value.status_code == 400
+        with pytest.raises(HTTPException):
+            index.query({"color": ["RED"]})
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from institutions_api.db.db_models import Base, IdentifierType, Institution, InstitutionIdentifier
+from institutions_api.db.identifier_types import identifier_type_registry
+from institutions_api.models.api_models import InstitutionBaseModel
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([IdentifierType(name='ror_id'), IdentifierType(name='unitid')])
+    session.commit()
+    yield session
+    session.close()
+
+
+def count_queries(session):
+    statements = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestIdentifierTypeRegistry:
+
+    def test_loaded_once(self, session):
+        """test whether type lookups by name and id share a single query"""
+        registry = identifier_type_registry(session)
+        statements = count_queries(session)
+        ror_id_type = registry.by_name(session, 'ror_id')
+        unit_id_type = registry.by_name(session, 'unitid')
+        assert registry.names(session) == {ror_id_type.id: 'ror_id', unit_id_type.id: 'unitid'}
+        assert len(statements) == 1
+
+    def test_refreshed_when_type_added(self, session):
+        """test whether a type added after the registry was loaded is found"""
+        registry = identifier_type_registry(session)
+        assert registry.by_name(session, 'grid_id') is None
+        session.add(IdentifierType(name='grid_id'))
+        session.commit()
+        assert registry.by_name(session, 'grid_id').name == 'grid_id'
+
+    def test_serialize_without_loading_types(self, session):
+        """test whether institutions serialize from the registry without loading identifier_type"""
+        registry = identifier_type_registry(session)
+        inst = Institution("Test University", None, None, None, "https://osg-htc.org/iid/test", "test")
+        session.add(inst)
+        session.add(InstitutionIdentifier(registry.by_name(session, 'ror_id'), "https://ror.org/05ap1zt54", inst.id))
+        session.commit()
+
+        inst = session.get(Institution, inst.id)
+        names = registry.names(session, [i.identifier_type_id for i in inst.identifiers])
+        statements = count_queries(session)
+        assert InstitutionBaseModel.from_institution(inst, names).ror_id == "https://ror.org/05ap1zt54"
+        assert statements == []
@@ -0,0 +1,30 @@
+import random
+from math import asin, cos, radians, sin, sqrt
+
+from institutions_api.util.kdtree import EARTH_RADIUS_KM, KDTree, chord_to_km, km_to_chord, unit_vector
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(h))
+
+
+class TestKDTree:
+
+    points = [(random.Random(i).uniform(-90, 90), random.Random(-i).uniform(-180, 180)) for i in range(2000)]
+    tree = KDTree([(unit_vector(lat, lon), i, (lat, lon)) for i, (lat, lon) in enumerate(points)])
+
+    def test_nearest_matches_haversine(self):
+        """test whether the nearest neighbours match a brute force haversine search, across the antimeridian too"""
+        for lat, lon in [(43.07, -89.4), (0.0, 179.9), (-89.0, 0.0)]:
+            expected = sorted(range(len(self.points)), key=lambda i: haversine_km(lat, lon, *self.points[i]))[:5]
+            result = self.tree.nearest(unit_vector(lat, lon), 5)
+            assert [key for _, key, _ in result] == expected
+            assert abs(chord_to_km(result[0][0]) - haversine_km(lat, lon, *self.points[expected[0]])) < 1e-6
+
+    def test_radius_and_exclude(self):
+        """test whether searches respect the radius and skip excluded keys"""
+        result = self.tree.nearest(unit_vector(43.07, -89.4), 100, km_to_chord(1500), exclude={0, 1, 2})
+        expected = [i for i, p in enumerate(self.points) if haversine_km(43.07, -89.4, *p) <= 1500 and i > 2]
+        assert sorted(key for _, key, _ in result) == sorted(expected)
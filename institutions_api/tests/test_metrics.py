@@ -0,0 +1,29 @@
+from institutions_api.util.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+
+    def test_histogram(self):
+        """test whether histograms render cumulative buckets, sum and count per label set"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("request_seconds", "Request time", ["route"], buckets=[0.1, 1])
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.1, "/a")
+        histogram.observe(5, "/a")
+        assert registry.render().splitlines() == [
+            "# HELP request_seconds Request time",
+            "# TYPE request_seconds histogram",
+            'request_seconds_bucket{route="/a",le="0.1"} 2',
+            'request_seconds_bucket{route="/a",le="1"} 2',
+            'request_seconds_bucket{route="/a",le="+Inf"} 3',
+            'request_seconds_sum{route="/a"} 5.15',
+            'request_seconds_count{route="/a"} 3',
+        ]
+
+    def test_collectors(self):
+        """test whether collectors are read at render time and label values are escaped"""
+        registry = MetricsRegistry()
+        hits = {"a\"b": 1}
+        registry.add_collector(lambda: [("hits_total", "counter", "Hits", [({"cache": k}, v) for k, v in hits.items()])])
+        hits["a\"b"] = 2
+        assert 'hits_total{cache="a\\"b"} 2' in registry.render().splitlines()
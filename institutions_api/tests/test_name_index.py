@@ -0,0 +1,52 @@
+from institutions_api.db.name_index import InstitutionNameIndex, normalize_name, trigrams
+from institutions_api.models.api_models import InstitutionBaseModel
+
+NAMES = [
+    "University of Wisconsin–Madison",
+    "University of Wisconsin–Milwaukee",
+    "Wisconsin Institutes for Discovery",
+    "Madison Area Technical College",
+    "Universidad de São Paulo",
+]
+
+
+def name_index(names):
+    return InstitutionNameIndex.from_institutions(
+        InstitutionBaseModel(id=f"https://osg-htc.org/iid/test{i}", name=name) for i, name in enumerate(names))
+
+
+class TestInstitutionNameIndex:
+
+    def test_normalize(self):
+        """test whether names are compared without case, accents or punctuation"""
+        assert normalize_name("  Universidad de São-Paulo!") == "universidad de sao paulo"
+        assert trigrams("ab") == {"  a", " ab", "ab "}
+
+    def test_ranking(self):
+        """test whether exact and prefix matches rank above matches on later words"""
+        index = name_index(NAMES)
+        assert [r.name for r in index.search("madison")] == [
+            "Madison Area Technical College", "University of Wisconsin–Madison"]
+        assert index.search("univ of wisc mad")[0].name == "University of Wisconsin–Madison"
+        assert index.search("sao paulo")[0].name == "Universidad de São Paulo"
+        assert index.search("!!!") == []
+
+    def test_fuzzy(self):
+        """test whether misspelled words still match"""
+        index = name_index(NAMES)
+        assert index.search("Univeristy of Wisconson Madisn")[0].name == "University of Wisconsin–Madison"
+
+    def test_remove(self):
+        """test whether removed institutions are no longer found, and their unique words are dropped"""
+        index = name_index(NAMES)
+        index._remove("https://osg-htc.org/iid/test3")
+        assert [r.name for r in index.search("madison")] == ["University of Wisconsin–Madison"]
+        assert "technical" not in index._sorted_words
+        assert index.search("technical") == []
+
+    def test_every_query_word_required(self):
+        """test whether matches hold every query word when the rarest word is not the first one"""
+        index = name_index(["Alpha Beta Gamma", "Zeta Beta Omega", "Zeta Theta", "Zeta Kappa", "Zeta Lambda", "Beta Only"])
+        assert [r.name for r in index.search("zeta beta")] == ["Zeta Beta Omega"]
+        zeta, beta = index._prefixed_words("zeta"), index._prefixed_words("beta")
+        assert index._word_matches([zeta, beta]) == index._word_matches([beta, zeta]) == {"https://osg-htc.org/iid/test1"}
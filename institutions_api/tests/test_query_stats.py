@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from sqlalchemy import create_engine, text
+
+from institutions_api.db import query_stats
+
+
+class TestQueryStats:
+
+    def test_record_queries(self):
+        """test whether statements are counted within the recording context only"""
+        engine = create_engine("sqlite://")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with query_stats.record_queries() as stats:
+                conn.execute(text("SELECT 2"))
+                conn.execute(text("SELECT 3"))
+            conn.execute(text("SELECT 4"))
+        assert stats.count == 2
+        assert stats.statements == ["SELECT 2", "SELECT 3"]
+        assert stats.seconds > 0
+
+    def test_threadpool_calls(self):
+        """test whether statements run on another thread with a copy of the context are counted"""
+        engine = create_engine("sqlite://")
+
+        def query():
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+        with query_stats.record_queries() as stats, ThreadPoolExecutor(1) as pool:
+            pool.submit(copy_context().run, query).result()
+            pool.submit(query).result()
+        assert stats.count == 1
+
+    def test_collect_requests(self):
+        """test whether collectors only sum the requests finished while they are active"""
+        with query_stats.record_queries() as before:
+            before.add("SELECT 1", 0.001)
+        query_stats.request_finished(before)
+        with query_stats.collect_requests() as collected:
+            assert query_stats.collecting_requests()
+            query_stats.request_finished(before)
+            query_stats.request_finished(before)
+        query_stats.request_finished(before)
+        assert collected.count == 2
+        assert not query_stats.collecting_requests()
@@ -0,0 +1,46 @@
+import pytest
+
+from institutions_api.util.reference_data import (
+    CARNEGIE_2021_TABLE,
+    CARNEGIE_2025_TABLE,
+    IPEDS_TABLE,
+    ReferenceData,
+    compile_reference_data,
+)
+
+
+@pytest.fixture(scope="module")
+def reference_data(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("reference") / "reference_data.bin")
+    compile_reference_data(path)
+    return ReferenceData(path)
+
+
+class TestReferenceData:
+
+    def test_ipeds_lookup(self, reference_data):
+        """test whether IPEDS rows keep only the mapped columns with their source types"""
+        ipeds = reference_data.table(IPEDS_TABLE)
+        row = ipeds["100654"]
+        assert row == ipeds.get(100654)
+        assert row["WEBADDR"] == "www.aamu.edu/"
+        assert row["STABBR"] == "AL"
+        assert row["HBCU"] == 1
+        assert isinstance(row["LATITUDE"], float)
+        assert "INSTNM" not in row
+
+    def test_missing_unitid(self, reference_data):
+        """test whether unknown or malformed unitids are treated as absent"""
+        ipeds = reference_data.table(IPEDS_TABLE)
+        assert "999999" not in ipeds
+        assert "abcdef" not in ipeds
+        assert ipeds.get("999999") is None
+        with pytest.raises(KeyError):
+            ipeds["999999"]
+
+    def test_carnegie_lookup(self, reference_data):
+        """test whether both Carnegie tables are keyed by integer unitid"""
+        assert reference_data.table(CARNEGIE_2021_TABLE).get(100654) == {"basic2021": 18}
+        designations = {row["2025 Research Activity Designation"] for row in
+                        map(reference_data.table(CARNEGIE_2025_TABLE).get, reference_data.table(CARNEGIE_2025_TABLE))}
+        assert "Research 1: Very High Spending and Doctorate Production" in designations
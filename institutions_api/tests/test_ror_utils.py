@@ -0,0 +1,72 @@
+import pytest
+from fastapi import HTTPException
+
+from institutions_api.util.ror_utils import ROR_TO_UNITID_PATH, RorValidator, TTLCache, is_well_formed_ror_id
+
+
+class RecordingSession:
+    """ Stands in for the ror.org session, answering every HEAD with a fixed status code """
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.requests = []
+
+    def head(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return type("Response", (), {"status_code": self.status_code})()
+
+
+@pytest.fixture
+def validator():
+    return RorValidator([ROR_TO_UNITID_PATH])
+
+
+class TestRorValidator:
+
+    def test_checksum(self):
+        """test whether ROR ID formats and checksums are checked offline"""
+        assert is_well_formed_ror_id("https://ror.org/05ap1zt54")
+        assert is_well_formed_ror_id("04achrx04")
+        assert not is_well_formed_ror_id("https://ror.org/05ap1zt55")
+        assert not is_well_formed_ror_id("https://ror.org/not-an-id")
+
+    def test_local_index(self, validator):
+        """test whether IDs in the local index are valid without contacting ror.org"""
+        validator._session = RecordingSession(404)
+        assert validator.exists("https://ror.org/05ap1zt54")
+        assert not validator.exists("https://ror.org/05ap1zt55")
+        assert validator._session.requests == []
+
+    def test_remote_fallback_cached(self, validator):
+        """test whether IDs outside the local index are looked up once, with a timeout, then cached"""
+        validator._session = RecordingSession(404)
+        assert not validator.exists("https://ror.org/04zdhre16")
+        assert not validator.exists("https://ror.org/04zdhre16")
+        assert len(validator._session.requests) == 1
+        url, kwargs = validator._session.requests[0]
+        assert url == "https://ror.org/04zdhre16"
+        assert kwargs["timeout"] == validator.timeout
+
+    def test_remote_unavailable(self, validator):
+        """test whether an ror.org outage is reported as such and not cached as a missing ID"""
+        validator._session = RecordingSession(502)
+        with pytest.raises(HTTPException) as e:
+            validator.exists("https://ror.org/04zdhre16")
+        assert e.value.status_code == 503
+        validator._session = RecordingSession(200)
+        assert validator.exists("https://ror.org/04zdhre16")
+
+
+class TestTTLCache:
+
+    def test_expiry_and_eviction(self):
+        """test whether entries expire after their ttl and the least recently used entry is evicted"""
+        cache = TTLCache(maxsize=2)
+        cache.set("a", True, ttl=60)
+        cache.set("b", False, ttl=-1)
+        assert cache.get("b") is None
+        cache.set("c", True, ttl=60)
+        cache.get("a")
+        cache.set("d", True, ttl=60)
+        assert cache.get("a") is True
+        assert cache.get("c") is None
@@ -0,0 +1,62 @@
+from datetime import datetime
+from uuid import uuid4
+
+from institutions_api.db.db_models import (
+    CarnegieClassification,
+    Control,
+    Institution,
+    InstitutionCarnegieClassificationMetadata,
+    InstitutionIdentifier,
+    InstitutionIPEDSMetadata,
+    InstitutionSize,
+)
+from institutions_api.db.identifier_types import IdentifierTypeRef
+from institutions_api.db.serialization import InstitutionFragmentCache, json_array
+from institutions_api.models.api_models import InstitutionBaseModel
+
+ROR_ID_TYPE = IdentifierTypeRef(uuid4(), "ror_id")
+UNIT_ID_TYPE = IdentifierTypeRef(uuid4(), "unitid")
+NAMES = {ROR_ID_TYPE.id: "ror_id", UNIT_ID_TYPE.id: "unitid"}
+
+
+def institution(i, metadata=True):
+    inst = Institution(f"Institution {i}", 43.0747 + i, -89.3841, "WI", f"https://osg-htc.org/iid/test{i}", "test")
+    inst.identifiers = [InstitutionIdentifier(UNIT_ID_TYPE, "240444"), InstitutionIdentifier(ROR_ID_TYPE, "https://ror.org/01y2jtd41")]
+    if metadata:
+        inst.ipeds_metadata = InstitutionIPEDSMetadata(
+            website_address="www.wisc.edu", historically_black_college_or_university=False, control=Control.PUBLIC,
+            state="WI", institution_size=InstitutionSize.OVER_20000)
+        inst.carnegie_metadata = InstitutionCarnegieClassificationMetadata(
+            classification2021=CarnegieClassification.DOCTORAL_VERY_HI_RESEARCH)
+    return inst
+
+
+class TestInstitutionFragmentCache:
+
+    def test_matches_pydantic(self):
+        """test whether fragments are byte for byte the pydantic serialization"""
+        cache = InstitutionFragmentCache()
+        for inst in [institution(0), institution(1, metadata=False)]:
+            assert cache.fragment(inst, NAMES) == InstitutionBaseModel.from_institution(inst, NAMES).model_dump_json().encode()
+
+    def test_reused_per_row_version(self):
+        """test whether a fragment is only encoded again once its row is written or changed"""
+        cache = InstitutionFragmentCache()
+        inst = institution(0)
+        first = cache.fragment(inst, NAMES)
+        inst.name = "Renamed"
+        assert cache.fragment(inst, NAMES) is first
+        inst.updated = datetime.now()
+        assert b"Renamed" in cache.fragment(inst, NAMES)
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        cache.institutions_changed([inst.topology_identifier])
+        assert len(cache) == 0
+
+    def test_json_array(self):
+        """test whether fragments join into a JSON array"""
+        cache = InstitutionFragmentCache()
+        institutions = [institution(0), institution(1)]
+        models = [InstitutionBaseModel.from_institution(i, NAMES) for i in institutions]
+        assert json_array(cache.fragments(institutions, NAMES)) == b"[" + b",".join(m.model_dump_json().encode() for m in models) + b"]"
+        assert json_array([]) == b"[]"
@@ -0,0 +1,32 @@
+from institutions_api.db.snapshot import VersionedSnapshot
+
+
+class TestVersionedSnapshot:
+
+    def test_build_once_per_version(self):
+        """test whether a value is only rebuilt after the version is bumped"""
+        snapshot = VersionedSnapshot()
+        builds = []
+
+        def build():
+            builds.append(snapshot.version)
+            return f"value-{len(builds)}"
+
+        assert snapshot.get_or_build(build) == "value-1"
+        assert snapshot.get_or_build(build) == "value-1"
+        snapshot.bump()
+        assert snapshot.current() is None
+        assert snapshot.get_or_build(build) == "value-2"
+        assert builds == [0, 1]
+
+    def test_superseded_value_not_cached(self):
+        """test whether a value built before a concurrent write is not cached"""
+        snapshot = VersionedSnapshot()
+
+        def build():
+            snapshot.bump()  # simulate a write committed mid-build
+            return "stale"
+
+        assert snapshot.get_or_build(build) == "stale"
+        assert snapshot.current() is None
+        assert snapshot.get_or_build(lambda: "fresh") == "fresh"
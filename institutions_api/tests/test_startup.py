@@ -0,0 +1,38 @@
+import time
+
+from institutions_api.util.startup import StartupStats
+
+
+class TestStartupStats:
+
+    def test_ready_once_every_cache_is_warm(self):
+        """test whether failed loaders are retried, and the process is only ready once every one succeeded"""
+        calls = []
+
+        def flaky():
+            calls.append(len(calls))
+            if len(calls) < 3:
+                raise ConnectionError("database unreachable")
+
+        stats = StartupStats()
+        stats.warm_caches([("reference", lambda: None), ("institutions", flaky)], retry_seconds=0.01)
+        assert stats.ready
+        assert len(calls) == 3
+        assert stats.caches["institutions"]["status"] == "warm"
+        assert stats.caches["reference"]["status"] == "warm"
+
+    def test_not_ready_while_a_loader_fails(self):
+        """test whether a failing loader keeps the process unready, with the failure reported"""
+        stats = StartupStats()
+
+        def failing():
+            raise ConnectionError("database unreachable")
+
+        stats.warm_caches_in_background([("institutions", failing)])
+        for _ in range(100):
+            if stats.caches.get("institutions"):
+                break
+            time.sleep(0.01)
+        assert not stats.ready
+        assert stats.report()["caches"]["institutions"] == {
+            "status": "failed", "error": "database unreachable", "attempts": 1}
@@ -0,0 +1,64 @@
+import gzip
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies are compressed once per data version, so the levels favour size over speed, short of the slowest
+# brotli levels which take many seconds on the full institution list
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+# Supported content codings, in order of preference when the client accepts several equally.
+# brotli is only offered when the optional brotli package is installed
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """ The body in the given content coding. gzip output has no timestamp, so it is the same on every build """
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+def _qualities(accept_encoding: str) -> Dict[str, float]:
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """ The preferred supported content coding the Accept-Encoding header allows, None for identity """
+    if not accept_encoding:
+        return None
+    qualities = _qualities(accept_encoding)
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ Strong entity tag of a representation in the given content coding, each coding needs its own """
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else f"{etag}-{encoding}"
@@ -0,0 +1,81 @@
+import heapq
+from math import asin, cos, inf, pi, radians, sin, sqrt
+from typing import Collection, Generic, Hashable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+EARTH_RADIUS_KM = 6371.0088
+
+Point = Tuple[float, float, float]
+
+
+def unit_vector(latitude: float, longitude: float) -> Point:
+    """ Position on the unit sphere of a latitude and longitude, in degrees """
+    lat, lon = radians(latitude), radians(longitude)
+    return cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat)
+
+
+def chord_to_km(chord: float) -> float:
+    """ Great-circle distance of a straight line distance between two points on the unit sphere """
+    return 2 * EARTH_RADIUS_KM * asin(min(chord / 2, 1.0))
+
+
+def km_to_chord(distance_km: float) -> float:
+    """ Straight line distance on the unit sphere of a great-circle distance """
+    if distance_km >= pi * EARTH_RADIUS_KM:
+        return 2.0
+    return 2 * sin(distance_km / (2 * EARTH_RADIUS_KM))
+
+
+class KDTree(Generic[T]):
+    """ Static 3-d tree of items keyed by unit vectors. Nearest neighbours by straight line distance on the unit
+    sphere are also nearest by great-circle distance, so no haversine is needed during the search
+    """
+
+    def __init__(self, entries: List[Tuple[Point, Hashable, T]]):
+        """ entries are (point, key, item), keys identify items for exclusion from searches """
+        self._entries = entries
+        self._root = self._build(list(range(len(entries))), 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _build(self, indices: List[int], depth: int):
+        if not indices:
+            return None
+        axis = depth % 3
+        indices.sort(key=lambda i: self._entries[i][0][axis])
+        mid = len(indices) // 2
+        return indices[mid], axis, self._build(indices[:mid], depth + 1), self._build(indices[mid + 1:], depth + 1)
+
+    def nearest(self, point: Point, k: int, max_chord: float = inf,
+                exclude: Collection[Hashable] = ()) -> List[Tuple[float, Hashable, T]]:
+        """ Up to k (chord distance, key, item) entries closest to point and within max_chord, nearest first """
+        # Max-heap of the best k so far, as (-squared distance, index)
+        best: List[Tuple[float, int]] = []
+        bound = max_chord * max_chord
+        px, py, pz = point
+        # Subtrees to visit, with a lower bound on the squared distance from point to anything in them
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, min_d2 = stack.pop()
+            if node is None or min_d2 > bound:
+                continue
+            index, axis, left, right = node
+            (x, y, z), key, _ = self._entries[index]
+            d2 = (x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2
+            if d2 <= bound and key not in exclude:
+                if len(best) < k:
+                    heapq.heappush(best, (-d2, index))
+                elif d2 < -best[0][0]:
+                    heapq.heapreplace(best, (-d2, index))
+                if len(best) == k:
+                    bound = min(bound, -best[0][0])
+
+            delta = point[axis] - (x, y, z)[axis]
+            near, far = (left, right) if delta < 0 else (right, left)
+            # The far side is pushed first so the near side is searched, and the bound tightened, first
+            stack.append((far, delta * delta))
+            stack.append((near, min_d2))
+
+        return [(sqrt(-neg_d2), self._entries[i][1], self._entries[i][2]) for neg_d2, i in sorted(best, reverse=True)]
@@ -1,13 +1,8 @@
-import pandas as pd
-
 from functools import lru_cache
 
+from institutions_api.util.reference_data import CARNEGIE_2025_TABLE, ReferenceTable, load_reference_data
+
 
 @lru_cache(maxsize=1)
-def load_carnegie_2025_data():
-    carnegie_df = pd.read_excel(
-        "institutions_api/db/migrations/add_carnegie_metadata_1/data/2025-RAD-Public-Data-File.xlsx",
-        sheet_name="Data"
-    )
-    carnegie_by_unitid = carnegie_df.set_index("UNITID").to_dict(orient="index")
-    return carnegie_by_unitid
+def load_carnegie_2025_data() -> ReferenceTable:
+    return load_reference_data().table(CARNEGIE_2025_TABLE)
@@ -1,13 +1,8 @@
-import pandas as pd
-
 from functools import lru_cache
 
+from institutions_api.util.reference_data import CARNEGIE_2021_TABLE, ReferenceTable, load_reference_data
+
 
 @lru_cache(maxsize=1)
-def load_carnegie_data():
-    carnegie_df = pd.read_excel(
-        "institutions_api/db/migrations/add_carnegie_metadata_1/data/CCIHE2021-PublicData.xlsx",
-        sheet_name="Data"
-    )
-    carnegie_by_unitid = carnegie_df.set_index("unitid").to_dict(orient="index")
-    return carnegie_by_unitid
+def load_carnegie_data() -> ReferenceTable:
+    return load_reference_data().table(CARNEGIE_2021_TABLE)
@@ -0,0 +1,42 @@
+from os import environ
+from typing import Optional
+
+from fastapi import Request
+
+from institutions_api.util.oidc_utils import OIDCUserInfo
+from institutions_api.util.ror_utils import TTLCache
+
+# Addresses of reverse proxies in front of the app, such as Apache on localhost, whose X-Forwarded-For is trusted
+TRUSTED_PROXIES = {address.strip() for address in environ.get("TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+                   if address.strip()}
+
+
+def client_key(request: Request) -> Optional[str]:
+    """ Identify the client behind a request, by OSG ID when signed in and by address otherwise.
+    Every request relayed by a trusted proxy comes from the proxy's address, so those are identified by the address
+    the proxy received them from, the last X-Forwarded-For entry. None when a relayed request does not carry one
+    """
+    user_id = OIDCUserInfo(request).id
+    if user_id:
+        return f"user:{user_id}"
+    host = request.client.host if request.client else None
+    if host in TRUSTED_PROXIES:
+        forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",")]
+        host = forwarded[-1] or None
+    return f"address:{host}" if host else None
+
+
+class RecentWriters:
+    """ Clients that wrote within the last window_seconds. Their reads go to the primary, so they see their own
+    writes even while the replica lags behind
+    """
+
+    def __init__(self, window_seconds: float, maxsize: int = 100_000):
+        self.window_seconds = window_seconds
+        self._writes = TTLCache(maxsize)
+
+    def record(self, client: str):
+        self._writes.set(client, True, self.window_seconds)
+
+    def wrote_recently(self, client: str) -> bool:
+        return self._writes.get(client, False)
@@ -0,0 +1,258 @@
+# Compact, memory-mapped store of the IPEDS and Carnegie reference data used to populate institution metadata.
+#
+# Parsing the raw sources takes several seconds of pandas/openpyxl work and keeps every column of every row
+# alive for the life of the process, so they are compiled ahead of time into a single binary file that holds
+# only the columns the API reads. Build it (requires pandas and openpyxl) with
+#
+#     python -m institutions_api.util.reference_data
+#
+# File layout, all integers little endian:
+#   header     b"IREF", uint16 format version, uint16 table count
+#   per table  name, uint16 column count, per column (name, 1 byte type code),
+#              uint32 row count, row count * (uint32 unitid, uint32 file offset of row) sorted by unitid
+#   per row    one value per column: 's' uint16 length + utf-8 (0xFFFF when null),
+#              'i' int32 (INT32_MIN when null), 'f' float64 (NaN when null)
+# Names are stored as uint16 length + utf-8.
+
+import logging
+import math
+import mmap
+import os
+import struct
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Union
+
+from institutions_api.db.metadata_mappings import IPEDS_TO_DB_MAP
+
+logger = logging.getLogger("default")
+
+REFERENCE_DATA_PATH = "institutions_api/data/reference_data.bin"
+
+IPEDS_TABLE = "ipeds"
+CARNEGIE_2021_TABLE = "carnegie_2021"
+CARNEGIE_2025_TABLE = "carnegie_2025"
+
+_MAGIC = b"IREF"
+_FORMAT_VERSION = 1
+_NULL_STRING = 0xFFFF
+_NULL_INT = -2 ** 31
+
+_HEADER = struct.Struct("<4sHH")
+_LENGTH = struct.Struct("<H")
+_COUNT = struct.Struct("<I")
+_INDEX_ENTRY = struct.Struct("<II")
+_INT = struct.Struct("<i")
+_FLOAT = struct.Struct("<d")
+
+
+class ReferenceTableSource(NamedTuple):
+    """ Raw source file of a reference table, and the subset of its columns to keep """
+    name: str
+    path: str
+    key: str
+    columns: Dict[str, str]  # column name -> type code
+    sheet_name: Optional[str] = None
+
+
+REFERENCE_TABLE_SOURCES = [
+    # https://nces.ed.gov/ipeds/datacenter/DataFiles.aspx?year=2023
+    ReferenceTableSource(
+        IPEDS_TABLE,
+        "institutions_api/db/migrations/add_institution_metadata_0/data/hd2023.csv",
+        "UNITID",
+        {**{c: "i" for c in IPEDS_TO_DB_MAP}, "WEBADDR": "s", "STABBR": "s", "LATITUDE": "f", "LONGITUD": "f"},
+    ),
+    ReferenceTableSource(
+        CARNEGIE_2021_TABLE,
+        "institutions_api/db/migrations/add_carnegie_metadata_1/data/CCIHE2021-PublicData.xlsx",
+        "unitid",
+        {"basic2021": "i"},
+        sheet_name="Data",
+    ),
+    ReferenceTableSource(
+        CARNEGIE_2025_TABLE,
+        "institutions_api/db/migrations/add_carnegie_metadata_1/data/2025-RAD-Public-Data-File.xlsx",
+        "UNITID",
+        {"2025 Research Activity Designation": "s"},
+        sheet_name="Data",
+    ),
+]
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = name.encode("utf-8")
+    return _LENGTH.pack(len(encoded)) + encoded
+
+
+def _encode_value(type_code: str, value) -> bytes:
+    is_null = value is None or (isinstance(value, float) and math.isnan(value))
+    if type_code == "s":
+        if is_null:
+            return _LENGTH.pack(_NULL_STRING)
+        encoded = str(value).encode("utf-8")
+        return _LENGTH.pack(len(encoded)) + encoded
+    if type_code == "i":
+        return _INT.pack(_NULL_INT if is_null else int(value))
+    return _FLOAT.pack(math.nan if is_null else float(value))
+
+
+def _read_source(source: ReferenceTableSource) -> Dict[int, list]:
+    """ Read the kept columns of a raw source file, keyed by integer unitid """
+    import pandas as pd
+
+    columns = [source.key, *source.columns]
+    if source.sheet_name:
+        df = pd.read_excel(source.path, sheet_name=source.sheet_name, usecols=columns)
+    else:
+        df = pd.read_csv(source.path, encoding="latin1", usecols=columns)
+    df = df[columns].astype(object)
+    df = df.where(df.notna(), None)
+    return {int(row[0]): list(row[1:]) for row in df.itertuples(index=False, name=None)}
+
+
+def compile_reference_data(path: str = REFERENCE_DATA_PATH):
+    """ Compile the raw IPEDS and Carnegie source files into a reference data store at the given path """
+    tables = [(source, _read_source(source)) for source in REFERENCE_TABLE_SOURCES]
+
+    # Table headers come first so row offsets can be computed up front
+    header_sizes = [
+        len(_encode_name(source.name)) + _LENGTH.size
+        + sum(len(_encode_name(c)) + 1 for c in source.columns)
+        + _COUNT.size + _INDEX_ENTRY.size * len(rows)
+        for source, rows in tables
+    ]
+    offset = _HEADER.size + sum(header_sizes)
+
+    headers, bodies = [], []
+    for source, rows in tables:
+        index, body = [], []
+        for unitid in sorted(rows):
+            row = b"".join(_encode_value(t, v) for t, v in zip(source.columns.values(), rows[unitid]))
+            index.append(_INDEX_ENTRY.pack(unitid, offset))
+            body.append(row)
+            offset += len(row)
+        headers.append(b"".join([
+            _encode_name(source.name),
+            _LENGTH.pack(len(source.columns)),
+            *(_encode_name(c) + t.encode("ascii") for c, t in source.columns.items()),
+            _COUNT.pack(len(rows)),
+            *index,
+        ]))
+        bodies.extend(body)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(tables)))
+        f.writelines(headers)
+        f.writelines(bodies)
+    os.replace(tmp_path, path)
+
+
+class ReferenceTable:
+    """ Read-only mapping of unitid to a dict of the kept source columns for one table.
+    Keys may be given as ints or digit strings
+    """
+
+    def __init__(self, buffer: mmap.mmap, columns: List[tuple], offsets: Dict[int, int]):
+        self._buffer = buffer
+        self._columns = columns
+        self._offsets = offsets
+
+    def _decode_row(self, offset: int) -> dict:
+        row = {}
+        for name, type_code in self._columns:
+            if type_code == "s":
+                length, = _LENGTH.unpack_from(self._buffer, offset)
+                offset += _LENGTH.size
+                if length == _NULL_STRING:
+                    row[name] = None
+                else:
+                    row[name] = self._buffer[offset:offset + length].decode("utf-8")
+                    offset += length
+            elif type_code == "i":
+                value, = _INT.unpack_from(self._buffer, offset)
+                offset += _INT.size
+                row[name] = None if value == _NULL_INT else value
+            else:
+                value, = _FLOAT.unpack_from(self._buffer, offset)
+                offset += _FLOAT.size
+                row[name] = None if math.isnan(value) else value
+        return row
+
+    @staticmethod
+    def _key(unitid: Union[int, str]) -> Optional[int]:
+        try:
+            return int(unitid)
+        except (TypeError, ValueError):
+            return None
+
+    def __getitem__(self, unitid: Union[int, str]) -> dict:
+        offset = self._offsets.get(self._key(unitid))
+        if offset is None:
+            raise KeyError(unitid)
+        return self._decode_row(offset)
+
+    def get(self, unitid: Union[int, str], default=None):
+        offset = self._offsets.get(self._key(unitid))
+        return default if offset is None else self._decode_row(offset)
+
+    def __contains__(self, unitid) -> bool:
+        return self._key(unitid) in self._offsets
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+
+class ReferenceData:
+    """ Memory-mapped reference data store produced by compile_reference_data """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, table_count = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported reference data file {path}, rebuild it")
+
+        self._tables: Dict[str, ReferenceTable] = {}
+        offset = _HEADER.size
+        for _ in range(table_count):
+            name, offset = self._read_name(offset)
+            column_count, = _LENGTH.unpack_from(self._buffer, offset)
+            offset += _LENGTH.size
+            columns = []
+            for _ in range(column_count):
+                column, offset = self._read_name(offset)
+                columns.append((column, chr(self._buffer[offset])))
+                offset += 1
+            row_count, = _COUNT.unpack_from(self._buffer, offset)
+            offset += _COUNT.size
+            index_end = offset + row_count * _INDEX_ENTRY.size
+            offsets = dict(_INDEX_ENTRY.iter_unpack(self._buffer[offset:index_end]))
+            offset = index_end
+            self._tables[name] = ReferenceTable(self._buffer, columns, offsets)
+
+    def _read_name(self, offset: int):
+        length, = _LENGTH.unpack_from(self._buffer, offset)
+        start = offset + _LENGTH.size
+        return self._buffer[start:start + length].decode("utf-8"), start + length
+
+    def table(self, name: str) -> ReferenceTable:
+        return self._tables[name]
+
+
+@lru_cache(maxsize=1)
+def load_reference_data() -> ReferenceData:
+    """ Open the reference data store, compiling it from the raw sources if it has not been built """
+    if not os.path.exists(REFERENCE_DATA_PATH):
+        logger.warning(f"Reference data not found at {REFERENCE_DATA_PATH}, compiling it from the source files")
+        compile_reference_data(REFERENCE_DATA_PATH)
+    return ReferenceData(REFERENCE_DATA_PATH)
+
+
+if __name__ == "__main__":
+    compile_reference_data()
@@ -1,11 +1,214 @@
-from typing import Optional
-from fastapi import HTTPException
+# Validation of ROR IDs against a locally loaded index of known IDs, with ror.org as a fallback.
+#
+# The index is built from the ror_to_unitid.csv mapping shipped with the repo and, when ROR_DUMP_PATH is set,
+# a ROR data dump (https://zenodo.org/communities/ror-data, the .json or .csv file or the .zip they ship in).
+# IDs that are not in the index are checked against ror.org through a pooled session with timeouts, and the
+# result is cached for a while so repeated lookups of the same ID stay in memory.
+
+import csv
+import io
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable, Iterator, Optional, Set
+
 import requests
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+
 from institutions_api.constants import ROR_ID_PREFIX
+from institutions_api.util.metrics import registry
+
+logger = logging.getLogger("default")
+
+ROR_TO_UNITID_PATH = "institutions_api/db/migrations/add_institution_metadata_0/data/ror_to_unitid.csv"
+ROR_DUMP_PATH = os.environ.get("ROR_DUMP_PATH")
+ROR_TIMEOUT_SECONDS = float(os.environ.get("ROR_TIMEOUT_SECONDS", "5"))
+
+ROR_REQUEST_SECONDS = registry.histogram(
+    "institutions_ror_request_seconds", "Time taken by ror.org to answer ROR ID validations", ["status"])
+
+# https://ror.readme.io/docs/identifier: a leading 0, 6 Crockford base32 characters and a 2 digit checksum
+_ROR_ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+_ROR_ID_PATTERN = re.compile(f"^0[{_ROR_ALPHABET}]{{6}}[0-9]{{2}}$")
+
+
+def _ror_suffix(ror_id: str) -> str:
+    """ Strip the https://ror.org/ prefix, if any, from an ROR ID """
+    return ror_id[len(ROR_ID_PREFIX):] if ror_id.startswith(ROR_ID_PREFIX) else ror_id
+
+
+def is_well_formed_ror_id(ror_id: str) -> bool:
+    """ Check an ROR ID's format and checksum without looking it up """
+    suffix = _ror_suffix(ror_id).lower()
+    if not _ROR_ID_PATTERN.match(suffix):
+        return False
+    value = 0
+    for c in suffix[:7]:
+        value = value * 32 + _ROR_ALPHABET.index(c)
+    return 98 - (value * 100) % 97 == int(suffix[7:])
+
+
+def _ids_from_csv(f: Iterable[str]) -> Iterator[str]:
+    for row in csv.DictReader(f):
+        ror_id = row.get("ror_id") or row.get("id")
+        if ror_id:
+            yield ror_id
+
+
+def _ids_from_json(f) -> Iterator[str]:
+    for record in json.load(f):
+        if record.get("id"):
+            yield record["id"]
+
+
+def _ids_from_dump(path: str) -> Iterator[str]:
+    """ Read the IDs of every record in a ROR data dump """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            # Newer dumps ship both a v1 and a v2 file; either has every ID
+            names = sorted(n for n in archive.namelist() if n.endswith((".json", ".csv")))
+            if not names:
+                raise ValueError(f"No ROR data file found in {path}")
+            with archive.open(names[0]) as f:
+                if names[0].endswith(".json"):
+                    yield from _ids_from_json(f)
+                else:
+                    yield from _ids_from_csv(io.TextIOWrapper(f, encoding="utf-8"))
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            yield from _ids_from_json(f)
+    else:
+        with open(path, encoding="utf-8", newline="") as f:
+            yield from _ids_from_csv(f)
+
+
+class TTLCache:
+    """ Thread-safe LRU cache whose entries expire after a per-entry time to live """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RorValidator:
+    """ Checks whether ROR IDs exist, from the local index when possible and ror.org otherwise """
+
+    def __init__(self, index_paths: Iterable[str], timeout: float = ROR_TIMEOUT_SECONDS, cache_size: int = 4096,
+                 positive_ttl: float = 24 * 60 * 60, negative_ttl: float = 60 * 60):
+        self.index_paths = list(index_paths)
+        self.timeout = timeout
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(cache_size)
+        self._index: Optional[Set[str]] = None
+        self._index_lock = Lock()
+        self._session: Optional[requests.Session] = None
+        self.index_hits = 0
+
+    def _load_index(self) -> Set[str]:
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    index = set()
+                    for path in self.index_paths:
+                        try:
+                            index.update(_ror_suffix(ror_id).lower() for ror_id in _ids_from_dump(path))
+                        except (OSError, ValueError) as e:
+                            logger.warning(f"Unable to load ROR IDs from {path}: {e}")
+                    logger.info(f"Loaded {len(index)} ROR IDs into the local index")
+                    self._index = index
+        return self._index
+
+    @property
+    def hits(self) -> int:
+        """ Validations answered by the local index or the cache of ror.org answers """
+        return self.index_hits + self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        """ Validations that had to ask ror.org """
+        return self._cache.misses
+
+    def load(self):
+        """ Load the local index ahead of the first validation """
+        self._load_index()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=1))
+            self._session = session
+        return self._session
+
+    def _exists_remotely(self, suffix: str) -> bool:
+        started = time.perf_counter()
+        try:
+            response = self.session.head(f"{ROR_ID_PREFIX}{suffix}", allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            ROR_REQUEST_SECONDS.observe(time.perf_counter() - started, "error")
+            logger.warning(f"Unable to reach ror.org to validate {suffix}: {e}")
+            raise HTTPException(503, "Unable to validate ROR ID: ror.org is unavailable, try again later.")
+        ROR_REQUEST_SECONDS.observe(time.perf_counter() - started, str(response.status_code))
+        if response.status_code >= 500:
+            raise HTTPException(503, "Unable to validate ROR ID: ror.org is unavailable, try again later.")
+        return response.status_code == 200
+
+    def exists(self, ror_id: str) -> bool:
+        """ Check whether an ROR ID refers to an existing ROR record """
+        if not is_well_formed_ror_id(ror_id):
+            return False
+        suffix = _ror_suffix(ror_id).lower()
+        if suffix in self._load_index():
+            self.index_hits += 1
+            return True
+
+        cached = self._cache.get(suffix)
+        if cached is not None:
+            return cached
+        exists = self._exists_remotely(suffix)
+        self._cache.set(suffix, exists, self.positive_ttl if exists else self.negative_ttl)
+        return exists
+
+
+ror_validator = RorValidator([ROR_TO_UNITID_PATH, *([ROR_DUMP_PATH] if ROR_DUMP_PATH else [])])
 
 
 def validate_ror_id(ror_id: Optional[str]):
-    """ Check whether an ROR ID is valid by performing a HEAD request to ror.org """
-    # TODO we might want to rate-limit this in some way
-    if ror_id and requests.head(ror_id, allow_redirects=True).status_code != 200:
+    """ Check whether an ROR ID is valid against the local ROR index, falling back to ror.org """
+    if ror_id and not ror_validator.exists(ror_id):
         raise HTTPException(400, f"Invalid ROR ID: institution does not exist. See {ROR_ID_PREFIX}.")
@@ -0,0 +1,74 @@
+import logging
+import time
+from threading import Event, Thread
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("default")
+
+
+class StartupStats:
+    """ Tracks import time, cache warm-up and time to first request for the readiness endpoint """
+
+    def __init__(self):
+        self.import_started = time.perf_counter()
+        self.import_seconds: Optional[float] = None
+        self.time_to_first_request_seconds: Optional[float] = None
+        self.caches: Dict[str, dict] = {}
+        self._warm = Event()
+
+    def finish_import(self):
+        self.import_seconds = time.perf_counter() - self.import_started
+        logger.info(f"Application imported in {self.import_seconds:.3f}s")
+
+    def record_request(self):
+        """ Record the first request served by this process """
+        if self.time_to_first_request_seconds is None:
+            self.time_to_first_request_seconds = time.perf_counter() - self.import_started
+            logger.info(f"First request served {self.time_to_first_request_seconds:.3f}s after import")
+
+    @property
+    def ready(self) -> bool:
+        return self._warm.is_set()
+
+    def warm_caches(self, loaders: List[Tuple[str, Callable]], retry_seconds: float = 1.0,
+                    max_retry_seconds: float = 60.0):
+        """ Run each cache loader in order, recording how long it took or why it failed. Failed loaders are retried,
+        waiting twice as long each round up to max_retry_seconds, and the process is only ready once all succeeded
+        """
+        pending = list(loaders)
+        attempts: Dict[str, int] = {}
+        while True:
+            failed = []
+            for name, loader in pending:
+                attempts[name] = attempts.get(name, 0) + 1
+                started = time.perf_counter()
+                try:
+                    loader()
+                    self.caches[name] = {"status": "warm", "seconds": round(time.perf_counter() - started, 3)}
+                except Exception as e:
+                    logger.exception(f"Unable to warm the {name} cache, attempt {attempts[name]}")
+                    self.caches[name] = {"status": "failed", "error": str(e), "attempts": attempts[name]}
+                    failed.append((name, loader))
+            if not failed:
+                break
+            pending = failed
+            time.sleep(retry_seconds)
+            retry_seconds = min(retry_seconds * 2, max_retry_seconds)
+        self._warm.set()
+
+    def warm_caches_in_background(self, loaders: List[Tuple[str, Callable]]) -> Thread:
+        """ Warm the caches on a daemon thread, which keeps retrying failed loaders until they succeed """
+        thread = Thread(target=self.warm_caches, args=(loaders,), name="warm-caches", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "time_to_first_request_seconds": self.time_to_first_request_seconds,
+            "caches": self.caches,
+        }
+
+
+startup_stats = StartupStats()